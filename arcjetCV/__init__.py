@@ -16,5 +16,26 @@ Root directory for the arcjetCV package.
 # - gh release create v$(python setup.py --version) --target main
 __version__ = "1.1.17"
 
-from arcjetCV.utils.video import Video, VideoMeta
-from arcjetCV.utils.processor import ArcjetProcessor
+import importlib
+
+# Public names are imported on first access, so `import arcjetCV` stays cheap and
+# headless tools only load the modules they use
+_LAZY_ATTRIBUTES = {
+    "Video": "arcjetCV.utils.video",
+    "VideoMeta": "arcjetCV.utils.video",
+    "ArcjetProcessor": "arcjetCV.utils.processor",
+}
+
+__all__ = ["__version__", *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
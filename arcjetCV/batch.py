@@ -0,0 +1,289 @@
+"""
+Headless batch processing of arcjet videos.
+
+Runs every job of a JSON manifest through ArcjetProcessor.process_all, optionally
+several videos at a time, and writes a summary report. Nothing here imports Qt, so it
+runs on servers without a display:
+
+    arcjetcv-batch campaign.json --jobs 4 --summary campaign_summary.json
+
+Manifest format (relative video paths are resolved against the manifest folder; job
+entries override "defaults", and their "options" are merged over the default options):
+
+    {
+        "defaults": {
+            "options": {"SEGMENT_METHOD": "AutoHSV"},
+            "frame_stride": 1,
+            "output_format": "jsonl",
+            "write_parquet": true
+        },
+        "jobs": [
+            {"video": "run_01.mp4"},
+            {"video": "run_02.mp4", "first_frame": 200, "last_frame": 9000,
+             "options": {"SEGMENT_METHOD": "CNN"}, "flow_direction": "left"}
+        ]
+    }
+
+A manifest may also be a plain list of jobs. Job keys are the process_all arguments
+(first_frame, last_frame, frame_stride, output_prefix, output_format, write_json,
+write_video, write_parquet, write_contours, workers, batch_size, checkpoint_every,
+resume, chunk_frames) plus "video",
+"options", and the metadata overrides "flow_direction", "crop" ([[ymin, ymax],
+[xmin, xmax]]) and "pixels_per_mm". first_frame and last_frame default to the good
+frame range of the video metadata, which is created (or taken from the metadata cache)
+when the video has no .meta file yet. Unknown keys are rejected, so a misspelled
+option fails the manifest instead of being ignored.
+
+With --jobs > 1 each video runs with a single worker process: the videos already
+keep the cores busy, and per-video pools would nest inside the job processes.
+
+An interrupted campaign is continued with --resume: each job keeps the frames of its
+previous run's checkpoint and only processes the missing ones.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import as_completed
+
+PROCESS_ALL_KEYS = [
+    "output_prefix",
+    "output_format",
+    "write_json",
+    "write_video",
+    "write_parquet",
+    "write_contours",
+    "workers",
+    "batch_size",
+    "checkpoint_every",
+    "resume",
+    "chunk_frames",
+]
+JOB_KEYS = set(PROCESS_ALL_KEYS) | {
+    "video",
+    "options",
+    "first_frame",
+    "last_frame",
+    "frame_stride",
+    "flow_direction",
+    "crop",
+    "pixels_per_mm",
+}
+MANIFEST_KEYS = {"defaults", "jobs"}
+
+
+def _check_keys(entry, allowed, where):
+    unknown = sorted(set(entry) - allowed)
+    if unknown:
+        raise ValueError(f"Unknown {where} keys {unknown}, expected some of {sorted(allowed)}")
+
+
+def load_manifest(path):
+    """
+    Reads a batch manifest and resolves its jobs.
+
+    :param path: JSON manifest file
+    :returns: list of job dictionaries, with defaults applied and absolute video paths
+    :raises ValueError: on jobs without a video and on unknown keys
+    """
+    with open(path, "r") as fin:
+        manifest = json.load(fin)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    _check_keys(manifest, MANIFEST_KEYS, "manifest")
+
+    defaults = manifest.get("defaults", {})
+    _check_keys(defaults, JOB_KEYS - {"video"}, "defaults")
+    folder = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for entry in manifest.get("jobs", []):
+        if isinstance(entry, str):
+            entry = {"video": entry}
+        if "video" not in entry:
+            raise ValueError(f"Manifest job without a video: {entry}")
+        _check_keys(entry, JOB_KEYS, f"job ({entry['video']})")
+        job = {**defaults, **entry}
+        job["options"] = {**defaults.get("options", {}), **entry.get("options", {})}
+        job["options"].setdefault("SEGMENT_METHOD", "AutoHSV")
+        job["video"] = os.path.join(folder, os.path.expanduser(entry["video"]))
+        jobs.append(job)
+    return jobs
+
+
+def run_job(job):
+    """
+    Processes the frames of one manifest job.
+
+    :param job: job dictionary, as returned by load_manifest
+    :returns: summary dictionary of the job; status is "ok" or "failed"
+    """
+    from arcjetCV.utils.video import Video, VideoMeta
+    from arcjetCV.utils.processor import ArcjetProcessor
+
+    result = {
+        "video": job["video"],
+        "segment_method": job["options"]["SEGMENT_METHOD"],
+        "status": "failed",
+    }
+    t0 = time.perf_counter()
+    video = None
+    try:
+        video = Video(job["video"])
+        videometa = VideoMeta(video, os.path.join(video.folder, video.name + ".meta"))
+        if "flow_direction" in job:
+            videometa["FLOW_DIRECTION"] = job["flow_direction"]
+        if "crop" in job:
+            (ymin, ymax), (xmin, xmax) = job["crop"]
+            videometa.set_frame_crop(ymin, ymax, xmin, xmax)
+        if "pixels_per_mm" in job:
+            videometa["PIXELS_PER_MM"] = job["pixels_per_mm"]
+
+        first_frame = job.get("first_frame", videometa["FIRST_GOOD_FRAME"] or 0)
+        last_frame = job.get("last_frame", videometa["LAST_GOOD_FRAME"])
+        if last_frame is None or last_frame >= video.nframes:
+            last_frame = video.nframes - 1
+        frame_stride = job.get("frame_stride", 1)
+        result.update(
+            first_frame=int(first_frame),
+            last_frame=int(last_frame),
+            frame_stride=int(frame_stride),
+        )
+
+        processor = ArcjetProcessor(videometa)
+        out = processor.process_all(
+            video,
+            dict(job["options"]),
+            int(first_frame),
+            int(last_frame),
+            int(frame_stride),
+            **{key: job[key] for key in PROCESS_ALL_KEYS if key in job},
+        )
+        result["frames"] = len(out)
+        result["output"] = os.path.join(video.folder, processor.filename)
+        result["status"] = "ok"
+    except Exception as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    finally:
+        if video is not None:
+            video.close()
+    result["seconds"] = round(time.perf_counter() - t0, 3)
+    return result
+
+
+def run_batch(jobs, max_jobs=1):
+    """
+    Runs manifest jobs, up to max_jobs videos at a time in worker processes.
+
+    Concurrent jobs are limited to one worker process each, see the module docstring.
+
+    :param jobs: list of job dictionaries
+    :param max_jobs: number of videos processed concurrently
+    :returns: list of job summaries, in manifest order
+    """
+    results = [None] * len(jobs)
+    if max_jobs <= 1 or len(jobs) <= 1:
+        for i, job in enumerate(jobs):
+            results[i] = run_job(job)
+            _print_result(i, len(jobs), results[i])
+        return results
+
+    if any(job.get("workers", 1) > 1 for job in jobs):
+        print(f"[INFO] Running {max_jobs} videos at a time with one worker process each")
+        jobs = [{**job, "workers": 1} for job in jobs]
+
+    from arcjetCV.utils.utils import spawn_pool
+
+    with spawn_pool(min(max_jobs, len(jobs))) as pool:
+        futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as exc:  # worker crashed
+                results[i] = {
+                    "video": jobs[i]["video"],
+                    "status": "failed",
+                    "error": f"{type(exc).__name__}: {exc}",
+                }
+            _print_result(i, len(jobs), results[i])
+    return results
+
+
+def _print_result(i, njobs, result):
+    if result["status"] == "ok":
+        detail = f"{result['frames']} frames in {result['seconds']:.1f} s -> {result['output']}"
+    else:
+        detail = f"FAILED: {result.get('error')}"
+    print(f"\n[{i + 1}/{njobs}] {result['video']}: {detail}")
+
+
+def write_summary(results, path):
+    """
+    Writes the batch summary report.
+
+    :param results: list of job summaries
+    :param path: output JSON file
+    :returns: summary dictionary
+    """
+    summary = {
+        "jobs": len(results),
+        "succeeded": sum(r["status"] == "ok" for r in results),
+        "failed": sum(r["status"] != "ok" for r in results),
+        "frames": sum(r.get("frames", 0) for r in results),
+        "seconds": round(sum(r.get("seconds", 0.0) for r in results), 3),
+        "results": results,
+    }
+    with open(path, "w") as fout:
+        json.dump(summary, fout, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="arcjetcv-batch",
+        description="Process a manifest of arcjet videos without the GUI.",
+    )
+    parser.add_argument("manifest", help="JSON manifest of videos and options")
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="number of videos processed concurrently"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes per video (overrides the manifest)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue interrupted jobs from their checkpoints",
+    )
+    parser.add_argument(
+        "--summary",
+        default=None,
+        help="summary report file (default: <manifest>_summary.json)",
+    )
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+    if args.workers is not None:
+        for job in jobs:
+            job["workers"] = args.workers
+    if args.resume:
+        for job in jobs:
+            job["resume"] = True
+    summary_path = args.summary or os.path.splitext(args.manifest)[0] + "_summary.json"
+
+    print(f"Processing {len(jobs)} videos with {args.jobs} concurrent jobs")
+    summary = write_summary(run_batch(jobs, args.jobs), summary_path)
+    print(
+        f"{summary['succeeded']}/{summary['jobs']} videos processed, "
+        f"{summary['frames']} frames; summary written to {summary_path}"
+    )
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
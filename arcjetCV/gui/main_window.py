@@ -14,7 +14,9 @@ from matplotlib.colors import rgb_to_hsv
 from matplotlib.widgets import RectangleSelector
 from arcjetCV.gui.arcjetCV_gui import Ui_MainWindow
 from arcjetCV.utils.video import Video, VideoMeta
-from arcjetCV.utils.processor import ArcjetProcessor, ProcessorWorker
+from arcjetCV.utils.processor import ArcjetProcessor
+from arcjetCV.gui.processor_worker import ProcessorWorker, progress_bar_callback
+from arcjetCV.utils.output import iter_output_records
 from arcjetCV.utils.utils import (
     splitfn,
     getOutlierMask,
@@ -552,11 +554,12 @@ class MainWindow(QtWidgets.QMainWindow):
 
             try:  # Create video object
                 update_loading_progress(2, "Opening video file...")
-                self.video = Video(self.path)
+                self.video = Video(self.path, prefetch=4)
                 self.videometa = VideoMeta(
                     self.video,
                     os.path.join(self.folder, self.filename + ".meta"),
                     progress_callback=update_loading_progress,
+                    workers=os.cpu_count() or 1,
                 )
 
                 if hasattr(self, "pixels_per_mm"):  # Ensure it's defined
@@ -615,7 +618,8 @@ class MainWindow(QtWidgets.QMainWindow):
                 if self.processor is None:
                     update_loading_progress(99, "Initializing processor...")
                     self.processor = ArcjetProcessor(
-                        self.videometa, progress_bar=self.ui.progressBar
+                        self.videometa,
+                        progress_callback=progress_bar_callback(self.ui.progressBar),
                     )
                 else:  # avoid reimporting CNN model each time
                     self.processor.update_video_meta(self.videometa)
@@ -898,7 +902,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 self,
                 "Load ouput files",
                 "",
-                "Output Files (*.json);;All Files (*)",
+                "Output Files (*.json *.jsonl);;All Files (*)",
                 options=options,
             )
             self.ui.basebar.setText("Loading %i files" % len(files))
@@ -906,9 +910,7 @@ class MainWindow(QtWidgets.QMainWindow):
             # Load all files & concatenate
             self.raw_outputs = []
             for fname in files:
-                with open(fname, "rb") as file:
-                    opl = json.load(file)
-                    self.raw_outputs.extend(opl)
+                self.raw_outputs.extend(iter_output_records(fname))
 
             if len(files) > 0:
                 fpath, name, ext = splitfn(files[0])
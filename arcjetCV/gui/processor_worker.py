@@ -0,0 +1,103 @@
+from PySide6.QtCore import QMetaObject, Qt, QTimer, Signal, QObject
+
+
+def progress_bar_callback(progress_bar):
+    """
+    Progress callback for ArcjetProcessor that updates a QProgressBar.
+
+    Updates are posted to the Qt event loop instead of touching the widget directly.
+
+    :param progress_bar: QProgressBar
+    :returns: function taking an integer percentage
+    """
+
+    def update(percent):
+        if percent >= 100:
+            QMetaObject.invokeMethod(progress_bar, "setValue", Qt.QueuedConnection, 100)
+        else:
+            QTimer.singleShot(0, lambda: progress_bar.setValue(percent))
+
+    return update
+
+
+class ProcessorWorker(QObject):
+    """Worker class that runs ArcjetProcessor.process_all in a separate thread."""
+
+    progress_updated = Signal(int)  # Signal for updating the progress bar
+    finished = Signal()  # Signal for when processing is done
+
+    def __init__(
+        self,
+        processor,
+        video,
+        options,
+        first_frame,
+        last_frame,
+        frame_stride,
+        output_prefix,
+        write_json,
+        write_video,
+        display_shock,
+        output_format="json",
+        write_parquet=False,
+        write_contours=False,
+        batch_size=1,
+        resume=False,
+    ):
+        super().__init__()
+        self.processor = processor
+        self.video = video
+        self.options = options
+        self.first_frame = first_frame
+        self.last_frame = last_frame
+        self.frame_stride = frame_stride
+        self.output_prefix = output_prefix
+        self.write_json = write_json
+        self.write_video = write_video
+        self.display_shock = display_shock
+        self.output_format = output_format
+        self.write_parquet = write_parquet
+        self.write_contours = write_contours
+        self.batch_size = batch_size
+        self.resume = resume
+        self.processing_done = False
+        self.stop_flag = False
+
+    def run(self):
+        """Run video processing in a separate thread, reporting progress through signals."""
+        try:
+            if not self.output_prefix:
+                self.output_prefix = "output"  # Ensure filename is valid
+
+            self.processor.process_all(
+                self.video,
+                self.options,
+                self.first_frame,
+                self.last_frame,
+                self.frame_stride,
+                output_prefix=self.output_prefix,
+                write_json=self.write_json,
+                write_video=self.write_video,
+                display_shock=self.display_shock,
+                output_format=self.output_format,
+                write_parquet=self.write_parquet,
+                write_contours=self.write_contours,
+                batch_size=self.batch_size,
+                resume=self.resume,
+                progress_callback=self.progress_updated.emit,
+                should_stop=self.should_stop,
+            )
+        except Exception as e:
+            print(f"Processing failed: {e}")
+
+        # Signal completion
+        self.finished.emit()
+
+    def should_stop(self):
+        """Polled by process_all before every frame."""
+        return self.stop_flag
+
+    def stop(self):
+        """Stop the worker safely: processing ends before the next frame and the partial output is written."""
+        print("🛑 Stopping processing thread...")
+        self.stop_flag = True
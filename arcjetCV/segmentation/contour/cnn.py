@@ -1,46 +1,240 @@
+import os
 import torch
+import tempfile
+import threading
+import numpy as np
 from pathlib import Path
 import cv2
 from torchvision import transforms as T
 import segmentation_models_pytorch as smp
 import urllib.request
 
+from arcjetCV.utils.meta_cache import default_model_dir, file_digest
 
-class CNN:
-    def __init__(self):
-        # Automatically choose GPU if available
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        model_name = "Unet-xception_25_weights_only.pt"
-        self.checkpoint_path = Path(__file__).parent / model_name
-
-        # Download if missing
-        if not self.checkpoint_path.exists():
-            print(f"[INFO] Downloading model weights to {self.checkpoint_path}...")
-            url = "https://github.com/magnus-haw/arcjetCV/rawÒ/main/arcjetCV/segmentation/contour/Unet-xception_25_weights_only.pt"
-            urllib.request.urlretrieve(url, self.checkpoint_path)
-
-        self.checkpoint_path = (
-            Path(__file__)
-            .parent.absolute()
-            .joinpath("Unet-xception_25_weights_only.pt")
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+CHECKPOINT_PATH = Path(__file__).parent.absolute() / "Unet-xception_25_weights_only.pt"
+# Statically quantized graph built by arcjetCV.segmentation.contour.quantize
+INT8_ONNX_PATH = CHECKPOINT_PATH.with_suffix(".int8.onnx")
+# Approximate forward-pass memory of the U-Net/xception per input pixel on CPU
+# (about 110 MB per 512x512 tile), used to size batches of tiles
+TILE_BYTES_PER_PIXEL = 448
+
+
+def _tile_starts(length, tile, overlap):
+    """
+    Start offsets of tiles covering [0, length) with at least the given overlap.
+
+    :param length: image size along one axis, at least tile
+    :param tile: tile size
+    :param overlap: overlap between neighbouring tiles
+    :returns: list of start offsets, the last tile ending at length
+    """
+    starts = list(range(0, length - tile + 1, tile - overlap))
+    if starts[-1] + tile < length:
+        starts.append(length - tile)
+    return starts
+
+
+def _tile_ramp(tile, overlap):
+    """
+    1D blending weights of a tile, ramping linearly from 0 to 1 over the overlap.
+    """
+    weights = np.ones(tile, dtype=np.float32)
+    if overlap > 0:
+        ramp = (np.arange(overlap, dtype=np.float32) + 0.5) / overlap
+        weights[:overlap] = ramp
+        weights[-overlap:] = ramp[::-1]
+    return weights
+
+
+def load_unet(checkpoint_path=CHECKPOINT_PATH, device="cpu"):
+    """
+    Builds the U-Net/xception segmentation model and loads its checkpoint.
+
+    :param checkpoint_path: path of the weights file, downloaded if missing
+    :param device: torch device to map the weights to
+    :returns: torch model in eval mode
+    """
+    checkpoint_path = Path(checkpoint_path)
+
+    # Download if missing
+    if not checkpoint_path.exists():
+        print(f"[INFO] Downloading model weights to {checkpoint_path}...")
+        url = "https://github.com/magnus-haw/arcjetCV/rawÒ/main/arcjetCV/segmentation/contour/Unet-xception_25_weights_only.pt"
+        urllib.request.urlretrieve(url, checkpoint_path)
+
+    model = smp.Unet(
+        encoder_name="xception",
+        encoder_weights=None,
+        classes=4,  # match saved model
+        activation=None,
+    )
+    if torch.device(device).type == "cpu":
+        # Memory-map the weights and adopt the mapped tensors as parameters, so the
+        # checkpoint is not copied and processes loading it share its page cache
+        try:
+            state = torch.load(checkpoint_path, map_location="cpu", mmap=True, weights_only=False)
+        except RuntimeError:
+            # Legacy (non-zip) checkpoints cannot be memory-mapped
+            state = torch.load(checkpoint_path, map_location="cpu", weights_only=False)
+        model.load_state_dict(state, assign=True)
+    else:
+        model.load_state_dict(
+            torch.load(checkpoint_path, map_location=device, weights_only=False)
         )
+    model.to(device)
+    model.eval()
+    return model
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_cnn(backend="torch", checkpoint_path=CHECKPOINT_PATH, warmup=False, **kwargs):
+    """
+    Returns the process-wide CNN for a checkpoint, building it on first request.
 
-        self.model = smp.Unet(
-            encoder_name="xception",
-            encoder_weights=None,
-            classes=4,  # match saved model
-            activation=None,
+    Instances are keyed by backend, checkpoint path and checkpoint hash (plus the other
+    CNN arguments), so every ArcjetProcessor in the process shares one model and a
+    checkpoint replaced on disk is loaded again.
+
+    :param backend: CNN backend, see CNN
+    :param checkpoint_path: weights file of the model
+    :param warmup: run one dummy inference on a new instance before returning it
+    :param kwargs: further CNN arguments (onnx_path, intra_op_threads, inter_op_threads)
+    :returns: shared CNN instance
+
+    Example:
+        >>> cnn = get_cnn(warmup=True)
+        >>> mask = cnn.predict(frame_crop)
+    """
+    checkpoint_path = Path(checkpoint_path).resolve()
+    if checkpoint_path.exists():
+        digest = file_digest(checkpoint_path)
+    else:
+        digest = None  # downloaded by load_unet
+    key = (backend, str(checkpoint_path), digest, tuple(sorted(kwargs.items())))
+
+    with _registry_lock:
+        cnn = _registry.get(key)
+        if cnn is None:
+            cnn = CNN(backend=backend, checkpoint_path=checkpoint_path, **kwargs)
+            if warmup:
+                cnn.warmup()
+            _registry[key] = cnn
+    return cnn
+
+
+def clear_cnn_registry():
+    """
+    Drops all shared CNN instances.
+    """
+    with _registry_lock:
+        _registry.clear()
+
+
+def onnx_cache_path(checkpoint_path=CHECKPOINT_PATH):
+    """
+    Default ONNX graph of a checkpoint in the user model directory.
+
+    The file name carries the checkpoint hash, so a replaced checkpoint is exported
+    again instead of reusing a stale graph.
+
+    :param checkpoint_path: weights file of the model
+    :returns: Path under default_model_dir()
+    """
+    checkpoint_path = Path(checkpoint_path)
+    if checkpoint_path.exists():
+        name = f"{checkpoint_path.stem}-{file_digest(checkpoint_path)[:16]}.onnx"
+    else:
+        name = checkpoint_path.with_suffix(".onnx").name
+    return default_model_dir() / name
+
+
+def export_onnx(onnx_path, model=None, input_size=(512, 512), opset_version=17):
+    """
+    Exports the segmentation model to an ONNX graph with a dynamic batch dimension.
+
+    The graph is written to a temporary file next to onnx_path and renamed into
+    place, so concurrent exports never leave a partial file behind.
+
+    :param onnx_path: output .onnx file
+    :param model: torch model to export, defaults to the packaged checkpoint
+    :param input_size: (height, width) of the network input
+    :param opset_version: ONNX opset
+    :returns: onnx_path
+    """
+    if model is None:
+        model = load_unet()
+    model = model.to("cpu").eval()
+    dummy = torch.zeros((1, 3) + tuple(input_size), dtype=torch.float32)
+    onnx_path = Path(onnx_path)
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=onnx_path.parent, suffix=".onnx.tmp")
+    os.close(fd)
+    try:
+        torch.onnx.export(
+            model,
+            dummy,
+            tmp_path,
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset_version,
+            dynamo=False,
         )
-        self.model.load_state_dict(
-            torch.load(
-                self.checkpoint_path, map_location=self.device, weights_only=False
+        os.replace(tmp_path, onnx_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return onnx_path
+
+
+class CNN:
+    def __init__(
+        self,
+        backend="torch",
+        model=None,
+        onnx_path=None,
+        intra_op_threads=0,
+        inter_op_threads=0,
+        checkpoint_path=CHECKPOINT_PATH,
+    ):
+        """
+        :param backend: "torch" runs the model eagerly with PyTorch, "onnx" runs the exported
+                        graph with onnxruntime on CPU, "onnx_int8" runs the INT8 quantized graph
+        :param model: optional torch model used instead of the packaged checkpoint
+        :param onnx_path: ONNX graph for the "onnx" backend, exported from the model when
+                          missing; defaults to the checkpoint path with a .onnx suffix if
+                          that file ships with the package, else to onnx_cache_path().
+                          For "onnx_int8" defaults to INT8_ONNX_PATH, which must exist
+        :param intra_op_threads: onnxruntime threads within an operator, 0 for its default
+        :param inter_op_threads: onnxruntime threads across operators, 0 for its default
+        :param checkpoint_path: weights file loaded when no model is given
+        """
+        if backend not in ("torch", "onnx", "onnx_int8"):
+            raise ValueError(
+                f"Unknown CNN backend '{backend}', expected 'torch', 'onnx' or 'onnx_int8'"
             )
-        )
-        self.model.to(self.device)
-        self.model.eval()
+        self.backend = backend
+
+        # Automatically choose GPU if available
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.checkpoint_path = Path(checkpoint_path)
+        # predict_batch reuses the input buffer, so calls on a shared instance are serialized
+        self._lock = threading.Lock()
 
         self.mean = [0.485, 0.456, 0.406]
         self.std = [0.229, 0.224, 0.225]
+        self.input_size = (512, 512)
+        self._batch = None
+        # Reference torchvision chain, replaced in predict_batch by preprocess
         self.t = T.Compose(
             [
                 T.ToPILImage(),
@@ -50,21 +244,203 @@ class CNN:
             ]
         )
 
+        self.model = model
+        self.session = None
+        if backend in ("onnx", "onnx_int8"):
+            if ort is None:
+                raise ModuleNotFoundError(
+                    "onnxruntime is required for the onnx CNN backend (pip install onnxruntime)"
+                )
+            if backend == "onnx_int8":
+                self.onnx_path = Path(onnx_path or INT8_ONNX_PATH)
+                if not self.onnx_path.exists():
+                    raise FileNotFoundError(
+                        f"INT8 CNN model {self.onnx_path} not found, build it with "
+                        "python -m arcjetCV.segmentation.contour.quantize build VIDEO [VIDEO ...]"
+                    )
+            else:
+                if onnx_path is None:
+                    onnx_path = self.checkpoint_path.with_suffix(".onnx")
+                    if not onnx_path.exists():
+                        onnx_path = onnx_cache_path(self.checkpoint_path)
+                self.onnx_path = Path(onnx_path)
+                if not self.onnx_path.exists():
+                    print(f"[INFO] Exporting CNN to {self.onnx_path}...")
+                    if model is None:
+                        model = load_unet(self.checkpoint_path)
+                    export_onnx(self.onnx_path, model, self.input_size)
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = intra_op_threads
+            options.inter_op_num_threads = inter_op_threads
+            self.session = ort.InferenceSession(
+                str(self.onnx_path), options, providers=["CPUExecutionProvider"]
+            )
+        else:
+            if self.model is None:
+                self.model = load_unet(self.checkpoint_path, self.device)
+            self.model.to(self.device)
+            self.model.eval()
+
     def predict(self, img):
 
-        self.model.eval()
-        image = self.t(img)
+        return self.predict_batch([img])[0]
 
-        self.model.to(self.device)
-        image = image.to(self.device)
+    def preprocess(self, imgs):
+        """
+        Resizes and normalizes images into a reused float32 batch buffer.
 
+        Equivalent to stacking self.t(img) without the PIL round trip: each image is
+        resized with cv2 into a reused uint8 image, then written to the float32 planes as
+        (x / 255 - mean) / std per channel.
+
+        :param imgs: list of 8-bit 3 channel opencv images
+        :returns: tensor of shape (len(imgs), 3, height, width) sharing the buffer memory,
+                  valid until the next call
+        """
+        h, w = self.input_size
+        n = len(imgs)
+        if getattr(self, "_batch", None) is None or len(self._batch) < n:
+            self._batch = np.empty((n, 3, h, w), dtype=np.float32)
+            self._resized = np.empty((h, w, 3), dtype=np.uint8)
+
+        batch = self._batch[:n]
+        for img, planes in zip(imgs, batch):
+            # Area interpolation matches the antialiased PIL resize when shrinking
+            shrink = img.shape[0] >= h and img.shape[1] >= w
+            interpolation = cv2.INTER_AREA if shrink else cv2.INTER_LINEAR
+            cv2.resize(img, (w, h), dst=self._resized, interpolation=interpolation)
+            self._normalize(self._resized, planes)
+        return torch.from_numpy(batch)
+
+    def _normalize(self, img, planes):
+        """
+        Writes (img / 255 - mean) / std into float32 planes of shape (3, height, width).
+        """
+        std = np.asarray(self.std, dtype=np.float32)
+        scale = 1.0 / (255.0 * std)
+        shift = -np.asarray(self.mean, dtype=np.float32) / std
+        for ch in range(3):
+            np.multiply(img[:, :, ch], scale[ch], out=planes[ch])
+            planes[ch] += shift[ch]
+
+    def _forward(self, images):
+        """
+        Runs the network on a normalized batch.
+
+        :param images: float32 tensor of shape (n, 3, height, width)
+        :returns: float32 numpy logits of shape (n, classes, height, width)
+        """
+        if self.session is not None:
+            return self.session.run(None, {"input": images.numpy()})[0]
+
+        self.model.eval()
+        self.model.to(self.device)
         with torch.no_grad():
-            image = image.unsqueeze(0)
-            output = self.model(image)
-            masked = torch.argmax(output, dim=1)
-            masked = masked.cpu().squeeze(0).numpy()
+            return self.model(images.to(self.device)).cpu().numpy()
 
-        masked = cv2.resize(
-            masked, (img.shape[1], img.shape[0]), interpolation=cv2.INTER_NEAREST
-        )
-        return masked
+    def warmup(self, batch_size=1):
+        """
+        Runs one inference on blank images, so that lazy initialization (weight pages,
+        kernel selection, allocator pools) happens before the first real frame.
+
+        :param batch_size: batch size of the dummy inference
+        """
+        h, w = self.input_size
+        self.predict_batch([np.zeros((h, w, 3), dtype=np.uint8)] * batch_size)
+
+    def predict_batch(self, imgs):
+        """
+        Segments several images with a single forward pass of the network.
+
+        :param imgs: list of opencv images, possibly of different sizes
+        :returns: list of class masks, each resized to its input image
+        """
+        with self._lock:
+            masks = self._forward(self.preprocess(imgs)).argmax(axis=1)
+
+        return [
+            cv2.resize(
+                masked, (img.shape[1], img.shape[0]), interpolation=cv2.INTER_NEAREST
+            )
+            for masked, img in zip(masks, imgs)
+        ]
+
+    def predict_tiled(self, img, scale=1.0, overlap=64, memory_budget=512 * 2**20):
+        """
+        Segments an image at native (or a chosen) resolution with overlapping tiles.
+
+        The image is scaled by `scale` and covered by tiles of the model input size,
+        overlapping by `overlap` pixels. Tile logits are blended with weights ramping down
+        across the overlaps. The mask is finalized one row of tiles at a time, so logits are
+        only held for a band one tile high, and tiles are batched within memory_budget.
+
+        :param img: 8-bit 3 channel opencv image
+        :param scale: resolution at which the model runs, relative to img
+        :param overlap: overlap between neighbouring tiles in pixels, at most half a tile
+        :param memory_budget: approximate bound in bytes on the logits band plus the
+                              forward pass of one batch of tiles; at least one tile runs
+        :returns: class mask of the image size
+        """
+        th, tw = self.input_size
+        if not 0 <= overlap <= min(th, tw) // 2:
+            raise ValueError(f"overlap must be between 0 and half a tile, got {overlap}")
+
+        h0, w0 = img.shape[:2]
+        if scale != 1.0:
+            size = (max(1, round(w0 * scale)), max(1, round(h0 * scale)))
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            img = cv2.resize(img, size, interpolation=interpolation)
+        h, w = img.shape[:2]
+        # Images smaller than a tile are padded with black, as make_crop_square does
+        if h < th or w < tw:
+            img = cv2.copyMakeBorder(
+                img, 0, max(th - h, 0), 0, max(tw - w, 0), cv2.BORDER_CONSTANT, value=0
+            )
+        H, W = img.shape[:2]
+
+        ys = _tile_starts(H, th, overlap)
+        xs = _tile_starts(W, tw, overlap)
+        weight = np.outer(_tile_ramp(th, overlap), _tile_ramp(tw, overlap))
+        band_bytes = 4 * th * W * 4  # float32 logits of the 4 classes
+        batch_size = int((memory_budget - band_bytes) // (th * tw * TILE_BYTES_PER_PIXEL))
+        batch_size = min(max(batch_size, 1), len(xs))
+
+        mask = np.empty((H, W), dtype=np.uint8)
+        band = None
+        with self._lock:
+            planes = np.empty((batch_size, 3, th, tw), dtype=np.float32)
+            for i, y in enumerate(ys):
+                if band is not None:
+                    # Move the band down to row y, keeping the rows still receiving tiles
+                    shift = y - ys[i - 1]
+                    band[:, : th - shift] = band[:, shift:]
+                    band[:, th - shift :] = 0
+
+                for j in range(0, len(xs), batch_size):
+                    batch_xs = xs[j : j + batch_size]
+                    for k, x in enumerate(batch_xs):
+                        self._normalize(img[y : y + th, x : x + tw], planes[k])
+                    logits = self._forward(torch.from_numpy(planes[: len(batch_xs)]))
+                    if band is None:
+                        band = np.zeros((logits.shape[1], th, W), dtype=np.float32)
+                    for k, x in enumerate(batch_xs):
+                        band[:, :, x : x + tw] += logits[k] * weight
+
+                # Rows above the next row of tiles are complete; the weights are positive,
+                # so the argmax of the weighted sum is the argmax of the weighted average
+                done = ys[i + 1] - y if i + 1 < len(ys) else th
+                mask[y : y + done] = band[:, :done].argmax(axis=0)
+
+        mask = mask[:h, :w]
+        if (h, w) != (h0, w0):
+            mask = cv2.resize(mask, (w0, h0), interpolation=cv2.INTER_NEAREST)
+        return mask
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m arcjetCV.segmentation.contour.cnn [output.onnx]
+    onnx_path = sys.argv[1] if len(sys.argv) > 1 else CHECKPOINT_PATH.with_suffix(".onnx")
+    print(f"Exported {export_onnx(onnx_path)}")
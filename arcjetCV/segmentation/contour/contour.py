@@ -46,6 +46,125 @@ def filter_hsv_ranges(hsv: np.ndarray, ranges) -> np.ndarray:
     return maskHSV
 
 
+class HSVRangeClassifier:
+    """
+    Precompiled classifier labelling pixels against several groups of HSV ranges at once.
+
+    Every HSV range is a box, so a pixel lies in range i exactly when each of its H, S and V
+    values lies within that range's bounds. The classifier stores one 256-entry table per
+    channel holding, for each channel value, the bit mask of the ranges that accept it.
+    A pixel's range membership is the AND of its three table lookups, computed with cv.LUT
+    for all ranges in a single pass, and masks for any union of groups are then read off
+    the label image. Masks are identical to filter_hsv_ranges on the same ranges.
+
+    Example:
+        >>> classifier = HSVRangeClassifier({"MODEL": model_ranges, "SHOCK": shock_ranges})
+        >>> labels = classifier.classify(hsv_image)
+        >>> modelmask = classifier.mask(labels, "MODEL")
+    """
+
+    MAX_RANGES = 16
+
+    def __init__(self, groups):
+        """
+        :param groups: dictionary mapping a group name to ranges given as in filter_hsv_ranges,
+                       i.e. (list of lower bounds, list of upper bounds); at most 16 ranges in total
+        """
+        self.luts = np.zeros((3, 256), dtype=np.uint16)
+        self.bits = {}
+        values = np.arange(256)
+        nbit = 0
+        for name, ranges in groups.items():
+            self.bits[name] = 0
+            for lower, upper in zip(ranges[0], ranges[1]):
+                if nbit >= self.MAX_RANGES:
+                    raise ValueError(
+                        f"HSVRangeClassifier supports at most {self.MAX_RANGES} ranges"
+                    )
+                # Same uint8 bounds as filter_hsv_ranges passes to cv.inRange
+                lower = np.array(lower, dtype=np.uint8)
+                upper = np.array(upper, dtype=np.uint8)
+                for ch in range(3):
+                    accepted = (values >= lower[ch]) & (values <= upper[ch])
+                    self.luts[ch] |= accepted.astype(np.uint16) << nbit
+                self.bits[name] |= 1 << nbit
+                nbit += 1
+
+    @staticmethod
+    def _scratch(buffers, name, shape, dtype):
+        """
+        Returns a reusable array from buffers, or None to let OpenCV allocate one.
+        """
+        if buffers is None:
+            return None
+        buf = buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = buffers[name] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def classify(self, hsv, buffers=None):
+        """
+        Labels each pixel with the bit mask of the ranges it falls in.
+
+        :param hsv: 8-bit HSV image
+        :param buffers: optional dictionary of scratch arrays reused across calls
+        :returns: uint16 label image, bit i set where the pixel lies in range i
+        """
+        shape = hsv.shape[:2]
+        channel = self._scratch(buffers, "channel", shape, np.uint8)
+        ranges = self._scratch(buffers, "ranges", shape, np.uint16)
+        labels = self._scratch(buffers, "labels", shape, np.uint16)
+        channel = cv.extractChannel(hsv, 0, dst=channel)
+        labels = cv.LUT(channel, self.luts[0], dst=labels)
+        for ch in (1, 2):
+            channel = cv.extractChannel(hsv, ch, dst=channel)
+            ranges = cv.LUT(channel, self.luts[ch], dst=ranges)
+            cv.bitwise_and(labels, ranges, dst=labels)
+        return labels
+
+    def mask(self, labels, *names, buffers=None):
+        """
+        Binary mask of the pixels falling in any range of the named groups.
+
+        :param labels: label image returned by classify
+        :param names: group names to combine
+        :param buffers: optional dictionary of scratch arrays reused across calls; the mask
+                        itself is stored under the joined group names
+        :returns: mask with 255 inside the ranges and 0 elsewhere
+        """
+        bits = 0
+        for name in names:
+            bits |= self.bits[name]
+        selected = self._scratch(buffers, "ranges", labels.shape, np.uint16)
+        mask = self._scratch(buffers, "+".join(names), labels.shape, np.uint8)
+        selected = cv.bitwise_and(labels, bits, dst=selected)
+        return cv.compare(selected, 0, cv.CMP_GT, dst=mask)
+
+
+### HSV pixel ranges for models taken from sample frames
+AUTOHSV_MODEL_RANGES = [
+    [(0, 0, 208), (155, 0, 155), (13, 20, 101), (0, 190, 100), (12, 150, 130)],
+    [(180, 70, 255), (165, 125, 255), (33, 165, 255), (13, 245, 160), (25, 200, 250)],
+]
+AUTOHSV_DIM_MODEL_RANGES = [[(7, 0, 8)], [(20, 185, 101)]]
+
+### HSV pixel ranges for shocks taken from sample frames
+AUTOHSV_SHOCK_RANGES = [[(125, 78, 115)], [(145, 190, 230)]]
+AUTOHSV_DIM_SHOCK_RANGES = [
+    [(125, 100, 35), (140, 30, 20), (118, 135, 30)],
+    [(165, 165, 150), (156, 90, 220), (128, 194, 125)],
+]
+
+_AUTOHSV_CLASSIFIER = HSVRangeClassifier(
+    {
+        "MODEL": AUTOHSV_MODEL_RANGES,
+        "DIM_MODEL": AUTOHSV_DIM_MODEL_RANGES,
+        "SHOCK": AUTOHSV_SHOCK_RANGES,
+        "DIM_SHOCK": AUTOHSV_DIM_SHOCK_RANGES,
+    }
+)
+
+
 def getEdgeFromContour(c, flow_direction, offset=None):
     """
     Find the leading edge of a contour for a given flow direction
@@ -78,6 +197,29 @@ def getEdgeFromContour(c, flow_direction, offset=None):
     return frontedge
 
 
+def _interpEdge(c, axis, positions, leading=np.minimum):
+    """
+    Interpolates the cross-axis coordinate of an edge at the given positions along axis.
+
+    Where several points share a position along axis (a run of the edge parallel to
+    it, as near the top and bottom of a blunt body), the most upstream one is kept, then
+    np.interp is applied on the sorted positions, which gives sub-pixel results for any
+    number of stations.
+
+    :param c: edge points, shape (n, 2)
+    :param axis: 1 to interpolate x as a function of y, 0 for y as a function of x
+    :param positions: positions along axis at which to interpolate
+    :param leading: np.minimum or np.maximum, whichever selects the upstream point
+    :returns: interpolated coordinates; 0 for positions outside the edge's extent
+    """
+    order = np.argsort(c[:, axis], kind="stable")
+    along = c[order, axis]
+    across = c[order, 1 - axis].astype(float)
+    unique, starts = np.unique(along, return_index=True)
+    front = leading.reduceat(across, starts)
+    return np.interp(positions, unique, front, left=0, right=0)
+
+
 def getPoints(c, flow_direction="right", r=[-0.95, -0.50, 0, 0.50, 0.95], prefix="MODEL"):
     """
     Given an OpenCV contour, this function returns interpolated points at specified
@@ -85,13 +227,15 @@ def getPoints(c, flow_direction="right", r=[-0.95, -0.50, 0, 0.50, 0.95], prefix
 
     Assumptions:
     1. Only the leading edge is passed into the function (not a closed contour).
-    2. The contour is dense, meaning every vertical pixel is occupied.
+    2. Between its extremes along the radial axis, the edge position is taken at its
+       most upstream point in each row (column for vertical flows).
 
     Parameters:
     :param c: An OpenCV contour of shape (n, 1, n).
     :param flow_direction (str): Indicates the direction of the flow. Acceptable values
                                  are "right", "left", "up", or "down". Default is "right".
     :param r (list): A list of interpolation points relative to the contour's radius.
+                     Any number of stations is supported.
                      Default is [-0.95, -0.50, 0, 0.50, 0.95].
     :param prefix (str): A prefix string for keys in the output dictionary. Default is "MODEL".
 
@@ -102,74 +246,45 @@ def getPoints(c, flow_direction="right", r=[-0.95, -0.50, 0, 0.50, 0.95], prefix
         - [prefix]+'_YLOW': Minimum Y-coordinate of the contour.
         - [prefix]+'_CROP_YMAX': Maximum Y-coordinate of the contour.
         - [prefix]+'_RADIUS': Radius (half of the height) of the contour.
-        - [prefix]+'_INTERP_XPOS': Interpolated X-coordinates corresponding to each point in 'r'.
+        - [prefix]+'_INTERP_XPOS': Sub-pixel X-coordinates interpolated along the edge
+          at each point in 'r' (0 where a station lies outside the edge).
     """
 
-    if flow_direction in ["right", "left"]:
-        ### Extract min/max ypos
-        low_ind = c[:, 0, 1].argmin()
-        ymin = c[low_ind, 0, 1]
-        high_ind = c[:, 0, 1].argmax()
-        ymax = c[high_ind, 0, 1]
-        center = int((ymin + ymax) / 2)
-        radius = int((ymax - ymin) / 2)
-
-        ### Setup output dictionary
-        output = {
-            prefix + "_R": r,
-            prefix + "_YCENTER": center,
-            prefix + "_YLOW": ymin,
-            prefix + "_CROP_YMAX": ymax,
-            prefix + "_RADIUS": radius,
-        }
-
-        # Interpolate corresponding horizontal positions
-        xpos = np.zeros(len(r))
-        ypos = [int(y * radius + center) for y in r]
-
-        li = min(low_ind, high_ind)
-        hi = max(low_ind, high_ind)
-        inds = np.arange(li, hi)
-        for ind in inds:
-            for j in range(0, len(ypos)):
-                if abs(c[ind, 0, 1] - ypos[j]) < 3:
-                    xpos[j] = c[ind, 0, 0]
-        output[prefix + "_INTERP_XPOS"] = xpos
-    else:
-        ### Extract min/max ypos
-        low_ind = c[:, 0, 0].argmin()
-        xmin = c[low_ind, 0, 0]
-        high_ind = c[:, 0, 0].argmax()
-        xmax = c[high_ind, 0, 0]
-        center = int((xmin + xmax) / 2)
-        radius = int((xmax - xmin) / 2)
-
-        ### Setup output dictionary
-        output = {
-            prefix + "_R": r,
-            prefix + "_YCENTER": center,
-            prefix + "_YLOW": xmin,
-            prefix + "_CROP_YMAX": xmax,
-            prefix + "_RADIUS": radius,
-        }
-
-        # Interpolate corresponding horizontal positions
-        ypos = np.zeros(len(r))
-        xpos = [int(y * radius + center) for y in r]
-
-        li = min(low_ind, high_ind)
-        hi = max(low_ind, high_ind)
-        inds = np.arange(li, hi)
-        for ind in inds:
-            for j in range(0, len(xpos)):
-                if abs(c[ind, 0, 0] - xpos[j]) < 3:
-                    ypos[j] = c[ind, 0, 1]
-        output[prefix + "_INTERP_XPOS"] = ypos
-
-    return output.copy()
-
-
-def contoursAutoHSV(orig, log=None, flags={"UNDEREXPOSED": False}):
+    # Radial axis: y for horizontal flows, x for vertical flows
+    axis = 1 if flow_direction in ["right", "left"] else 0
+
+    ### Extract min/max radial positions
+    low_ind = c[:, 0, axis].argmin()
+    rmin = c[low_ind, 0, axis]
+    high_ind = c[:, 0, axis].argmax()
+    rmax = c[high_ind, 0, axis]
+    center = int((rmin + rmax) / 2)
+    radius = int((rmax - rmin) / 2)
+
+    ### Setup output dictionary
+    output = {
+        prefix + "_R": r,
+        prefix + "_YCENTER": center,
+        prefix + "_YLOW": rmin,
+        prefix + "_CROP_YMAX": rmax,
+        prefix + "_RADIUS": radius,
+    }
+
+    # Interpolate the edge position at each station between the extremes
+    li = min(low_ind, high_ind)
+    hi = max(low_ind, high_ind)
+    stations = np.asarray(r, dtype=float) * (rmax - rmin) / 2.0 + (rmin + rmax) / 2.0
+    # The flow meets the edge at its smallest x (right), largest x (left), largest y (up)
+    # or smallest y (down)
+    leading = np.minimum if flow_direction in ["right", "down"] else np.maximum
+    output[prefix + "_INTERP_XPOS"] = _interpEdge(
+        c[li : hi + 1, 0, :], axis, stations, leading
+    )
+
+    return output
+
+
+def contoursAutoHSV(orig, log=None, flags={"UNDEREXPOSED": False}, hsv=None, buffers=None):
     """
     Find contours using default union of multiple HSV ranges.
     Uses the BGR-HSV transformation to increase contrast.
@@ -177,31 +292,21 @@ def contoursAutoHSV(orig, log=None, flags={"UNDEREXPOSED": False}):
     :param orig: opencv 8bit BGR image
     :param flags: dictionary with flags
     :param log: log object
+    :param hsv: optional precomputed HSV transform of orig
+    :param buffers: optional dictionary of scratch arrays reused across frames
     :returns: model contour, shock contour, flags
     """
 
-    img = cv.cvtColor(orig, cv.COLOR_BGR2HSV)
-
-    ### HSV pixel ranges for models taken from sample frames
-    model_ranges = np.array([[(0, 0, 208), (155, 0, 155), (13, 20, 101), (0, 190, 100), (12, 150, 130)],
-                             [(180, 70, 255), (165, 125, 255), (33, 165, 255), (13, 245, 160), (25, 200, 250)]])
-    dim_model = np.array([[(7, 0, 8)], [(20, 185, 101)]])
+    img = cv.cvtColor(orig, cv.COLOR_BGR2HSV) if hsv is None else hsv
 
-    ### HSV pixel ranges for shocks taken from sample frames
-    shock_ranges = np.array([[(125, 78, 115)], [(145, 190, 230)]])
-    dim_shocks = np.array([[(125, 100, 35), (140, 30, 20), (118, 135, 30)], 
-                           [(165, 165, 150), (156, 90, 220), (128, 194, 125)]])
-
-    # Append additional ranges for underexposed images
-    if flags["UNDEREXPOSED"]:
-        model_ranges = np.hstack((model_ranges, dim_model))
+    # Classify every pixel against all model/shock ranges in one pass
+    labels = _AUTOHSV_CLASSIFIER.classify(img, buffers=buffers)
 
     # Apply shock filter and extract shock contour
-    shockfilter = filter_hsv_ranges(img, shock_ranges)
-    if shockfilter.sum() < 500:
+    shockfilter = _AUTOHSV_CLASSIFIER.mask(labels, "SHOCK", buffers=buffers)
+    if cv.countNonZero(shockfilter) * 255 < 500:
         flags["DIM_SHOCK"] = True
-        shock_ranges = np.hstack((shock_ranges, dim_shocks))
-        shockfilter = filter_hsv_ranges(img, shock_ranges)
+        shockfilter = _AUTOHSV_CLASSIFIER.mask(labels, "SHOCK", "DIM_SHOCK", buffers=buffers)
     shockcontours, _ = cv.findContours(shockfilter, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_NONE)
 
     # find the biggest shock contour (shockC) by area
@@ -213,8 +318,11 @@ def contoursAutoHSV(orig, log=None, flags={"UNDEREXPOSED": False}):
     else:
         shockC = max(shockcontours, key=cv.contourArea)
 
-    # Apply model filter and extract model contour
-    modelfilter = filter_hsv_ranges(img, model_ranges)
+    # Apply model filter, with additional ranges for underexposed images
+    if flags["UNDEREXPOSED"]:
+        modelfilter = _AUTOHSV_CLASSIFIER.mask(labels, "MODEL", "DIM_MODEL", buffers=buffers)
+    else:
+        modelfilter = _AUTOHSV_CLASSIFIER.mask(labels, "MODEL", buffers=buffers)
     if flags["UNDEREXPOSED"]:
         kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (5, 5))
         modelfilter = cv.morphologyEx(modelfilter, cv.MORPH_OPEN, kernel)
@@ -234,7 +342,7 @@ def contoursAutoHSV(orig, log=None, flags={"UNDEREXPOSED": False}):
     return contour_dict, flags
 
 
-def contoursHSV(orig, log=None, minHSVModel=(0, 0, 150), maxHSVModel=(181, 125, 256), minHSVShock=(125, 78, 115), maxHSVShock=(145, 190, 230)):
+def contoursHSV(orig, log=None, minHSVModel=(0, 0, 150), maxHSVModel=(181, 125, 256), minHSVShock=(125, 78, 115), maxHSVShock=(145, 190, 230), hsv=None):
     """
     Find contours using HSV ranges image.
     Uses the BGR-HSV transformation to increase contrast.
@@ -244,13 +352,15 @@ def contoursHSV(orig, log=None, minHSVModel=(0, 0, 150), maxHSVModel=(181, 125,
     :param maxHSVModel: maximum tuple for HSV range
     :param minHSVShock: minimum tuple for HSV range
     :param maxHSVShock: maximum tuple for HSV range
+    :param hsv: optional precomputed HSV transform of orig, blurred with a 5x5 Gaussian
     :returns: model contour, shock contour
     """
 
     flags = {"MODEL_CONTOUR_FAILED": False, "SHOCK_CONTOUR_FAILED": False}
-    # Load an color image in HSV, apply HSV transform again
-    hsv_ = cv.cvtColor(orig, cv.COLOR_BGR2HSV)
-    hsv = cv.GaussianBlur(hsv_, (5, 5), 0)
+    if hsv is None:
+        # Load an color image in HSV, apply HSV transform again
+        hsv_ = cv.cvtColor(orig, cv.COLOR_BGR2HSV)
+        hsv = cv.GaussianBlur(hsv_, (5, 5), 0)
 
     ### Model contours
     modelmask = cv.inRange(hsv, minHSVModel, maxHSVModel)
@@ -283,7 +393,7 @@ def contoursHSV(orig, log=None, minHSVModel=(0, 0, 150), maxHSVModel=(181, 125,
     return contour_dict, flags
 
 
-def contoursGRAY(orig, thresh=150, log=None):
+def contoursGRAY(orig, thresh=150, log=None, gray=None):
     """
     Detects contours in potentially overexposed images using a global grayscale threshold.
 
@@ -299,6 +409,7 @@ def contoursGRAY(orig, thresh=150, log=None):
                    Regions with grayscale values greater than this threshold will be considered as potential contour areas.
     :param log: An optional logging object with a `write` method to capture any logging messages.
                 Especially useful to track when contour detection fails. Default is None.
+    :param gray: Optional precomputed grayscale transform of `orig`, blurred with a 5x5 Gaussian.
 
     Returns:
     :return: A tuple containing:
@@ -318,11 +429,12 @@ def contoursGRAY(orig, thresh=150, log=None):
             cv.waitKey(0)
     """
     flags = {"SHOCK_CONTOUR_FAILED": True, "MODEL_CONTOUR_FAILED": True}
-    ### take channel with least saturation
-    gray_ = cv.cvtColor(orig, cv.COLOR_BGR2GRAY)
+    if gray is None:
+        ### take channel with least saturation
+        gray_ = cv.cvtColor(orig, cv.COLOR_BGR2GRAY)
+        gray = cv.GaussianBlur(gray_, (5, 5), 0)
 
     ### Global grayscale threshold
-    gray = cv.GaussianBlur(gray_, (5, 5), 0)
     _, th1 = cv.threshold(gray, thresh, 255, cv.THRESH_BINARY)
     contours, _ = cv.findContours(th1, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_NONE)
     if len(contours) != 0:
@@ -340,20 +452,22 @@ def contoursGRAY(orig, thresh=150, log=None):
     return contour_dict, flags
 
 
-def contoursCNN(orig, model, log=None):
+def contoursCNN(orig, model, log=None, cnnmask=None):
     """
     Find contours using HSV ranges image.
     Uses the BGR-HSV transformation to increase contrast.
 
     :param orig: opencv 8bit BGR image
     :param model: compiled CNN model
+    :param cnnmask: optional class mask already predicted for orig, e.g. by model.predict_batch
     :returns: model contour, shock contour
     """
 
     flags = {"MODEL_CONTOUR_FAILED": False, "SHOCK_CONTOUR_FAILED": False}
 
     ### Apply CNN
-    cnnmask = model.predict(orig)
+    if cnnmask is None:
+        cnnmask = model.predict(orig)
 
     ### Model contours
     modelmask = (((cnnmask == 1) | (cnnmask == 3)) * 255).astype(np.uint8)
@@ -0,0 +1,196 @@
+"""
+Post-training static INT8 quantization of the CNN segmentation model.
+
+The fp32 U-Net is exported to ONNX and quantized with onnxruntime, with activation
+ranges calibrated on square crops sampled from real arcjet videos (the same crops
+ArcjetProcessor feeds to the CNN). The result is loaded by CNN(backend="onnx_int8") and
+selected in ArcjetProcessor with SEGMENT_METHOD "CNN_INT8".
+
+Usage:
+    python -m arcjetCV.segmentation.contour.quantize build VIDEO [VIDEO ...] [--frames N]
+    python -m arcjetCV.segmentation.contour.quantize compare VIDEO [--frames N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from arcjetCV.segmentation.contour.cnn import CNN, INT8_ONNX_PATH, export_onnx, load_unet
+
+try:
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+except ImportError:
+    CalibrationDataReader = object
+    quantize_static = None
+
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """
+    Feeds preprocessed frames to the onnxruntime calibrator, one frame per batch.
+    """
+
+    def __init__(self, frames, cnn):
+        """
+        :param frames: list of opencv images
+        :param cnn: CNN instance providing the input preprocessing
+        """
+        self.frames = iter(frames)
+        self.cnn = cnn
+
+    def get_next(self):
+        frame = next(self.frames, None)
+        if frame is None:
+            return None
+        # preprocess reuses its buffer, the calibrator may keep the array
+        return {"input": self.cnn.preprocess([frame]).numpy().copy()}
+
+
+def sample_frames(video_paths, nframes=32):
+    """
+    Samples evenly spaced square crops from the good frames of each video.
+
+    :param video_paths: list of video files, each with (or given) a .meta file
+    :param nframes: number of frames sampled per video
+    :returns: list of square opencv images
+    """
+    from arcjetCV.utils.video import Video, VideoMeta
+    from arcjetCV.utils.processor import ArcjetProcessor
+
+    frames = []
+    for path in video_paths:
+        video = Video(str(path))
+        videometa = VideoMeta(video, os.path.join(video.folder, video.name + ".meta"))
+        processor = ArcjetProcessor(videometa)
+        first, last = videometa["FIRST_GOOD_FRAME"], videometa["LAST_GOOD_FRAME"]
+        for index in np.linspace(first, last, nframes).astype(int):
+            frame_crop, _ = processor.make_crop_square(video.get_frame(int(index)))
+            frames.append(frame_crop)
+        video.close()
+    return frames
+
+
+def quantize_cnn(frames, int8_path=INT8_ONNX_PATH, model=None):
+    """
+    Builds the statically quantized INT8 ONNX graph of the CNN.
+
+    Weights are quantized per channel to int8 and activations to uint8, with ranges
+    calibrated on the given frames.
+
+    :param frames: calibration images, e.g. from sample_frames
+    :param int8_path: output .onnx file
+    :param model: torch model to quantize, defaults to the packaged checkpoint
+    :returns: int8_path
+    """
+    if quantize_static is None:
+        raise ModuleNotFoundError(
+            "onnxruntime is required to quantize the CNN (pip install onnxruntime)"
+        )
+    if model is None:
+        model = load_unet()
+    cnn = CNN(model=model)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fp32_path = os.path.join(tmpdir, "cnn.onnx")
+        prep_path = os.path.join(tmpdir, "cnn_prep.onnx")
+        export_onnx(fp32_path, model, cnn.input_size)
+        quant_pre_process(fp32_path, prep_path)
+        quantize_static(
+            prep_path,
+            str(int8_path),
+            FrameCalibrationReader(frames, cnn),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8,
+        )
+    return int8_path
+
+
+def mask_iou(mask0, mask1):
+    """
+    Intersection over union of two boolean masks, 1.0 when both are empty.
+
+    :param mask0: boolean array
+    :param mask1: boolean array of the same shape
+    :returns: float
+    """
+    union = np.logical_or(mask0, mask1).sum()
+    if union == 0:
+        return 1.0
+    return np.logical_and(mask0, mask1).sum() / union
+
+
+def compare_masks(cnn_ref, cnn_test, frames):
+    """
+    Compares the MODEL and SHOCK masks of two CNN variants, as contoursCNN builds them.
+
+    :param cnn_ref: reference CNN, e.g. fp32
+    :param cnn_test: CNN under test, e.g. INT8
+    :param frames: list of opencv images
+    :returns: dictionary with per-frame MODEL_IOU and SHOCK_IOU arrays and the
+              frames per second of each variant (REF_FPS, TEST_FPS)
+    """
+    results = {"MODEL_IOU": [], "SHOCK_IOU": []}
+    times = [0.0, 0.0]
+    for frame in frames:
+        masks = []
+        for i, cnn in enumerate((cnn_ref, cnn_test)):
+            t0 = time.perf_counter()
+            masks.append(cnn.predict(frame))
+            times[i] += time.perf_counter() - t0
+        ref, test = masks
+        results["MODEL_IOU"].append(mask_iou((ref == 1) | (ref == 3), (test == 1) | (test == 3)))
+        results["SHOCK_IOU"].append(mask_iou(ref == 2, test == 2))
+    results["MODEL_IOU"] = np.array(results["MODEL_IOU"])
+    results["SHOCK_IOU"] = np.array(results["SHOCK_IOU"])
+    results["REF_FPS"] = len(frames) / times[0]
+    results["TEST_FPS"] = len(frames) / times[1]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build and evaluate the INT8 quantized CNN segmentation model."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="calibrate and write the INT8 model")
+    build.add_argument("videos", nargs="+", help="calibration videos")
+    build.add_argument("--frames", type=int, default=32, help="frames sampled per video")
+    build.add_argument("--output", default=str(INT8_ONNX_PATH), help="INT8 .onnx file")
+
+    compare = subparsers.add_parser("compare", help="IoU of INT8 masks against fp32")
+    compare.add_argument("videos", nargs="+", help="evaluation videos")
+    compare.add_argument("--frames", type=int, default=16, help="frames sampled per video")
+    compare.add_argument("--int8", default=str(INT8_ONNX_PATH), help="INT8 .onnx file")
+    compare.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads")
+
+    args = parser.parse_args(argv)
+    frames = sample_frames(args.videos, args.frames)
+
+    if args.command == "build":
+        print(f"Calibrating on {len(frames)} frames ...")
+        print(f"Wrote {quantize_cnn(frames, args.output)}")
+        return
+
+    cnn_fp32 = CNN(backend="onnx", intra_op_threads=args.threads)
+    cnn_int8 = CNN(backend="onnx_int8", onnx_path=args.int8, intra_op_threads=args.threads)
+    results = compare_masks(cnn_fp32, cnn_int8, frames)
+    for key in ["MODEL_IOU", "SHOCK_IOU"]:
+        iou = results[key]
+        print(f"{key}: mean {iou.mean():.4f}, min {iou.min():.4f}")
+    print(
+        f"fp32 {results['REF_FPS']:.2f} frames/s, int8 {results['TEST_FPS']:.2f} frames/s "
+        f"({results['TEST_FPS'] / results['REF_FPS']:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
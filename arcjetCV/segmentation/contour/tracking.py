@@ -0,0 +1,112 @@
+import cv2 as cv
+import numpy as np
+
+
+class MaskPropagator:
+    """
+    Keyframe-plus-tracking segmentation for slowly changing frame sequences.
+
+    The (expensive) segmentation only runs on keyframes: the first frame, every
+    keyframe_interval frames, and any frame whose mean absolute grayscale difference to
+    the last keyframe exceeds change_threshold. Masks of the frames in between are the
+    previous mask warped by dense optical flow, computed on downscaled grayscale frames.
+
+    Example:
+        >>> propagator = MaskPropagator(keyframe_interval=10)
+        >>> for frame in frames:
+        ...     mask, is_keyframe = propagator.segment(frame, cnn.predict)
+    """
+
+    def __init__(self, keyframe_interval=10, change_threshold=4.0, flow_size=256):
+        """
+        :param keyframe_interval: maximum number of frames between keyframes
+        :param change_threshold: mean absolute difference (gray levels, 0-255) to the last
+                                 keyframe that forces a new keyframe
+        :param flow_size: longest side of the downscaled frames used for change detection
+                          and optical flow
+        """
+        self.keyframe_interval = keyframe_interval
+        self.change_threshold = change_threshold
+        self.flow_size = flow_size
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the tracked sequence; the next frame is a keyframe.
+        """
+        self.mask = None
+        self.shape = None
+        self.key_small = None
+        self.prev_small = None
+        self.since_keyframe = 0
+        self._grid = None
+
+    def _small_gray(self, frame):
+        """
+        Downscaled grayscale copy of the frame.
+        """
+        h, w = frame.shape[:2]
+        f = self.flow_size / max(h, w)
+        size = (max(1, round(w * f)), max(1, round(h * f)))
+        gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv.resize(gray, size, interpolation=cv.INTER_AREA)
+
+    def needs_keyframe(self, small):
+        """
+        Whether the frame with downscaled grayscale `small` must be segmented.
+
+        :param small: downscaled grayscale frame
+        :returns: bool
+        """
+        if self.mask is None or small.shape != self.key_small.shape:
+            return True
+        if self.since_keyframe + 1 >= self.keyframe_interval:
+            return True
+        return cv.mean(cv.absdiff(small, self.key_small))[0] > self.change_threshold
+
+    def propagate(self, small):
+        """
+        Warps the previous mask onto the current frame.
+
+        :param small: downscaled grayscale current frame
+        :returns: propagated mask, same shape and type as the previous one
+        """
+        # Flow from the current to the previous frame: cur(p) ~ prev(p + flow(p))
+        flow = cv.calcOpticalFlowFarneback(
+            small, self.prev_small, None, 0.5, 3, 15, 3, 5, 1.2, 0
+        )
+        h, w = self.shape
+        fy, fx = h / small.shape[0], w / small.shape[1]
+        flow = cv.resize(flow, (w, h), interpolation=cv.INTER_LINEAR)
+        if self._grid is None or self._grid[0].shape != (h, w):
+            self._grid = np.meshgrid(
+                np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32)
+            )
+        map_x = self._grid[0] + flow[..., 0] * fx
+        map_y = self._grid[1] + flow[..., 1] * fy
+        return cv.remap(
+            self.mask, map_x, map_y, cv.INTER_NEAREST, borderMode=cv.BORDER_REPLICATE
+        )
+
+    def segment(self, frame, predict):
+        """
+        Returns the mask of the next frame in the sequence.
+
+        :param frame: opencv image
+        :param predict: function returning the mask of a frame, called on keyframes
+        :returns: mask: uint8 class mask of the frame
+                  is_keyframe: True if predict was called for this frame
+        """
+        small = self._small_gray(frame)
+        is_keyframe = self.needs_keyframe(small)
+        if is_keyframe:
+            mask = predict(frame).astype(np.uint8, copy=False)
+            self.key_small = small
+            self.since_keyframe = 0
+        else:
+            mask = self.propagate(small)
+            self.since_keyframe += 1
+        self.mask = mask
+        self.shape = mask.shape[:2]
+        self.prev_small = small
+        return mask, is_keyframe
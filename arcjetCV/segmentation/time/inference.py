@@ -0,0 +1,372 @@
+"""
+PyTorch-free time segmentation of arcjet videos.
+
+NumpyConv1DNet reproduces Conv1DNet.forward with NumPy, using weights exported once
+from the PyTorch checkpoint to .npz:
+
+    python -m arcjetCV.segmentation.time.time_segmentation [time-weights.npz]
+
+A time-weights.npz next to the checkpoint is used when present. Otherwise the first
+segmentation without it runs the export into the user model directory (see
+cached_time_weights_path), so only that run imports torch and later runs and
+processes use NumPy.
+"""
+
+import threading
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import interpolate
+from pathlib import Path
+
+from arcjetCV.utils.meta_cache import default_model_dir, file_digest
+
+TIME_WEIGHTS_PATH = Path(__file__).parent.absolute().joinpath("time-weights.npz")
+TIME_CHECKPOINT_PATH = Path(__file__).parent.absolute().joinpath("time-checkpoint.pt")
+TRACE_LENGTH = 500
+
+
+def extract_interest(signal):
+    """Extract the starts and ends of a signal that is the mean brightness of frames
+    Args:
+        signal (array): mean brightness signal of frames
+    Returns:
+        arrays: start and end indexes
+    """
+    start = []
+    end = []
+    for index, i in enumerate(signal):
+        if index == 0 and i > 0.5:
+            start.append(index)
+        elif signal[index - 1] <= 0.5 and i > 0.5:
+            start.append(index)
+        elif signal[index - 1] >= 0.5 and i < 0.5:
+            end.append(index)
+    if signal[-1] > 0.5:
+        end.append(len(signal) - 1)
+    return start, end
+
+
+def trace_sample_indices(nframes, max_sampled_frames=120):
+    """Indices of the frames sampled for the brightness trace.
+
+    Args:
+        nframes (int): number of frames of the video
+        max_sampled_frames (int): maximum number of samples
+    Returns:
+        array: evenly spaced frame indices, one every 10 frames at most
+    """
+    baseline_samples = max(2, ((nframes - 1) // 10) + 1)
+    nsamples = min(max_sampled_frames, baseline_samples)
+    return np.linspace(0, nframes - 1, num=nsamples, dtype=int)
+
+
+def sample_brightness(frame):
+    """Brightness feature of one sampled frame, as used to train the network.
+
+    The central 60% rows are downsampled, eroded, and averaged over the HSV V channel.
+    V is the maximum of the color channels, so RGB and BGR frames give the same value.
+
+    Args:
+        frame (array): RGB or BGR image
+    Returns:
+        float: mean brightness, or None if the region is empty
+    """
+    h = frame.shape[0]
+    y0 = int(0.2 * h)
+    y1 = int(0.8 * h)
+    roi = frame[y0:y1, :]
+    if roi.size == 0:
+        return None
+
+    # Downsample before computing brightness to speed up loading on large frames.
+    max_dim = 256
+    if max(roi.shape[0], roi.shape[1]) > max_dim:
+        scale = max_dim / float(max(roi.shape[0], roi.shape[1]))
+        roi = cv2.resize(
+            roi,
+            (
+                max(1, int(roi.shape[1] * scale)),
+                max(1, int(roi.shape[0] * scale)),
+            ),
+            interpolation=cv2.INTER_AREA,
+        )
+
+    # Keep feature extraction aligned with the checkpoint training pipeline:
+    # erode + HSV V-channel brightness.
+    kernel = np.ones((20, 20), np.uint8)
+    roi = cv2.erode(roi, kernel, cv2.BORDER_REFLECT)
+    hsv = cv2.cvtColor(roi, cv2.COLOR_RGB2HSV)
+    return np.mean(hsv[:, :, 2])
+
+
+def resample_trace(indices, values, nframes):
+    """Normalizes sampled brightness values and resamples them to TRACE_LENGTH points.
+
+    Args:
+        indices (array): frame indices of the samples
+        values (array): sample_brightness of those frames
+        nframes (int): number of frames of the video
+    Returns:
+        array: (500,) brightness trace scaled to [0, 1]
+    """
+    if len(values) < 2:
+        raise RuntimeError("Insufficient sampled frames for time segmentation.")
+
+    Value = np.array(values, dtype=float)
+    value_range = np.ptp(Value)
+    if value_range <= 0:
+        raise RuntimeError("Brightness signal is constant; cannot segment in time.")
+    Value = (Value - np.min(Value)) / value_range
+
+    nFrame = np.array(indices, dtype=float) / max(1, nframes - 1) * 500.0
+    p = interpolate.interp1d(nFrame, Value, fill_value="extrapolate")
+    reg = np.linspace(0, TRACE_LENGTH, TRACE_LENGTH)
+    return np.array(p(reg), dtype=np.float32)
+
+
+def brightness_trace(video, progress_callback=None):
+    """Samples the normalized brightness of a video, resampled to TRACE_LENGTH points.
+
+    Args:
+        video (Video): video to sample
+        progress_callback (callable): progress(percent, message)
+    Returns:
+        array: (500,) brightness trace scaled to [0, 1]
+    """
+    sample_indices = trace_sample_indices(video.nframes)
+    nsamples = len(sample_indices)
+
+    nFrame = []
+    Value = []
+    if progress_callback is not None:
+        progress_callback(0, "Detecting sample insertion")
+    for frame_index in sample_indices:
+        try:
+            value = sample_brightness(video.get_frame(int(frame_index)))
+            if value is None:
+                continue
+            Value.append(value)
+            nFrame.append(frame_index)
+            if progress_callback is not None:
+                progress = int((len(Value) / max(1, nsamples)) * 100)
+                progress_callback(progress, "Detecting sample insertion...")
+        except Exception:
+            pass
+
+    return resample_trace(nFrame, Value, video.nframes)
+
+
+def conv1d(x, weight, bias, stride=1, padding=0):
+    """NumPy equivalent of torch.nn.functional.conv1d.
+
+    Args:
+        x (array): (N, C_in, L) input
+        weight (array): (C_out, C_in, K) kernels
+        bias (array): (C_out,) bias
+        stride (int): stride
+        padding (int): zero padding on both sides
+    Returns:
+        array: (N, C_out, L_out) output
+    """
+    x = np.pad(x, ((0, 0), (0, 0), (padding, padding)))
+    windows = sliding_window_view(x, weight.shape[-1], axis=2)[:, :, ::stride]
+    return np.einsum("nclk,ock->nol", windows, weight, optimize=True) + bias[:, None]
+
+
+def conv_transpose1d(x, weight, bias, stride=1, padding=0, output_padding=0):
+    """NumPy equivalent of torch.nn.functional.conv_transpose1d.
+
+    Computed as a stride-1 convolution of the zero-interleaved, padded input with the
+    flipped kernels.
+
+    Args:
+        x (array): (N, C_in, L) input
+        weight (array): (C_in, C_out, K) kernels
+        bias (array): (C_out,) bias
+        stride (int): stride
+        padding (int): padding removed from both sides of the output
+        output_padding (int): extra samples added to the end of the output
+    Returns:
+        array: (N, C_out, (L - 1) * stride - 2 * padding + K + output_padding) output
+    """
+    n, c, length = x.shape
+    k = weight.shape[-1]
+    dilated = np.zeros((n, c, (length - 1) * stride + 1), dtype=x.dtype)
+    dilated[:, :, ::stride] = x
+    pad = k - 1 - padding
+    dilated = np.pad(dilated, ((0, 0), (0, 0), (pad, pad + output_padding)))
+    return conv1d(dilated, weight.transpose(1, 0, 2)[:, :, ::-1], bias)
+
+
+def softmax(x, axis):
+    """NumPy equivalent of torch.softmax."""
+    e = np.exp(x - x.max(axis=axis, keepdims=True))
+    return e / e.sum(axis=axis, keepdims=True)
+
+
+class NumpyConv1DNet:
+    """
+    Inference-only NumPy implementation of Conv1DNet (dropout is disabled).
+
+    Example:
+        >>> model = NumpyConv1DNet()
+        >>> classes = model.predict(trace)
+    """
+
+    def __init__(self, weights_path=TIME_WEIGHTS_PATH):
+        """
+        :param weights_path: .npz file of the Conv1DNet state dict, as written by
+                             export_time_weights
+        """
+        with np.load(weights_path) as data:
+            self.params = {key: data[key].astype(np.float32) for key in data.files}
+
+    def _conv(self, name, x, **kwargs):
+        return conv1d(x, self.params[name + ".weight"], self.params[name + ".bias"], **kwargs)
+
+    def _deconv(self, name, x, **kwargs):
+        return conv_transpose1d(
+            x, self.params[name + ".weight"], self.params[name + ".bias"], **kwargs
+        )
+
+    def forward(self, x):
+        """
+        Class probabilities of brightness traces.
+
+        :param x: (N, 1, L) float32 traces
+        :returns: (N, 3, L) softmax probabilities
+        """
+        x = np.maximum(self._conv("conv1", x, stride=2, padding=3), 0)
+        x = np.maximum(self._conv("conv2", x, stride=2, padding=3), 0)
+        x = np.maximum(self._deconv("convtrans1", x, stride=2, padding=3, output_padding=1), 0)
+        x = np.maximum(self._deconv("convtrans2", x, stride=2, padding=3, output_padding=1), 0)
+        x = self._deconv("convtrans3", x, stride=1, padding=1)
+        return softmax(x, axis=1)
+
+    __call__ = forward
+
+    def predict(self, traces):
+        """
+        Predicted class of each sample of one or several brightness traces.
+
+        :param traces: (N, L) or (L,) traces
+        :returns: int64 array with the shape of traces
+        """
+        traces = np.asarray(traces, dtype=np.float32)
+        probabilities = self.forward(traces.reshape(-1, 1, traces.shape[-1]))
+        return probabilities.argmax(axis=1).reshape(traces.shape)
+
+
+def cached_time_weights_path(checkpoint_path=None):
+    """
+    Exported weights of a checkpoint in the user model directory.
+
+    The file name carries the checkpoint hash, so a replaced checkpoint is exported
+    again instead of reusing stale weights.
+
+    :param checkpoint_path: state dict of the network, defaults to TIME_CHECKPOINT_PATH
+    :returns: Path under default_model_dir()
+    """
+    if checkpoint_path is None:
+        checkpoint_path = TIME_CHECKPOINT_PATH
+    checkpoint_path = Path(checkpoint_path)
+    if checkpoint_path.exists():
+        name = f"time-weights-{file_digest(checkpoint_path)[:16]}.npz"
+    else:
+        name = "time-weights.npz"
+    return default_model_dir() / name
+
+
+_models = {}
+_models_lock = threading.Lock()
+_export_lock = threading.Lock()
+_export_failed = set()
+
+
+def get_numpy_time_model(weights_path=None):
+    """
+    Returns the process-wide NumpyConv1DNet for a weights file, or None if it is missing.
+
+    :param weights_path: .npz weights, defaults to TIME_WEIGHTS_PATH when it exists,
+                         else to cached_time_weights_path()
+    :returns: NumpyConv1DNet or None
+    """
+    if weights_path is None:
+        weights_path = TIME_WEIGHTS_PATH
+        if not weights_path.exists():
+            weights_path = cached_time_weights_path()
+    weights_path = Path(weights_path).resolve()
+    if not weights_path.exists():
+        return None
+    stat = weights_path.stat()
+    key = (str(weights_path), stat.st_size, stat.st_mtime_ns)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = _models[key] = NumpyConv1DNet(weights_path)
+    return model
+
+
+def export_cached_time_weights():
+    """Exports the packaged checkpoint to cached_time_weights_path() with PyTorch.
+
+    Tried once per process and checkpoint; a failure (no torch, checkpoint missing or
+    not fetched from git LFS) is reported and leaves the PyTorch fallback in place.
+
+    Returns:
+        NumpyConv1DNet: network of the exported weights, or None if the export failed
+    """
+    npz_path = cached_time_weights_path()
+    with _export_lock:
+        if not npz_path.exists():
+            if npz_path in _export_failed:
+                return None
+            try:
+                from arcjetCV.segmentation.time.time_segmentation import export_time_weights
+
+                export_time_weights(npz_path, TIME_CHECKPOINT_PATH)
+                print(f"[INFO] Exported time-segmentation weights to {npz_path}")
+            except Exception as e:
+                _export_failed.add(npz_path)
+                print(f"[WARNING] Could not export time-segmentation weights: {e}")
+                return None
+    return get_numpy_time_model(npz_path)
+
+
+def segment_trace(trace, model=None):
+    """Predicted class of each sample of a brightness trace.
+
+    Uses the NumPy network when its weights exist, exporting them on first use
+    (export_cached_time_weights), else the PyTorch one.
+
+    Args:
+        trace (array): (500,) brightness trace
+        model (NumpyConv1DNet or Conv1DNet): network to use, defaults to
+            get_numpy_time_model()
+    Returns:
+        array: predicted class of the 500 samples
+    """
+    if model is None:
+        model = get_numpy_time_model() or export_cached_time_weights()
+    if not isinstance(model, NumpyConv1DNet):
+        from arcjetCV.segmentation.time.time_segmentation import segment_traces
+
+        return segment_traces(trace, model)
+    return model.predict(trace)
+
+
+def time_segmentation(video, progress_callback=None, model=None):
+    """apply a segmentation on a the mean brightness of frames of a video
+
+    Args:
+        video (Video): video to segment
+        progress_callback (callable): progress(percent, message)
+        model (NumpyConv1DNet or Conv1DNet): network to use, see segment_trace
+    Returns:
+        arrays: brightness trace and predicted class of its 500 samples
+    """
+    trace = brightness_trace(video, progress_callback)
+    if progress_callback is not None:
+        progress_callback(100, "Detecting sample insertion")
+    return trace, segment_trace(trace, model)
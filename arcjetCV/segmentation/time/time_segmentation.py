@@ -1,10 +1,21 @@
-import cv2
+import os
+import tempfile
+import threading
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from scipy import interpolate
 from pathlib import Path
+# time_segmentation lives in inference.py and is re-exported here for existing imports
+from arcjetCV.segmentation.time.inference import (
+    TIME_CHECKPOINT_PATH,
+    TIME_WEIGHTS_PATH,
+    TRACE_LENGTH,
+    brightness_trace,
+    extract_interest,
+    time_segmentation,
+)
+
 
 
 def _torch_load_compat(path, **kwargs):
@@ -14,110 +25,100 @@ def _torch_load_compat(path, **kwargs):
         return torch.load(path, **kwargs)
 
 
-def extract_interest(signal):
-    """Extract the starts and ends of a signal that is the mean brightness of frames
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_time_model(checkpoint_path=TIME_CHECKPOINT_PATH, script=False):
+    """Returns the process-wide Conv1DNet for a checkpoint, loading it on first request.
+
+    The model is cached per checkpoint path, size and modification time, so a
+    replaced checkpoint is reloaded.
+
     Args:
-        signal (array): mean brightness signal of frames
+        checkpoint_path (str or Path): state dict of the network
+        script (bool): compile the model with TorchScript
     Returns:
-        arrays: start and end indexes
+        Conv1DNet or torch.jit.ScriptModule in evaluation mode
     """
-    start = []
-    end = []
-    for index, i in enumerate(signal):
-        if index == 0 and i > 0.5:
-            start.append(index)
-        elif signal[index - 1] <= 0.5 and i > 0.5:
-            start.append(index)
-        elif signal[index - 1] >= 0.5 and i < 0.5:
-            end.append(index)
-    if signal[-1] > 0.5:
-        end.append(len(signal) - 1)
-    return start, end
-
-
-def time_segmentation(video, progress_callback=None):
-    """apply a segmentation on a the mean brightness of frames of a video
+    checkpoint_path = Path(checkpoint_path).resolve()
+    stat = checkpoint_path.stat()
+    key = (str(checkpoint_path), stat.st_size, stat.st_mtime_ns, script)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = Conv1DNet()
+            model.load_state_dict(_torch_load_compat(checkpoint_path))
+            model.eval()
+            if script:
+                model = torch.jit.script(model)
+            _models[key] = model
+    return model
+
+
+def clear_time_models():
+    """Drops all cached time-segmentation models."""
+    with _models_lock:
+        _models.clear()
+
+
+def segment_traces(traces, model=None):
+    """Segments normalized brightness traces in a single forward pass.
+
+    Args:
+        traces (array): (N, 500) or (500,) brightness traces resampled to TRACE_LENGTH
+        model (Conv1DNet): network to use, defaults to get_time_model()
+    Returns:
+        array: int64 predicted class per sample, with the shape of traces
     """
-    max_sampled_frames = 120
-    baseline_samples = max(2, ((video.nframes - 1) // 10) + 1)
-    nsamples = min(max_sampled_frames, baseline_samples)
-    sample_indices = np.linspace(0, video.nframes - 1, num=nsamples, dtype=int)
-
-    nFrame = []
-    Value = []
-    if progress_callback is not None:
-        progress_callback(0, "Detecting sample insertion")
-    for frame_index in sample_indices:
-        try:
-            _frame = video.get_frame(int(frame_index))
-            h = _frame.shape[0]
-            y0 = int(0.2 * h)
-            y1 = int(0.8 * h)
-            roi = _frame[y0:y1, :]
-            if roi.size == 0:
-                continue
-
-            # Downsample before computing brightness to speed up loading on large frames.
-            max_dim = 256
-            if max(roi.shape[0], roi.shape[1]) > max_dim:
-                scale = max_dim / float(max(roi.shape[0], roi.shape[1]))
-                roi = cv2.resize(
-                    roi,
-                    (
-                        max(1, int(roi.shape[1] * scale)),
-                        max(1, int(roi.shape[0] * scale)),
-                    ),
-                    interpolation=cv2.INTER_AREA,
-                )
-
-            # Keep feature extraction aligned with the checkpoint training pipeline:
-            # erode + HSV V-channel brightness.
-            kernel = np.ones((20, 20), np.uint8)
-            roi = cv2.erode(roi, kernel, cv2.BORDER_REFLECT)
-            hsv = cv2.cvtColor(roi, cv2.COLOR_RGB2HSV)
-            Value.append(np.mean(hsv[:, :, 2]))
-            nFrame.append((frame_index / max(1, video.nframes - 1)) * 500.0)
-            if progress_callback is not None:
-                progress = int((len(Value) / max(1, nsamples)) * 100)
-                progress_callback(progress, "Detecting sample insertion...")
-        except Exception:
-            pass
-
-    if len(Value) < 2:
-        raise RuntimeError("Insufficient sampled frames for time segmentation.")
-
-    Value = np.array(Value, dtype=float)
-    value_range = np.ptp(Value)
-    if value_range <= 0:
-        raise RuntimeError("Brightness signal is constant; cannot segment in time.")
-    Value = (Value - np.min(Value)) / value_range
-
-    nFrame = np.array(nFrame, dtype=float)
-    p = interpolate.interp1d(nFrame, Value, fill_value="extrapolate")
-    reg = np.linspace(0, 500, 500)
-
-    model = Conv1DNet()
-    checkpoint_path = Path(__file__).parent.absolute().joinpath(Path('time-checkpoint.pt'))
-    model.load_state_dict(_torch_load_compat(checkpoint_path))
-    if progress_callback is not None:
-        progress_callback(100, "Detecting sample insertion")
-    input = np.array(p(reg))
-
-    # Prepare input tensor with shape [1, 1, 500]
-    input = torch.tensor(input, dtype=torch.float).unsqueeze(0).unsqueeze(1)
-    model.eval()  # Switch to evaluation mode
-    with torch.no_grad():  # Disable gradient computation
-        test_output = model(input)
-        probabilities = F.softmax(
-            test_output, dim=1
-        )  # Optional: convert logits to probabilities
-        predictions = torch.argmax(probabilities, dim=1).squeeze()  # Predicted classes
-
-    # Flatten input and probabilities for plotting and analysis
-    input = input.squeeze().cpu().numpy()
-    out = predictions.squeeze().cpu().numpy()
-
-    return input, out
+    if model is None:
+        model = get_time_model()
+    traces = np.asarray(traces, dtype=np.float32)
+    x = torch.from_numpy(traces.reshape(-1, 1, traces.shape[-1]))
+    with torch.no_grad():
+        predictions = torch.argmax(model(x), dim=1)
+    return predictions.numpy().reshape(traces.shape)
+
+
+def export_time_weights(npz_path=TIME_WEIGHTS_PATH, checkpoint_path=TIME_CHECKPOINT_PATH):
+    """Exports the checkpoint weights to .npz for the PyTorch-free NumpyConv1DNet.
+
+    The file is written next to npz_path and renamed into place, so concurrent
+    exports never leave partial weights behind.
+
+    Args:
+        npz_path (str or Path): output file
+        checkpoint_path (str or Path): state dict of the network
+    Returns:
+        npz_path
+    """
+    state = get_time_model(checkpoint_path).state_dict()
+    npz_dir = Path(npz_path).parent
+    npz_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=npz_dir, suffix=".npz.tmp")
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            np.savez(fout, **{key: value.numpy() for key, value in state.items()})
+        os.replace(tmp_path, npz_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return npz_path
+
+
+def time_segmentation_batch(videos, progress_callback=None, model=None):
+    """Segments several videos, running the network once on all brightness traces.
+
+    Args:
+        videos (list): Video objects
+        progress_callback (callable): progress(percent, message), per video
+        model (Conv1DNet): network to use, defaults to the cached get_time_model()
+    Returns:
+        list: (trace, predictions) per video, as returned by time_segmentation
+    """
+    traces = np.stack([brightness_trace(video, progress_callback) for video in videos])
+    outputs = segment_traces(traces, model)
+    return list(zip(traces, outputs))
 
 
 class Conv1DNet(nn.Module):
@@ -163,3 +164,11 @@ class Conv1DNet(nn.Module):
         # Applying softmax on the last dimension (channels) to get probabilities
         x = F.softmax(x, dim=1)
         return x
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m arcjetCV.segmentation.time.time_segmentation [time-weights.npz]
+    npz_path = sys.argv[1] if len(sys.argv) > 1 else TIME_WEIGHTS_PATH
+    print(f"Exported {export_time_weights(npz_path)}")
@@ -0,0 +1,214 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+FINGERPRINT_BLOCKS = 16
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+
+def default_cache_dir():
+    """
+    Directory of the default metadata cache: $ARCJETCV_CACHE_DIR, else
+    ~/.cache/arcjetCV/meta.
+
+    :returns: Path
+    """
+    root = os.environ.get("ARCJETCV_CACHE_DIR")
+    if root:
+        return Path(root)
+    return Path.home() / ".cache" / "arcjetCV" / "meta"
+
+
+def default_model_dir():
+    """
+    Directory of model files derived at run time (exported ONNX graphs and time
+    segmentation weights): $ARCJETCV_MODEL_DIR, else ~/.cache/arcjetCV/models.
+
+    The package directory may be read-only, so nothing is written next to the
+    packaged checkpoints.
+
+    :returns: Path
+    """
+    root = os.environ.get("ARCJETCV_MODEL_DIR")
+    if root:
+        return Path(root)
+    return Path.home() / ".cache" / "arcjetCV" / "models"
+
+
+_digests = {}
+
+
+def file_digest(path):
+    """
+    SHA-256 of a file, cached per path, size and modification time.
+
+    :param path: file path
+    :returns: hex digest string
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _digests:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        _digests[key] = sha.hexdigest()
+    return _digests[key]
+
+
+def video_fingerprint(path, nblocks=FINGERPRINT_BLOCKS, block_size=FINGERPRINT_BLOCK_SIZE):
+    """
+    Cheap content fingerprint of a video file.
+
+    SHA-256 of the file size and of nblocks evenly spaced blocks of the file (first and
+    last included), so only nblocks * block_size bytes are read. The path and the
+    modification time are not part of it: a moved or copied video keeps its
+    fingerprint, while a re-encoded or replaced one gets a new one.
+
+    :param path: video file
+    :param nblocks: number of sampled blocks
+    :param block_size: bytes per block
+    :returns: hex digest
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= nblocks * block_size:
+            digest.update(f.read())
+        else:
+            last = size - block_size
+            for i in range(nblocks):
+                f.seek(last * i // (nblocks - 1))
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+class MetaCache(object):
+    """
+    Persistent per-video metadata cache, one JSON file per video fingerprint.
+
+    Entries hold the metadata computed from the video (size, brightness trace, first and
+    last good frames from the time segmentation) and the user's settings saved with it
+    (flow direction, crop, notes). Reading an entry refreshes its modification time and
+    the least recently used entries are evicted when a write takes the cache beyond
+    max_entries, so entries of replaced or deleted videos expire on their own. The
+    directory is listed once per instance to count the entries; get_meta_cache shares
+    one instance per directory within a process.
+
+    Example:
+    ```python
+    cache = MetaCache()
+    fingerprint = video_fingerprint('video.mp4')
+    meta = cache.get(fingerprint)
+    ```
+    """
+
+    def __init__(self, cache_dir=None, max_entries=2000):
+        """
+        :param cache_dir: cache directory, defaults to default_cache_dir()
+        :param max_entries: maximum number of cached videos
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        self.max_entries = max_entries
+        self._nentries = None  # counted on the first put
+        self._lock = threading.Lock()
+
+    def _entry_path(self, fingerprint):
+        return self.cache_dir / (fingerprint + ".json")
+
+    def get(self, fingerprint):
+        """
+        Cached metadata of a video.
+
+        :param fingerprint: video_fingerprint of the video
+        :returns: dictionary, or None if not cached
+        """
+        path = self._entry_path(fingerprint)
+        try:
+            with open(path, "r") as fin:
+                entry = json.load(fin)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, fingerprint, meta):
+        """
+        Stores the metadata of a video, replacing any previous entry.
+
+        :param fingerprint: video_fingerprint of the video
+        :param meta: JSON-serializable dictionary
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._entry_path(fingerprint)
+        new = not path.exists()
+        # Write then rename, so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as fout:
+                json.dump(meta, fout)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if self._nentries is None:
+                self._nentries = len(self)
+            elif new:
+                self._nentries += 1
+            if self._nentries > self.max_entries:
+                self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries beyond max_entries.
+        """
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                pass
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries :]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self._nentries = min(len(entries), self.max_entries)
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink()
+        self._nentries = 0
+
+    def __len__(self):
+        return len(list(self.cache_dir.glob("*.json")))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_meta_cache(cache_dir=None):
+    """
+    Returns the process-wide MetaCache of a directory, creating it on first request.
+
+    :param cache_dir: cache directory, defaults to default_cache_dir()
+    :returns: shared MetaCache
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    key = str(cache_dir.resolve())
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = MetaCache(cache_dir)
+    return cache
@@ -1,4 +1,6 @@
+import os
 import json
+import shutil
 import threading
 import numpy as np
 import datetime
@@ -41,6 +43,84 @@ class NumpyEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+def _index_range(name):
+    """
+    Splits an output filename into its prefix and INDEX range, e.g. "myoutput_0_10".
+
+    :param name: filename without folder and extension
+    :returns: prefix (list of name parts), low index, high index
+    """
+    namesplit = name.split('_')
+    return namesplit[0:-2], int(namesplit[-2]), int(namesplit[-1])
+
+
+class _StreamingOutput(object):
+    '''
+    Base of the writers that stream frames to disk, with the same append interface as OutputListJSON.
+
+    append keeps the frames whose INDEX is within the range given by the filename and passes them to _append under the lock. Subclasses implement _append, close, and _discard, which releases the open files of a failed run before abort removes them.
+
+    Attributes:
+        path (str): Path of the output.
+        folder (str): Directory containing the output.
+        _lock (threading.Lock): Threading lock for thread-safe operations.
+        prefix (list): Prefix extracted from the filename.
+        low_index (int): Low index constraint extracted from the filename.
+        high_index (int): High index constraint extracted from the filename.
+    '''
+
+    # Name of the output in the message printed by write
+    kind = "Edges"
+
+    def __init__(self, path):
+        self.path = path
+        folder, name, _ = splitfn(path)
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._count = 0
+        self.prefix, self.low_index, self.high_index = _index_range(name)
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, obj):
+        """
+        Stores an object if its INDEX is within the specified range.
+
+        :param obj: Object to append.
+        """
+        with self._lock:
+            if obj["INDEX"] <= self.high_index and obj["INDEX"] >= self.low_index:
+                self._append(obj)
+                self._count += 1
+
+    def write(self, indent=None):
+        """
+        Finalizes and closes the output at the end of a run, mirroring OutputListJSON.write.
+
+        :param indent: Unused, kept for interface compatibility.
+        """
+        self.close()
+        print(f"\n\n{self.kind} output written to", self.path)
+
+    def abort(self):
+        """
+        Closes and removes the output of a failed run.
+        """
+        with self._lock:
+            self._discard()
+            if os.path.isdir(self.path):
+                shutil.rmtree(self.path, ignore_errors=True)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+
+
 class OutputListJSON(list):
     '''
     Extension of list with write to file function, expected to hold dictionary objects corresponding to analysis of individual video frames.
@@ -78,11 +158,7 @@ class OutputListJSON(list):
         folder, name, _ = splitfn(path)
         self.folder = folder
         self._lock = threading.Lock()
-
-        namesplit = name.split('_')
-        self.prefix = namesplit[0:-2]
-        self.low_index = int(namesplit[-2])
-        self.high_index = int(namesplit[-1])
+        self.prefix, self.low_index, self.high_index = _index_range(name)
 
     def write(self, indent=None):
         """
@@ -122,3 +198,451 @@ class OutputListJSON(list):
         with self._lock:
             if obj["INDEX"] <= self.high_index and obj["INDEX"] >= self.low_index:
                 super(OutputListJSON,self).append(obj)
+
+    def abort(self):
+        """
+        Discards the collected frames of a failed run; nothing is written until write.
+        """
+        with self._lock:
+            self.clear()
+
+
+class OutputJSONL(_StreamingOutput):
+    '''
+    Streaming JSON Lines writer with the same append interface as OutputListJSON.
+
+    Each frame dictionary is serialized as one line as soon as it is appended, so memory use does not grow with the length of the run and a crash only loses the records appended since the last fsync. The filename must contain low and high index constraints delimited by underscores, e.g., "myoutput_0_10.jsonl".
+
+    Args:
+        path (str): Path for saving file.
+        fsync_every (int): Number of records between flushes to disk.
+        append (bool): Whether to keep the records of an existing file and append after them.
+
+    Example:
+    ```python
+    output = OutputJSONL('output_0_10.jsonl')
+    output.append({'INDEX': 0, 'data': 'some_data'})
+    output.close()
+    for record in iter_output_records('output_0_10.jsonl'):
+        print(record['INDEX'])
+    ```
+
+    Attributes:
+        path (str): Path to the JSON Lines file.
+        folder (str): Directory containing the JSON Lines file.
+        fsync_every (int): Number of records between flushes to disk.
+        _lock (threading.Lock): Threading lock for thread-safe operations.
+        prefix (list): Prefix extracted from the filename.
+        low_index (int): Low index constraint extracted from the filename.
+        high_index (int): High index constraint extracted from the filename.
+    '''
+
+    def __init__(self, path, fsync_every=100, append=False):
+        """
+        Initializes the OutputJSONL object and opens the file for writing.
+
+        :param path: Path for saving file.
+        :param fsync_every: Number of records between flushes to disk (default=100).
+        :param append: Whether to append to an existing file instead of truncating it (default=False).
+        """
+        super(OutputJSONL, self).__init__(path)
+        self.fsync_every = fsync_every
+
+        if append and os.path.exists(self.path):
+            _truncate_partial_line(self.path)
+        self._file = open(self.path, "a" if append else "w")
+
+    def _append(self, obj):
+        self._file.write(json.dumps(obj, cls=NumpyEncoder) + "\n")
+        if (self._count + 1) % self.fsync_every == 0:
+            self._sync()
+
+    def flush(self):
+        """
+        Flushes the records appended so far to disk.
+        """
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """
+        Flushes and closes the file.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def _discard(self):
+        self._file.close()
+
+
+def _truncate_partial_line(path):
+    """
+    Cuts a JSON Lines file after its last newline, dropping a record left half-written by an interrupted run.
+
+    :param path: Path to the JSON Lines file.
+    """
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            f.seek(max(0, end - 4096))
+            block = f.read(end - max(0, end - 4096))
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                end = max(0, end - 4096) + newline + 1
+                break
+            end = max(0, end - 4096)
+        if end < size:
+            f.truncate(end)
+
+
+def iter_output_records(path):
+    """
+    Iterates over the frame records of an output file without loading it all at once.
+
+    JSON Lines files (.jsonl) are read line by line; a truncated last line, as left by an interrupted run, is skipped. Other files are read as an OutputListJSON JSON array.
+
+    :param path: Path to the output file.
+    :returns: generator of frame dictionaries
+    """
+    if str(path).endswith(".jsonl"):
+        with open(path, 'r') as fin:
+            for line in fin:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping truncated record in {path}")
+    else:
+        with open(path, 'r') as fin:
+            yield from json.load(fin)
+
+
+def _parquet_schema():
+    """
+    Column types of the per-frame scalar metrics stored by OutputParquet.
+
+    :returns: pyarrow schema
+    """
+    import pyarrow as pa
+
+    fields = [
+        ("INDEX", pa.int64()),
+        ("SEGMENT_METHOD", pa.string()),
+        ("PIXELS_PER_MM", pa.float64()),
+        ("PIXEL_MIN", pa.int32()),
+        ("PIXEL_MAX", pa.int32()),
+        ("MODEL_VISIBLE", pa.bool_()),
+        ("OVEREXPOSED", pa.bool_()),
+        ("UNDEREXPOSED", pa.bool_()),
+        ("MODEL_CONTOUR_FAILED", pa.bool_()),
+        ("SHOCK_CONTOUR_FAILED", pa.bool_()),
+        ("DIM_SHOCK", pa.bool_()),
+    ]
+    for prefix in ["MODEL", "SHOCK"]:
+        fields += [
+            (prefix + "_AREA", pa.float64()),
+            (prefix + "_CENTROID_X", pa.float64()),
+            (prefix + "_CENTROID_Y", pa.float64()),
+            (prefix + "_YCENTER", pa.int32()),
+            (prefix + "_YLOW", pa.int32()),
+            (prefix + "_CROP_YMAX", pa.int32()),
+            (prefix + "_RADIUS", pa.int32()),
+            (prefix + "_R", pa.list_(pa.float64())),
+            (prefix + "_INTERP_XPOS", pa.list_(pa.float64())),
+        ]
+    return pa.schema(fields)
+
+
+class OutputParquet(_StreamingOutput):
+    '''
+    Columnar writer for the scalar per-frame metrics, with the same append interface as OutputListJSON.
+
+    Only the fields of the Parquet schema are kept (frame index, flags, areas, centroids, radii and interpolated positions); the MODEL and SHOCK contour arrays are left to the JSON outputs. Records are buffered and written as one Parquet row group every row_group_size frames, so a long run never holds more than one row group in memory. The filename must contain low and high index constraints delimited by underscores, e.g., "myoutput_0_10.parquet".
+
+    Args:
+        path (str): Path for saving file.
+        row_group_size (int): Number of frames per Parquet row group.
+
+    Example:
+    ```python
+    output = OutputParquet('output_0_10.parquet')
+    output.append({'INDEX': 0, 'MODEL_AREA': 1250.0})
+    output.write()
+    df = read_output_parquet('output_0_10.parquet', columns=['INDEX', 'MODEL_AREA'])
+    ```
+
+    Attributes:
+        path (str): Path to the Parquet file.
+        folder (str): Directory containing the Parquet file.
+        row_group_size (int): Number of frames per Parquet row group.
+        schema: pyarrow schema of the stored columns.
+        _lock (threading.Lock): Threading lock for thread-safe operations.
+        prefix (list): Prefix extracted from the filename.
+        low_index (int): Low index constraint extracted from the filename.
+        high_index (int): High index constraint extracted from the filename.
+    '''
+
+    kind = "Metrics"
+
+    def __init__(self, path, row_group_size=4096):
+        """
+        Initializes the OutputParquet object and opens the Parquet writer.
+
+        :param path: Path for saving file.
+        :param row_group_size: Number of frames per Parquet row group (default=4096).
+        """
+        import pyarrow.parquet as pq
+
+        super(OutputParquet, self).__init__(path)
+        self.row_group_size = row_group_size
+        self.schema = _parquet_schema()
+        self._columns = {field.name: [] for field in self.schema}
+
+        self._writer = pq.ParquetWriter(str(self.path), self.schema)
+
+    def _append(self, obj):
+        # Buffers the scalar fields of the frame
+        for key, column in self._columns.items():
+            value = obj.get(key)
+            if isinstance(value, (np.ndarray, np.generic)):
+                value = value.tolist()
+            column.append(value)
+        if len(self._columns["INDEX"]) >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        import pyarrow as pa
+
+        if len(self._columns["INDEX"]) == 0:
+            return
+        table = pa.Table.from_pydict(self._columns, schema=self.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        for column in self._columns.values():
+            column.clear()
+
+    def close(self):
+        """
+        Flushes the buffered frames and closes the Parquet writer.
+        """
+        with self._lock:
+            if self._writer is not None:
+                self._write_row_group()
+                self._writer.close()
+                self._writer = None
+
+    def _discard(self):
+        # The buffered frames are dropped
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def read_output_parquet(path, columns=None):
+    """
+    Loads per-frame metrics written by OutputParquet.
+
+    :param path: Path to the Parquet file.
+    :param columns: optional list of columns to read (default: all)
+    :returns: pandas DataFrame with one row per frame
+    """
+    import pyarrow.parquet as pq
+
+    return pq.read_table(str(path), columns=columns).to_pandas()
+
+
+class _NpyAppender(object):
+    '''
+    Streams rows of a 2D array into a .npy file whose length is only known at the end.
+
+    A fixed-size header is reserved when the file is opened and rewritten with the final shape on close, so the result is a regular .npy file that np.load can memory-map.
+    '''
+
+    HEADER_SIZE = 128
+
+    def __init__(self, path, dtype, ncols):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.ncols = ncols
+        self.nrows = 0
+        self._file = open(path, "wb")
+        self._file.write(self._header())
+
+    def _header(self):
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%d, %d), }" % (
+            self.dtype.str,
+            self.nrows,
+            self.ncols,
+        )
+        # magic (6) + version (2) + header length (2) + padded header ending with newline
+        header = header.ljust(self.HEADER_SIZE - 10 - 1) + "\n"
+        return b"\x93NUMPY\x01\x00" + np.uint16(len(header)).tobytes() + header.encode("latin1")
+
+    def append(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=self.dtype).reshape(-1, self.ncols)
+        self._file.write(rows.tobytes())
+        self.nrows += len(rows)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.seek(0)
+            self._file.write(self._header())
+            self._file.close()
+
+
+class OutputContours(_StreamingOutput):
+    '''
+    Binary contour writer with the same append interface as OutputListJSON.
+
+    The MODEL and SHOCK edges of every frame are appended to one flat point array per key, and an offsets array records where each frame starts, so any frame's contour can later be read back in O(1) with ContourStore. Points are streamed to disk as they arrive; only the offsets (8 bytes per frame) are kept in memory. The output is a folder of .npy files, e.g., "myoutput_0_10.contours/", whose name must contain low and high index constraints delimited by underscores:
+
+    - INDEX.npy: frame index of each stored frame
+    - <KEY>_points.npy: (npoints, 2) x/y coordinates of all frames concatenated
+    - <KEY>_offsets.npy: (nframes + 1) start offsets into <KEY>_points.npy
+
+    Args:
+        path (str): Path of the output folder.
+        keys (list): Contour keys to store.
+        dtype: Integer type of the stored coordinates (np.int16 fits frames up to 32767 px).
+
+    Example:
+    ```python
+    output = OutputContours('output_0_10.contours')
+    output.append({'INDEX': 0, 'MODEL': model_contour, 'SHOCK': None})
+    output.write()
+    store = ContourStore('output_0_10.contours')
+    model_contour = store.get(0, 'MODEL')
+    ```
+
+    Attributes:
+        path (str): Path of the output folder.
+        folder (str): Directory containing the output folder.
+        keys (list): Contour keys to store.
+        _lock (threading.Lock): Threading lock for thread-safe operations.
+        prefix (list): Prefix extracted from the filename.
+        low_index (int): Low index constraint extracted from the filename.
+        high_index (int): High index constraint extracted from the filename.
+    '''
+
+    kind = "Contours"
+
+    def __init__(self, path, keys=("MODEL", "SHOCK"), dtype=np.int32):
+        """
+        Initializes the OutputContours object and creates the output folder.
+
+        :param path: Path of the output folder.
+        :param keys: Contour keys to store (default=("MODEL", "SHOCK")).
+        :param dtype: Integer type of the stored coordinates (default=np.int32).
+        """
+        super(OutputContours, self).__init__(path)
+        self.keys = list(keys)
+        self._index = []
+        self._closed = False
+
+        os.makedirs(path, exist_ok=True)
+        self._points = {
+            key: _NpyAppender(os.path.join(path, key + "_points.npy"), dtype, 2)
+            for key in self.keys
+        }
+        self._offsets = {key: [0] for key in self.keys}
+
+    def _append(self, obj):
+        # Missing or empty contours are stored as zero-length entries and read back as None
+        self._index.append(obj["INDEX"])
+        for key in self.keys:
+            c = obj.get(key)
+            if c is not None and len(c) > 0:
+                self._points[key].append(np.asarray(c).reshape(-1, 2))
+            self._offsets[key].append(self._points[key].nrows)
+
+    def close(self):
+        """
+        Finalizes the point files and writes the frame index and offsets.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            for key in self.keys:
+                self._points[key].close()
+                np.save(
+                    os.path.join(self.path, key + "_offsets.npy"),
+                    np.array(self._offsets[key], dtype=np.int64),
+                )
+            np.save(
+                os.path.join(self.path, "INDEX.npy"), np.array(self._index, dtype=np.int64)
+            )
+            self._closed = True
+
+    def _discard(self):
+        for key in self.keys:
+            self._points[key].close()
+        self._closed = True
+
+
+class ContourStore(object):
+    '''
+    Random-access reader for contours written by OutputContours.
+
+    Point arrays are memory-mapped, so opening a store is instant and only the contours that are requested are read from disk.
+
+    Example:
+    ```python
+    store = ContourStore('output_0_10.contours')
+    for index in store.index[::100]:
+        c = store.get(index, 'MODEL')  # shape (n, 1, 2), or None
+    ```
+
+    Attributes:
+        path (str): Path of the contour folder.
+        keys (list): Available contour keys.
+        index (np.ndarray): Frame indices of the stored frames, in storage order.
+    '''
+
+    def __init__(self, path):
+        """
+        Opens a contour folder.
+
+        :param path: Path of the contour folder.
+        """
+        self.path = path
+        self.index = np.load(os.path.join(path, "INDEX.npy"))
+        self._rows = {int(index): row for row, index in enumerate(self.index)}
+        self.keys = [
+            fname[: -len("_offsets.npy")]
+            for fname in sorted(os.listdir(path))
+            if fname.endswith("_offsets.npy")
+        ]
+        self._points = {
+            key: np.load(os.path.join(path, key + "_points.npy"), mmap_mode="r")
+            for key in self.keys
+        }
+        self._offsets = {
+            key: np.load(os.path.join(path, key + "_offsets.npy")) for key in self.keys
+        }
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, index):
+        return int(index) in self._rows
+
+    def get(self, index, key="MODEL"):
+        """
+        Returns the contour of a frame.
+
+        :param index: frame INDEX
+        :param key: contour key, e.g. "MODEL" or "SHOCK"
+        :returns: contour of shape (n, 1, 2) in OpenCV layout, or None if it was missing
+        """
+        row = self._rows[int(index)]
+        start, end = self._offsets[key][row], self._offsets[key][row + 1]
+        if start == end:
+            return None
+        return self._points[key][start:end].reshape(-1, 1, 2)
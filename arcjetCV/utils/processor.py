@@ -1,9 +1,22 @@
 import cv2 as cv
 import numpy as np
 import os, sys
-from PySide6.QtCore import QMetaObject, Qt, QTimer, QThread, Signal, QObject
-from arcjetCV.utils.utils import clahe_normalize, annotate_image_with_frame_number
-from arcjetCV.utils.output import OutputListJSON
+import json
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+from arcjetCV.utils.utils import (
+    SPAWN_CONTEXT,
+    annotate_image_with_frame_number,
+    clahe_normalize,
+    spawn_pool,
+)
+from arcjetCV.utils.output import (
+    OutputListJSON,
+    OutputJSONL,
+    OutputParquet,
+    OutputContours,
+    iter_output_records,
+)
 from arcjetCV.utils.video import Video
 
 try:
@@ -15,135 +28,156 @@ try:
         contoursAutoHSV,
         getPoints,
     )
-    from arcjetCV.segmentation.contour.cnn import CNN
+    from arcjetCV.segmentation.contour.tracking import MaskPropagator
 
     _contour_import_error = None
 except ModuleNotFoundError as exc:
     contoursHSV = contoursGRAY = contoursCNN = getEdgeFromContour = None
     contoursAutoHSV = getPoints = None
-    CNN = None
+    MaskPropagator = None
     _contour_import_error = exc
 
 
-class ProcessorWorker(QObject):
-    """Worker class that runs ArcjetProcessor in a separate thread."""
+# Array fields of the frame records, as produced by process and get_edges_metrics
+RECORD_ARRAYS = {
+    "MODEL": np.int32,
+    "SHOCK": np.int32,
+    "MODEL_INTERP_XPOS": np.float64,
+    "SHOCK_INTERP_XPOS": np.float64,
+}
 
-    progress_updated = Signal(int)  # Signal for updating the progress bar
-    finished = Signal()  # Signal for when processing is done
 
-    def __init__(
-        self,
-        processor,
-        video,
-        options,
-        first_frame,
-        last_frame,
-        frame_stride,
-        output_prefix,
-        write_json,
-        write_video,
-        display_shock,
-    ):
-        super().__init__()
-        self.processor = processor
-        self.video = video
-        self.options = options
-        self.first_frame = first_frame
-        self.last_frame = last_frame
-        self.frame_stride = frame_stride
-        self.output_prefix = output_prefix
-        self.write_json = write_json
-        self.write_video = write_video
-        self.display_shock = display_shock
-        self.processing_done = False
-
-    def run(self):
-        """Run video processing in a separate thread, consistent with ArcjetProcessor.process_all()."""
-        try:
-            if not self.output_prefix:
-                self.output_prefix = "output"  # Ensure filename is valid
+def contour_dtype(video):
+    """
+    Smallest integer type that holds pixel coordinates of the video frames.
 
-            # Ensure output filename is correctly formatted
-            json_filename = (
-                f"{self.output_prefix}_{self.first_frame}_{self.last_frame}.json"
-            )
-            json_path = os.path.join(self.video.folder, json_filename)
+    :param video: video object
+    :returns: np.int16 or np.int32
+    """
+    return np.int16 if max(video.h, video.w) <= np.iinfo(np.int16).max else np.int32
 
-            out_json = OutputListJSON(json_path)
 
-            total_frames = max(
-                1, (self.last_frame - self.first_frame) // self.frame_stride + 1
-            )
-            processed_frames = 0
-
-            # Initialize video writer if necessary
-            if self.write_video:
-                video_output_name = f"video_out_{self.output_prefix}_{self.first_frame}_{self.last_frame}.m4v"
-                self.video.get_writer(video_output_name)
-
-            # Process frames
-            for frame_index in range(
-                self.first_frame, self.last_frame + 1, self.frame_stride
-            ):
-                frame = self.video.get_frame(frame_index)
-                if frame is None:
-                    print(f"Warning: Skipped frame {frame_index}")
-                    continue
+class FrameWorkspace:
+    """
+    Preallocated per-frame buffers shared by the image flags and the segmenters.
 
-                # Process the frame
-                self.options["INDEX"] = frame_index
-                contour_dict, argdict = self.processor.process(frame, self.options)
-                argdict["PIXELS_PER_MM"] = self.processor.pixels_per_mm
-                argdict.update(contour_dict)
-                out_json.append(argdict.copy())
-
-                # Handle video writing
-                if self.write_video:
-                    # Draw detected contours on output video frames.
-                    width = frame.shape[1]
-                    thickness = max(1, width // 500)
-
-                    model_contours = contour_dict.get("MODEL")
-                    if model_contours is not None:
-                        cv.drawContours(frame, model_contours, -1, (0, 255, 0), thickness)
-
-                    if self.display_shock:
-                        shock_contours = contour_dict.get("SHOCK")
-                        if shock_contours is not None:
-                            cv.drawContours(
-                                frame, shock_contours, -1, (255, 0, 255), thickness
-                            )
-
-                    annotate_image_with_frame_number(frame, frame_index)
-                    frame = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
-                    self.video.writer.write(frame)
+    The square crop and every derived image (grayscale, HSV, CLAHE normalization and their
+    blurred versions) live in buffers reused from frame to frame. Each derived image is
+    computed on first request after load() and returned from the buffer afterwards.
 
-                # Emit progress update
-                processed_frames += 1
-                progress = int((processed_frames / total_frames) * 100)
-                self.progress_updated.emit(progress)
+    Example:
+        >>> workspace = FrameWorkspace(573, 1025)
+        >>> square = workspace.load(frame[71:644, 128:1153])
+        >>> hsv = workspace.hsv()
+    """
 
-            # Ensure progress reaches 100%
-            self.progress_updated.emit(100)
+    def __init__(self, height, width):
+        """
+        :param height: height of the cropped frame
+        :param width: width of the cropped frame
+        """
+        self.shape = (height, width)
+        side = max(height, width)
+        self.offset = [(side - height) // 2, (side - width) // 2]
+        self.square = np.zeros((side, side, 3), dtype=np.uint8)
+        self._inner = self.square[
+            self.offset[0] : self.offset[0] + height,
+            self.offset[1] : self.offset[1] + width,
+        ]
+        self._clahe_op = cv.createCLAHE(clipLimit=2.0, tileGridSize=(9, 9))
+        self._buffers = {}
+        self._ready = set()
+        # Scratch arrays owned by the segmenters, e.g. contoursAutoHSV
+        self.scratch = {}
 
-            # Write JSON output
-            if self.write_json:
-                out_json.write()
+    def load(self, cropped_frame):
+        """
+        Copies a cropped frame into the center of the square buffer and invalidates the
+        derived images of the previous frame.
 
-            # Close video writer if necessary
-            if self.write_video:
-                self.video.close_writer()
+        :param cropped_frame: cropped opencv image of the workspace shape
+        :returns: square opencv image (the workspace buffer)
+        """
+        if len(cropped_frame.shape) == 2 or cropped_frame.shape[2] == 1:
+            cv.cvtColor(cropped_frame, cv.COLOR_GRAY2RGB, dst=self._buffer("rgb", 3))
+            cropped_frame = self._buffers["rgb"]
+        np.copyto(self._inner, cropped_frame)
+        self._ready.clear()
+        return self.square
 
-        except Exception as e:
-            print(f"Processing failed: {e}")
+    def _buffer(self, name, channels=1):
+        """
+        Returns the named square buffer, allocating it on first use.
+        """
+        if name not in self._buffers:
+            if name == "rgb":
+                shape = self.shape + (3,)
+            elif channels == 1:
+                shape = self.square.shape[:2]
+            else:
+                shape = self.square.shape
+            self._buffers[name] = np.empty(shape, dtype=np.uint8)
+        return self._buffers[name]
 
-        # Signal completion
-        self.finished.emit()
+    def _derived(self, name, channels, compute):
+        """
+        Returns the named derived image, computing it into its buffer once per frame.
+        """
+        buf = self._buffer(name, channels)
+        if name not in self._ready:
+            compute(buf)
+            self._ready.add(name)
+        return buf
+
+    def gray(self):
+        """:returns: grayscale square crop"""
+        return self._derived(
+            "gray", 1, lambda buf: cv.cvtColor(self.square, cv.COLOR_BGR2GRAY, dst=buf)
+        )
+
+    def gray_blur(self):
+        """:returns: grayscale square crop with a 5x5 Gaussian blur"""
+        return self._derived(
+            "gray_blur", 1, lambda buf: cv.GaussianBlur(self.gray(), (5, 5), 0, dst=buf)
+        )
+
+    def hsv(self):
+        """:returns: HSV square crop"""
+        return self._derived(
+            "hsv", 3, lambda buf: cv.cvtColor(self.square, cv.COLOR_BGR2HSV, dst=buf)
+        )
+
+    def clahe(self):
+        """:returns: CLAHE-normalized square crop, as computed by clahe_normalize"""
+
+        def compute(buf):
+            lab = self._buffer("lab", 3)
+            lum = self._buffer("lum")
+            cv.cvtColor(self.square, cv.COLOR_BGR2LAB, dst=lab)
+            cv.extractChannel(lab, 0, dst=lum)
+            self._clahe_op.apply(lum, dst=lum)
+            cv.insertChannel(lum, lab, 0)
+            cv.cvtColor(lab, cv.COLOR_LAB2BGR, dst=buf)
+
+        return self._derived("clahe", 3, compute)
 
-    def stop(self):
-        """Stop the worker safely."""
-        print("🛑 Stopping processing thread...")
-        self.stop_flag = True
+    def clahe_gray_blur(self):
+        """:returns: grayscale CLAHE-normalized crop with a 5x5 Gaussian blur"""
+
+        def compute(buf):
+            cv.cvtColor(self.clahe(), cv.COLOR_BGR2GRAY, dst=buf)
+            cv.GaussianBlur(buf, (5, 5), 0, dst=buf)
+
+        return self._derived("clahe_gray_blur", 1, compute)
+
+    def clahe_hsv_blur(self):
+        """:returns: HSV CLAHE-normalized crop with a 5x5 Gaussian blur"""
+
+        def compute(buf):
+            cv.cvtColor(self.clahe(), cv.COLOR_BGR2HSV, dst=buf)
+            cv.GaussianBlur(buf, (5, 5), 0, dst=buf)
+
+        return self._derived("clahe_hsv_blur", 3, compute)
 
 
 class ArcjetProcessor:
@@ -154,11 +188,15 @@ class ArcjetProcessor:
     hold processed arrays, and output processed data to file.
     """
 
-    def __init__(self, videometa, progress_bar=None):
+    def __init__(self, videometa, progress_bar=None, progress_callback=None):
         """
         Initializes the ArcjetProcessor object.
 
         :param videometa: dictionary containing video metadata
+        :param progress_bar: optional QProgressBar updated by process_all (imports the Qt
+                             adapter, prefer progress_callback)
+        :param progress_callback: optional function called with the percentage of frames
+                                  processed by process_all
         """
         if _contour_import_error is not None:
             raise ModuleNotFoundError(
@@ -175,8 +213,16 @@ class ArcjetProcessor:
         self.pixels_per_mm = videometa.get(
             "PIXELS_PER_MM", 1.0
         )  # ✅ Default to 1.0 if missing
-        self.progress_bar = progress_bar
+        if progress_bar is not None and progress_callback is None:
+            from arcjetCV.gui.processor_worker import progress_bar_callback
+
+            progress_callback = progress_bar_callback(progress_bar)
+        self.progress_callback = progress_callback
         self.filename = None
+        self.cancelled = False
+        # Frame buffers and keyframe tracking state, one set per thread: the GUI preview
+        # may call process while a ProcessorWorker runs process_all on the same processor
+        self._local = threading.local()
 
     def update_video_meta(self, videometa):
         """
@@ -218,12 +264,13 @@ class ArcjetProcessor:
 
         return flow_direction
 
-    def get_image_flags(self, frame, argdict):
+    def get_image_flags(self, frame, argdict, workspace=None):
         """
         Uses histogram of 8-bit grayscale image (0,255) to classify image type.
 
         :param frame: opencv image
         :param argdict: dictionary to store flags
+        :param workspace: optional FrameWorkspace holding frame, reused for the grayscale image
         :returns: dictionary of flags
         """
         try:
@@ -233,10 +280,13 @@ class ArcjetProcessor:
             modelfraction = 0.005
 
         ### Gray value histogram
-        # Convert the input image to grayscale
-        gray_ = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
-        # Apply Gaussian blur to the grayscale image to reduce noise for better analysis
-        gray = cv.GaussianBlur(gray_, (5, 5), 0)
+        if workspace is not None:
+            gray = workspace.gray_blur()
+        else:
+            # Convert the input image to grayscale
+            gray_ = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+            # Apply Gaussian blur to the grayscale image to reduce noise for better analysis
+            gray = cv.GaussianBlur(gray_, (5, 5), 0)
         # Store the minimum and maximum pixel values of the grayscale image in argdict
         argdict["PIXEL_MIN"] = gray.min()
         argdict["PIXEL_MAX"] = gray.max()
@@ -257,12 +307,13 @@ class ArcjetProcessor:
         argdict["UNDEREXPOSED"] = histr[150:].sum() / imgsize < modelfraction
         return argdict
 
-    def segment(self, img_crop, argdict):
+    def segment(self, img_crop, argdict, workspace=None):
         """
         Segments image using one of several methods specified in argdict.
 
         :param img_crop: cropped opencv image
         :param argdict: dictionary containing segmentation method and related parameters
+        :param workspace: optional FrameWorkspace holding img_crop, reused for color conversions
         :returns: contour_dict: dictionary containing contours
                 flags: dictionary containing flags
         """
@@ -270,7 +321,11 @@ class ArcjetProcessor:
         # Check the segmentation method specified in argdict and execute the corresponding block
         if argdict["SEGMENT_METHOD"] == "AutoHSV":
             # If the method is AutoHSV, call the contoursAutoHSV function with the cropped image
-            contour_dict, flags = contoursAutoHSV(img_crop, flags=argdict)
+            hsv = workspace.hsv() if workspace is not None else None
+            scratch = workspace.scratch if workspace is not None else None
+            contour_dict, flags = contoursAutoHSV(
+                img_crop, flags=argdict, hsv=hsv, buffers=scratch
+            )
 
         elif argdict["SEGMENT_METHOD"] == "HSV":
             # If the method is HSV, first try to retrieve HSV range values from argdict
@@ -285,7 +340,10 @@ class ArcjetProcessor:
                     f"HSVRange not provided, using default value of self.HSVModelRange: {self.HSVModelRange}, self.HSVShockRange: {self.HSVShockRange}"
                 )
             # Normalize the cropped image for better segmentation
-            img_clahe = clahe_normalize(img_crop)
+            if workspace is not None:
+                img_clahe, hsv = workspace.clahe(), workspace.clahe_hsv_blur()
+            else:
+                img_clahe, hsv = clahe_normalize(img_crop), None
             # Call the contoursHSV function with the normalized image and HSV ranges
             contour_dict, flags = contoursHSV(
                 img_clahe,
@@ -294,6 +352,7 @@ class ArcjetProcessor:
                 maxHSVModel=self.HSVModelRange[1],
                 minHSVShock=self.HSVShockRange[0],
                 maxHSVShock=self.HSVShockRange[1],
+                hsv=hsv,
             )
 
         elif argdict["SEGMENT_METHOD"] == "GRAY":
@@ -305,21 +364,25 @@ class ArcjetProcessor:
                 thresh = 240
                 print(f"Threshold not provided, using default value of {thresh}")
             # Normalize the cropped image
-            img_clahe = clahe_normalize(img_crop)
+            if workspace is not None:
+                img_clahe, gray = workspace.clahe(), workspace.clahe_gray_blur()
+            else:
+                img_clahe, gray = clahe_normalize(img_crop), None
             # Call the contoursGRAY function with the normalized image and the threshold
-            contour_dict, flags = contoursGRAY(img_clahe, thresh=thresh, log=None)
+            contour_dict, flags = contoursGRAY(img_clahe, thresh=thresh, log=None, gray=gray)
 
-        elif argdict["SEGMENT_METHOD"] == "CNN":
+        elif argdict["SEGMENT_METHOD"] in ("CNN", "CNN_INT8"):
             # If the method is CNN, call the contoursCNN function with the cropped image and the CNN model
-            if self.cnn is None:
-                try:
-                    self.cnn = CNN()
-                except Exception as exc:
-                    raise RuntimeError(
-                        "CNN segmentation model could not be loaded. "
-                        "Install valid CNN checkpoints and keep Filter Method='CNN'."
-                    ) from exc
-            contour_dict, flags = contoursCNN(img_crop, self.cnn)
+            cnn = self.load_cnn(self.cnn_backend(argdict))
+            propagator = self.mask_propagator(argdict)
+            if propagator is not None:
+                # Run the CNN on keyframes only, warping the last mask in between
+                cnnmask, argdict["CNN_KEYFRAME"] = propagator.segment(
+                    img_crop, lambda crop: self.predict_cnn(cnn, [crop], argdict)[0]
+                )
+            else:
+                cnnmask = self.predict_cnn(cnn, [img_crop], argdict)[0]
+            contour_dict, flags = contoursCNN(img_crop, cnn, cnnmask=cnnmask)
 
         else:
             # If none of the specified methods match, return None to indicate failure
@@ -330,6 +393,93 @@ class ArcjetProcessor:
         # Return the dictionary of contours and the updated argdict
         return contour_dict, argdict
 
+    def cnn_backend(self, argdict):
+        """
+        CNN backend used by the segmentation method in argdict.
+
+        "CNN" uses argdict["CNN_BACKEND"] ("torch" by default), "CNN_INT8" the INT8 quantized
+        graph built by arcjetCV.segmentation.contour.quantize.
+
+        :param argdict: dictionary containing the segmentation method
+        :returns: backend name, or None for segmentation methods without CNN
+        """
+        if argdict["SEGMENT_METHOD"] == "CNN":
+            return argdict.get("CNN_BACKEND", "torch")
+        if argdict["SEGMENT_METHOD"] == "CNN_INT8":
+            return "onnx_int8"
+        return None
+
+    def load_cnn(self, backend="torch"):
+        """
+        Fetches the CNN segmentation model on first use, or when the backend changes.
+
+        The model comes from the process-wide registry, so processors share one loaded and
+        warmed-up instance per checkpoint.
+
+        :param backend: "torch", "onnx" (onnxruntime on CPU) or "onnx_int8", see CNN
+        :returns: CNN model
+        """
+        if self.cnn is None or self.cnn.backend != backend:
+            try:
+                # Imported on first use: torch is only needed for CNN segmentation
+                from arcjetCV.segmentation.contour.cnn import get_cnn
+
+                self.cnn = get_cnn(backend, warmup=True)
+            except Exception as exc:
+                raise RuntimeError(
+                    "CNN segmentation model could not be loaded. "
+                    "Install valid CNN checkpoints and keep Filter Method='CNN'."
+                ) from exc
+        return self.cnn
+
+    def predict_cnn(self, cnn, crops, argdict):
+        """
+        CNN class masks of square crops.
+
+        By default crops are resized to the model input and inferred as one batch. With
+        argdict["CNN_TILED"] set, each crop is segmented with overlapping tiles at
+        argdict["CNN_TILE_SCALE"] (1.0, native resolution, by default), optionally
+        bounded by argdict["CNN_MEMORY_BUDGET"] bytes and with argdict["CNN_TILE_OVERLAP"]
+        pixels of overlap.
+
+        :param cnn: CNN model
+        :param crops: list of opencv images
+        :param argdict: dictionary containing segmentation parameters
+        :returns: list of class masks
+        """
+        if not argdict.get("CNN_TILED", False):
+            return cnn.predict_batch(crops)
+
+        kwargs = {"scale": argdict.get("CNN_TILE_SCALE", 1.0)}
+        if "CNN_TILE_OVERLAP" in argdict:
+            kwargs["overlap"] = argdict["CNN_TILE_OVERLAP"]
+        if "CNN_MEMORY_BUDGET" in argdict:
+            kwargs["memory_budget"] = argdict["CNN_MEMORY_BUDGET"]
+        return [cnn.predict_tiled(crop, **kwargs) for crop in crops]
+
+    def mask_propagator(self, argdict):
+        """
+        MaskPropagator of the CNN keyframe mode, or None when the mode is disabled.
+
+        The mode is enabled by argdict["CNN_KEYFRAME_INTERVAL"] > 1: the CNN then runs at
+        most that many frames apart, or earlier when the mean absolute gray difference to
+        the last keyframe exceeds argdict["CNN_CHANGE_THRESHOLD"] (4.0 by default).
+        Frames in between reuse the last mask, warped by optical flow.
+
+        :param argdict: dictionary containing segmentation parameters
+        :returns: MaskPropagator or None
+        """
+        interval = argdict.get("CNN_KEYFRAME_INTERVAL", 1)
+        if interval <= 1:
+            return None
+        threshold = argdict.get("CNN_CHANGE_THRESHOLD", 4.0)
+        propagator = getattr(self._local, "propagator", None)
+        if propagator is None:
+            propagator = self._local.propagator = MaskPropagator(interval, threshold)
+        propagator.keyframe_interval = interval
+        propagator.change_threshold = threshold
+        return propagator
+
     def get_edges_metrics(self, contour_dict, argdict, offset):
         """
         Retrieves edges and metrics from contour dictionary.
@@ -428,6 +578,24 @@ class ArcjetProcessor:
         # was placed within the square frame
         return square_frame, [start_y, start_x]
 
+    def load_workspace(self, frame):
+        """
+        Crops the frame into the calling thread's FrameWorkspace, reallocating it only when
+        the crop size changes.
+
+        :param frame: opencv image
+        :returns: workspace: FrameWorkspace holding the square crop
+                  offset: list containing offset values
+        """
+        cropped_frame = frame[
+            self.crop[0][0] : self.crop[0][1], self.crop[1][0] : self.crop[1][1]
+        ]
+        workspace = getattr(self._local, "workspace", None)
+        if workspace is None or workspace.shape != cropped_frame.shape[:2]:
+            workspace = self._local.workspace = FrameWorkspace(*cropped_frame.shape[:2])
+        workspace.load(cropped_frame)
+        return workspace, workspace.offset
+
     def process(self, frame, argdict):
         """
         Processes the given frame.
@@ -450,13 +618,14 @@ class ArcjetProcessor:
             self.flow_dir = self.get_flow_direction(frame)
 
         # Make the frame square to ensure consistent processing, obtaining the cropped frame and offset
-        frame_crop, offset = self.make_crop_square(frame)
+        workspace, offset = self.load_workspace(frame)
+        frame_crop = workspace.square
 
         # Update argdict with image flags based on the cropped frame
-        argdict = self.get_image_flags(frame_crop, argdict)
+        argdict = self.get_image_flags(frame_crop, argdict, workspace=workspace)
 
         # Segment the cropped frame, updating argdict with segmentation results
-        contour_dict, argdict = self.segment(frame_crop, argdict)
+        contour_dict, argdict = self.segment(frame_crop, argdict, workspace=workspace)
 
         # Calculate edge metrics based on contours, updating argdict further
         edges, argdict = self.get_edges_metrics(contour_dict, argdict, offset)
@@ -464,6 +633,366 @@ class ArcjetProcessor:
         # Return the edges and a copy of the updated argdict
         return edges, argdict.copy()
 
+    def process_batch(self, frames, argdicts):
+        """
+        Processes several frames, running CNN segmentation as a single batched inference.
+
+        Other segmentation methods process the frames one by one.
+
+        :param frames: list of opencv images
+        :param argdicts: list of dictionaries containing segmentation parameters, one per frame
+        :returns: list of (edges, argdict) tuples, one per frame
+        """
+        backend = self.cnn_backend(argdicts[0])
+        if backend is None:
+            return [self.process(frame, argdict) for frame, argdict in zip(frames, argdicts)]
+
+        if self.flow_dir is None:
+            self.flow_dir = self.get_flow_direction(frames[0])
+
+        # Square crops are kept for the whole batch, so each frame gets its own buffer
+        crops, offsets = [], []
+        for frame, argdict in zip(frames, argdicts):
+            frame_crop, offset = self.make_crop_square(frame)
+            self.get_image_flags(frame_crop, argdict)
+            crops.append(frame_crop)
+            offsets.append(offset)
+
+        cnn = self.load_cnn(backend)
+        results = []
+        for frame_crop, cnnmask, offset, argdict in zip(
+            crops, self.predict_cnn(cnn, crops, argdicts[0]), offsets, argdicts
+        ):
+            contour_dict, flags = contoursCNN(frame_crop, cnn, cnnmask=cnnmask)
+            argdict.update(flags)
+            edges, argdict = self.get_edges_metrics(contour_dict, argdict, offset)
+            results.append((edges, argdict.copy()))
+        return results
+
+    def iter_processed(
+        self,
+        video,
+        options,
+        first_frame,
+        last_frame,
+        frame_stride,
+        batch_size=1,
+        should_stop=None,
+    ):
+        """
+        Processes frames first_frame..last_frame in order.
+
+        With CNN segmentation and batch_size > 1, frames are gathered into batches of
+        batch_size before inference, unless the CNN keyframe mode is enabled (see
+        mask_propagator). Frames that fail to decode or process are reported
+        and skipped, while a CNN that cannot be loaded raises RuntimeError before the
+        first frame. When should_stop returns True, the iteration ends before the next
+        frame, pending batch frames are dropped and self.cancelled is set.
+
+        :param video: video object (defined in utils/video.py)
+        :param options: dictionary containing segmentation options
+        :param first_frame: index of the first frame to process
+        :param last_frame: index of the last frame to process
+        :param frame_stride: stride for frame processing
+        :param batch_size: number of frames gathered per CNN inference
+        :param should_stop: optional function returning True to cancel the iteration
+        :returns: generator of (frame_index, frame, edges, argdict) tuples
+        """
+        backend = self.cnn_backend(options)
+        if backend is not None:
+            # Load and warm up the model before the first frame; a missing model fails
+            # the whole run instead of every frame
+            self.load_cnn(backend)
+
+        # A new sequence starts with a keyframe
+        propagator = getattr(self._local, "propagator", None)
+        if propagator is not None:
+            propagator.reset()
+
+        # Keyframe tracking is sequential, so it disables batching
+        batched = (
+            batch_size > 1
+            and backend is not None
+            and self.mask_propagator(options) is None
+        )
+        batch = []
+        frames = video.iter_frames(first_frame, last_frame, frame_stride)
+        try:
+            for frame_index, frame in frames:
+                if should_stop is not None and should_stop():
+                    print(f"\nCancelled before frame {frame_index}")
+                    self.cancelled = True
+                    return
+
+                # If a frame cannot be retrieved, print an error message and skip it
+                if frame is None:
+                    print(f"Failed at frame {frame_index}")
+                    continue
+
+                if batched:
+                    # Prefetched frames are recycled by the decoder, keep a copy until the batch runs
+                    argdict = dict(options, INDEX=frame_index)
+                    batch.append((frame_index, frame.copy(), argdict))
+                    if len(batch) == batch_size:
+                        yield from self._run_batch(batch)
+                        batch = []
+                    continue
+
+                # Update options with the current frame index
+                options["INDEX"] = frame_index
+                try:
+                    # Process the current frame, obtaining contours and updated argdict
+                    contour_dict, argdict = self.process(frame, options)
+                except Exception as e:
+                    print(f"Failed at frame {frame_index} with error:\n" + str(e))
+                    continue
+                yield frame_index, frame, contour_dict, argdict
+
+            if batch:
+                yield from self._run_batch(batch)
+        finally:
+            # Stops the prefetch thread when the iteration ends early
+            frames.close()
+
+    def _run_batch(self, batch):
+        """
+        Runs process_batch on gathered (frame_index, frame, argdict) items.
+
+        :returns: generator of (frame_index, frame, edges, argdict) tuples
+        """
+        indices, frames, argdicts = zip(*batch)
+        try:
+            results = self.process_batch(list(frames), list(argdicts))
+        except Exception as e:
+            print(f"Failed at frames {indices[0]}-{indices[-1]} with error:\n" + str(e))
+            return
+        for frame_index, frame, (contour_dict, argdict) in zip(indices, frames, results):
+            yield frame_index, frame, contour_dict, argdict
+
+    def iter_resumed(
+        self,
+        video,
+        options,
+        first_frame,
+        last_frame,
+        frame_stride,
+        done=None,
+        batch_size=1,
+        should_stop=None,
+    ):
+        """
+        Processes the frames of first_frame..last_frame missing from done, interleaved in
+        INDEX order with the records of done.
+
+        :param done: dictionary of already processed frame records by INDEX
+        :param should_stop: optional function returning True to cancel, see iter_processed
+        :returns: generator of (frame_index, frame, edges, argdict) tuples, where frame is
+                  None and edges is empty for the records taken from done
+        """
+        done = done or {}
+        run_first = None
+        for frame_index in range(first_frame, last_frame + 1, frame_stride):
+            if frame_index not in done:
+                if run_first is None:
+                    run_first = frame_index
+                continue
+            if run_first is not None:
+                yield from self.iter_processed(
+                    video,
+                    options,
+                    run_first,
+                    frame_index - frame_stride,
+                    frame_stride,
+                    batch_size,
+                    should_stop,
+                )
+                run_first = None
+            yield frame_index, None, {}, done[frame_index]
+        if run_first is not None:
+            yield from self.iter_processed(
+                video, options, run_first, last_frame, frame_stride, batch_size, should_stop
+            )
+
+    @staticmethod
+    def load_checkpoint(paths, first_frame, last_frame, frame_stride):
+        """
+        Reads the frame records left by an interrupted process_all run.
+
+        The edges and the other RECORD_ARRAYS fields are converted back from JSON lists to
+        arrays, so restored records match freshly processed ones.
+
+        :param paths: checkpoint and output files; missing files are skipped
+        :param first_frame: index of the first frame to process
+        :param last_frame: index of the last frame to process
+        :param frame_stride: stride for frame processing
+        :returns: dictionary of frame records by INDEX, restricted to the frames of the run
+        """
+        done = {}
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                for record in iter_output_records(path):
+                    index = record.get("INDEX")
+                    if (
+                        index is not None
+                        and first_frame <= index <= last_frame
+                        and (index - first_frame) % frame_stride == 0
+                    ):
+                        for key, dtype in RECORD_ARRAYS.items():
+                            if record.get(key) is not None:
+                                record[key] = np.asarray(record[key], dtype=dtype)
+                        done[index] = record
+            except (OSError, ValueError) as e:
+                print(f"Could not resume from {path}:\n" + str(e))
+        return done
+
+    def _process_all_parallel(
+        self,
+        video,
+        options,
+        first_frame,
+        last_frame,
+        frame_stride,
+        workers,
+        outputs,
+        batch_size=1,
+        progress_callback=None,
+        done=None,
+        checkpoint=None,
+        should_stop=None,
+        chunk_frames=None,
+    ):
+        """
+        Splits the frame range into contiguous chunks and segments them in worker processes.
+
+        Chunks hold at most chunk_frames frames. Each chunk is written to the checkpoint
+        as soon as it completes, and to the outputs as soon as the chunks before it are
+        written, so only the chunks finished out of order are held in memory. When
+        should_stop returns True, queued chunks are cancelled and running ones stop before
+        their next frame; the frames processed so far are kept.
+
+        :param video: video object, each worker opens its own handle on video.fpath
+        :param options: dictionary containing segmentation options
+        :param first_frame: index of the first frame to process
+        :param last_frame: index of the last frame to process
+        :param frame_stride: stride for frame processing
+        :param workers: number of worker processes
+        :param outputs: output writers receiving the per-frame dicts in INDEX order
+        :param batch_size: number of frames gathered per CNN inference in each worker
+        :param progress_callback: progress function overriding self.progress_callback
+        :param done: dictionary of already processed frame records by INDEX, see load_checkpoint
+        :param checkpoint: OutputJSONL receiving the newly processed frames
+        :param should_stop: optional function returning True to cancel the run
+        :param chunk_frames: maximum number of frames per chunk, None for one chunk per worker
+        """
+        done = done or {}
+        indices = np.arange(first_frame, last_frame + 1, frame_stride)
+        todo = np.array([i for i in indices if i not in done], dtype=int)
+        nchunks = workers
+        if chunk_frames:
+            nchunks = max(nchunks, int(np.ceil(len(todo) / chunk_frames)))
+        chunks = []
+        for chunk in np.array_split(todo, nchunks):
+            # Frames resumed from a checkpoint leave gaps, split the chunk into runs
+            gaps = np.flatnonzero(np.diff(chunk) != frame_stride) + 1
+            chunks += [run for run in np.split(chunk, gaps) if len(run) > 0]
+
+        stop_event = SPAWN_CONTEXT.Event()
+        max_workers = max(1, min(workers, len(chunks)))
+        with spawn_pool(max_workers, _init_chunk_worker, (stop_event,)) as pool:
+            # Chunk position of each future, dropped once the chunk is finished
+            positions = {
+                pool.submit(
+                    _process_chunk,
+                    self,
+                    video.fpath,
+                    dict(options),
+                    int(chunk[0]),
+                    int(chunk[-1]),
+                    frame_stride,
+                    batch_size,
+                ): i
+                for i, chunk in enumerate(chunks)
+            }
+            nframes = len(indices)
+            ndone = nframes - len(todo)
+            # Finished chunks waiting for the chunks before them, by position
+            ready = {}
+            nwritten = 0
+            # Resumed records go to the outputs before the first chunk following them
+            resumed = sorted(done)
+            nresumed = 0
+            pending = set(positions)
+            while pending:
+                # Poll should_stop while waiting for the chunks
+                finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    position = positions.pop(future)
+                    if future.cancelled():
+                        ready[position] = []
+                        continue
+                    ready[position] = result = future.result()
+                    ndone += len(result)
+                    if checkpoint is not None:
+                        for argdict in result:
+                            checkpoint.append(argdict)
+                    progress_percentage = int(100 * ndone / nframes)
+                    self._report_progress(progress_percentage, progress_callback)
+                    sys.stdout.write(
+                        f"\rProcessing video using {options['SEGMENT_METHOD']} "
+                        f"with {workers} workers ... {progress_percentage}%"
+                    )
+
+                # Chunks are contiguous, so writing them in position order keeps INDEX order
+                while nwritten in ready:
+                    first_index = chunks[nwritten][0]
+                    while nresumed < len(resumed) and resumed[nresumed] < first_index:
+                        for output in outputs:
+                            output.append(done[resumed[nresumed]])
+                        nresumed += 1
+                    for argdict in ready.pop(nwritten):
+                        for output in outputs:
+                            output.append(argdict)
+                    nwritten += 1
+
+                if not self.cancelled and should_stop is not None and should_stop():
+                    print(f"\nCancelling {len(pending)} chunks")
+                    self.cancelled = True
+                    stop_event.set()
+                    for future in pending:
+                        future.cancel()
+
+        for index in resumed[nresumed:]:
+            for output in outputs:
+                output.append(done[index])
+
+    def _report_progress(self, percent, progress_callback=None):
+        """
+        Passes the percentage of processed frames to the progress callback, if any.
+
+        :param percent: integer percentage
+        :param progress_callback: callback overriding self.progress_callback
+        """
+        callback = progress_callback or self.progress_callback
+        if callback is not None:
+            callback(percent)
+
+    def __getstate__(self):
+        """
+        Drops the progress callback, the loaded CNN and the frame buffers when pickling for
+        worker processes.
+        """
+        state = self.__dict__.copy()
+        state["progress_callback"] = None
+        state["cnn"] = None
+        state["_local"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
     def process_all(
         self,
         video: Video,
@@ -475,10 +1004,34 @@ class ArcjetProcessor:
         write_json=True,
         write_video=False,
         display_shock=True,
+        workers=1,
+        output_format="json",
+        write_parquet=False,
+        write_contours=False,
+        batch_size=1,
+        progress_callback=None,
+        checkpoint_every=100,
+        resume=False,
+        should_stop=None,
+        chunk_frames=2000,
     ):
         """
         Processes all frames in the video.
 
+        Processed frames are also streamed to a checkpoint file,
+        <output_prefix>_checkpoint_<first_frame>_<last_frame>.jsonl next to the outputs,
+        which is removed once the run completes. If the run raises, its outputs are
+        removed and only the checkpoint is kept. With resume=True, the frames found in
+        the checkpoint (and in an existing output file) of an interrupted run with the same
+        prefix and frame range are kept, and only the missing frames are processed. The
+        output video of a resumed run only contains the newly processed frames.
+
+        should_stop is polled before every frame (by every worker with workers > 1). Once
+        it returns True, processing stops, the outputs are written with the frames
+        processed so far, self.cancelled is set and a <output_prefix>_<first_frame>_<last_frame>.cancelled
+        marker file records the partial run next to them. The checkpoint is kept, so the
+        run can be continued with resume=True.
+
         :param video: video object (defined in utils/video.py)
         :param options: dictionary containing segmentation options
         :param first_frame: index of the first frame to process
@@ -486,6 +1039,26 @@ class ArcjetProcessor:
         :param frame_stride: stride for frame processing
         :param write_json: boolean indicating whether to write processed data to JSON file
         :param write_video: boolean indicating whether to write processed video
+        :param workers: number of worker processes; frames are split into contiguous chunks
+                        when > 1 (not supported together with write_video)
+        :param output_format: "json" keeps all frames in an OutputListJSON written at the end,
+                              "jsonl" streams each frame to disk as it is processed
+        :param write_parquet: boolean indicating whether to also write the scalar metrics
+                              to a Parquet file, one row group at a time
+        :param write_contours: boolean indicating whether to also write the MODEL/SHOCK edges
+                               to a binary contour folder readable with ContourStore
+        :param batch_size: number of frames gathered per CNN inference (CNN and CNN_INT8 only)
+        :param progress_callback: function called with the percentage of processed frames,
+                                  overriding the one given to the constructor
+        :param checkpoint_every: number of frames between flushes of the checkpoint file
+                                 to disk, 0 disables checkpointing
+        :param resume: boolean indicating whether to continue an interrupted run from its
+                       checkpoint instead of starting over
+        :param should_stop: optional function returning True to cancel the run
+        :param chunk_frames: maximum number of frames per worker task when workers > 1;
+                             a crash loses at most the running chunks (None: one chunk
+                             per worker)
+        :returns: OutputListJSON, or the closed OutputJSONL writer in "jsonl" mode
 
         Example:
         ```python
@@ -493,9 +1066,15 @@ class ArcjetProcessor:
         options = {"SEGMENT_METHOD": "AutoHSV", "MODEL_FRACTION": 0.005}
         processor = ArcjetProcessor(videometa)
         processor.process_all(video, options, 0, 100, 1, 'output.json', write_video=True)
+        processor.process_all(video, options, 0, 10000, 1, 'output.json', workers=8)
+        processor.process_all(video, {"SEGMENT_METHOD": "CNN"}, 0, 1000, 1, batch_size=8)
+        processor.process_all(video, {"SEGMENT_METHOD": "CNN", "CNN_KEYFRAME_INTERVAL": 10}, 0, 1000, 1)
+        processor.process_all(video, options, 0, 10000, 1, 'output.json', resume=True)
         ```
         """
 
+        self.cancelled = False
+
         # Initialize video writer if write_video is True
         if write_video:
 
@@ -509,25 +1088,202 @@ class ArcjetProcessor:
         # Setup output JSON file
         if output_prefix == "":
             output_prefix = video.name
-        self.filename = "%s_%i_%i.json" % (output_prefix, first_frame, last_frame)
-        out_json = OutputListJSON(os.path.join(video.folder, self.filename))
+        self.filename = "%s_%i_%i.%s" % (
+            output_prefix,
+            first_frame,
+            last_frame,
+            output_format,
+        )
+        checkpoint_path = os.path.join(
+            video.folder,
+            "%s_checkpoint_%i_%i.jsonl" % (output_prefix, first_frame, last_frame),
+        )
 
-        # Iterate over frames from first_frame to last_frame, with steps of frame_stride
-        for frame_index in range(first_frame, last_frame + 1, frame_stride):
-            try:
-                frame = video.get_frame(frame_index)
+        # Collect the frames of the interrupted run before the writers truncate its files
+        done = {}
+        checkpointed = {}
+        if resume:
+            done = self.load_checkpoint(
+                [os.path.join(video.folder, self.filename)],
+                first_frame,
+                last_frame,
+                frame_stride,
+            )
+            checkpointed = self.load_checkpoint(
+                [checkpoint_path], first_frame, last_frame, frame_stride
+            )
+            done.update(checkpointed)
+            print(f"Resuming with {len(done)} frames already processed")
 
-                # If a frame cannot be retrieved, print an error message and return
-                if frame is None:
-                    print(f"Failed at frame {frame_index}")
-                    continue
+        checkpoint = None
+        if checkpoint_every > 0:
+            checkpoint = OutputJSONL(
+                checkpoint_path, fsync_every=checkpoint_every, append=resume
+            )
+            # Frames only found in the output file would be lost if this run is
+            # interrupted too, once its writer has truncated the file
+            missing = sorted(set(done) - set(checkpointed))
+            for index in missing:
+                checkpoint.append(done[index])
+            if missing:
+                checkpoint.flush()
+
+        if output_format == "jsonl" and write_json:
+            out_json = OutputJSONL(os.path.join(video.folder, self.filename))
+        else:
+            out_json = OutputListJSON(os.path.join(video.folder, self.filename))
+        outputs = [out_json]
 
-                # Update options with the current frame index
-                options["INDEX"] = frame_index
+        out_parquet = None
+        if write_parquet:
+            parquet_filename = "%s_%i_%i.parquet" % (
+                output_prefix,
+                first_frame,
+                last_frame,
+            )
+            out_parquet = OutputParquet(os.path.join(video.folder, parquet_filename))
+            outputs.append(out_parquet)
+
+        out_contours = None
+        if write_contours:
+            contours_filename = "%s_%i_%i.contours" % (
+                output_prefix,
+                first_frame,
+                last_frame,
+            )
+            out_contours = OutputContours(
+                os.path.join(video.folder, contours_filename),
+                dtype=contour_dtype(video),
+            )
+            outputs.append(out_contours)
+
+        if workers > 1 and write_video:
+            print("write_video requires ordered frames, processing with a single worker")
+            workers = 1
+
+        try:
+            if workers > 1:
+                self._process_all_parallel(
+                    video,
+                    options,
+                    first_frame,
+                    last_frame,
+                    frame_stride,
+                    workers,
+                    outputs,
+                    batch_size,
+                    progress_callback,
+                    done,
+                    checkpoint,
+                    should_stop,
+                    chunk_frames,
+                )
+            else:
+                self._process_all_serial(
+                    video,
+                    options,
+                    first_frame,
+                    last_frame,
+                    frame_stride,
+                    outputs,
+                    write_video,
+                    display_shock,
+                    batch_size,
+                    progress_callback,
+                    done,
+                    checkpoint,
+                    should_stop,
+                )
+        except BaseException:
+            # Only the checkpoint of a failed run is kept, to continue it with resume=True
+            for output in outputs:
+                output.abort()
+            raise
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+            if write_video:
+                video.close_writer()
+
+        # ✅ Ensure progress reaches 100% at the end
+        if not self.cancelled:
+            self._report_progress(100, progress_callback)
+
+        if write_json:
+            out_json.write()
+        if out_parquet is not None:
+            out_parquet.write()
+        if out_contours is not None:
+            out_contours.write()
+
+        cancelled_path = os.path.join(
+            video.folder, "%s_%i_%i.cancelled" % (output_prefix, first_frame, last_frame)
+        )
+        if self.cancelled:
+            with open(cancelled_path, "w") as fout:
+                json.dump(
+                    {
+                        "status": "cancelled",
+                        "first_frame": first_frame,
+                        "last_frame": last_frame,
+                        "frame_stride": frame_stride,
+                        "frames": len(out_json),
+                        "checkpoint": checkpoint_path if checkpoint is not None else None,
+                    },
+                    fout,
+                )
+            print("\nCancelled run recorded in", cancelled_path)
+        else:
+            if os.path.exists(cancelled_path):
+                os.remove(cancelled_path)
+            if checkpoint is not None:
+                os.remove(checkpoint_path)
 
-                # Process the current frame, obtaining contours and updated argdict
-                contour_dict, argdict = self.process(frame, options)
+        return out_json
+
+    def _process_all_serial(
+        self,
+        video,
+        options,
+        first_frame,
+        last_frame,
+        frame_stride,
+        outputs,
+        write_video,
+        display_shock,
+        batch_size=1,
+        progress_callback=None,
+        done=None,
+        checkpoint=None,
+        should_stop=None,
+    ):
+        """
+        Segments the frames in order, drawing the edges on the frames written to the output video.
 
+        :param outputs: output writers receiving the per-frame dicts in INDEX order
+        :param write_video: boolean indicating whether to write processed video
+        :param display_shock: boolean indicating whether to draw the shock edge
+        :param done: dictionary of already processed frame records by INDEX, see load_checkpoint
+        :param checkpoint: OutputJSONL receiving the newly processed frames
+        :param should_stop: optional function returning True to cancel the run
+        """
+        # Iterate over processed frames from first_frame to last_frame, with steps of frame_stride
+        for frame_index, frame, contour_dict, argdict in self.iter_resumed(
+            video,
+            options,
+            first_frame,
+            last_frame,
+            frame_stride,
+            done,
+            batch_size,
+            should_stop,
+        ):
+            if frame is None:
+                # Record of an interrupted run
+                for output in outputs:
+                    output.append(argdict)
+                continue
+            try:
                 # Add pixels_per_mm to the output dictionary
                 argdict["PIXELS_PER_MM"] = self.pixels_per_mm
 
@@ -551,7 +1307,11 @@ class ArcjetProcessor:
                 argdict.update(contour_dict)
 
                 # update output dictionary
-                out_json.append(argdict.copy())
+                outputs[0].append(argdict.copy())
+                for output in outputs[1:]:
+                    output.append(argdict)
+                if checkpoint is not None:
+                    checkpoint.append(argdict)
 
                 # Add processed frame to video output
                 if write_video:
@@ -569,11 +1329,8 @@ class ArcjetProcessor:
                     )
                 )
 
-                # ✅ Update Progress Bar if it exists
-                if self.progress_bar:
-                    QTimer.singleShot(
-                        0, lambda: self.progress_bar.setValue(progress_percentage)
-                    )
+                # ✅ Report progress (e.g. to the GUI progress bar)
+                self._report_progress(progress_percentage, progress_callback)
 
                 # ✅ Print progress in the terminal (for debugging)
                 sys.stdout.write(
@@ -587,16 +1344,50 @@ class ArcjetProcessor:
                 # )
             except Exception as e:
                 print(f"Failed at frame {frame_index} with error:\n" + str(e))
-        # ✅ Ensure progress reaches 100% at the end
-        if self.progress_bar:
-            QMetaObject.invokeMethod(
-                self.progress_bar, "setValue", Qt.QueuedConnection, 100
-            )
 
-        if write_json:
-            out_json.write()
 
-        if write_video:
-            video.close_writer()
+# Set in each worker process by _init_chunk_worker, cancels the chunks of the run
+_stop_event = None
 
-        return out_json
+
+def _init_chunk_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+
+def _process_chunk(
+    processor, video_path, options, first_frame, last_frame, frame_stride, batch_size=1
+):
+    """
+    Segments one contiguous chunk of frames in a worker process.
+
+    :param processor: ArcjetProcessor (pickled copy, without progress callback or CNN)
+    :param video_path: path of the video, opened separately by each worker
+    :param options: dictionary containing segmentation options
+    :param first_frame: index of the first frame of the chunk
+    :param last_frame: index of the last frame of the chunk
+    :param frame_stride: stride for frame processing
+    :param batch_size: number of frames gathered per CNN inference
+    :returns: list of per-frame output dictionaries, up to the cancellation of the run
+    """
+    video = Video(video_path)
+    outputs = []
+    should_stop = _stop_event.is_set if _stop_event is not None else None
+    for _, _, contour_dict, argdict in processor.iter_processed(
+        video, options, first_frame, last_frame, frame_stride, batch_size, should_stop
+    ):
+        argdict["PIXELS_PER_MM"] = processor.pixels_per_mm
+        argdict.update(contour_dict)
+        outputs.append(argdict)
+    video.close()
+    return outputs
+
+
+def __getattr__(name):
+    # ProcessorWorker is the Qt adapter; importing it from here keeps working, but only
+    # loads PySide6 when it is actually requested
+    if name == "ProcessorWorker":
+        from arcjetCV.gui.processor_worker import ProcessorWorker
+
+        return ProcessorWorker
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,14 @@
 import numpy as np
 import cv2 as cv
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.neighbors import LocalOutlierFactor
 
+# Worker processes are spawned rather than forked (the Linux default): forking would
+# copy the torch/Qt state held by the parent process into every worker
+SPAWN_CONTEXT = multiprocessing.get_context("spawn")
+
 
 def splitfn(fn: str):
     """
@@ -17,6 +23,24 @@ def splitfn(fn: str):
     return path, name, ext
 
 
+def spawn_pool(max_workers, initializer=None, initargs=()):
+    """
+    Process pool of fresh interpreters, used for all the parallel work of arcjetCV.
+
+    :param max_workers: number of worker processes
+    :param initializer: optional function called in each worker when it starts
+    :param initargs: arguments of initializer, created from SPAWN_CONTEXT when they
+                     are synchronization primitives
+    :returns: ProcessPoolExecutor using SPAWN_CONTEXT
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=SPAWN_CONTEXT,
+        initializer=initializer,
+        initargs=initargs,
+    )
+
+
 def smooth(x, window_len=11, window="hanning"):
     """
     Smooths the data using a window with the requested size.
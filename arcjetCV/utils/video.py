@@ -1,21 +1,43 @@
 import os
 import json
+from concurrent.futures import as_completed
 import cv2 as cv
 import numpy as np
+import queue
 import threading
-from arcjetCV.utils.utils import splitfn
+from arcjetCV.utils.utils import spawn_pool, splitfn
+from arcjetCV.utils.meta_cache import get_meta_cache, video_fingerprint
 try:
-    from arcjetCV.segmentation.time.time_segmentation import (
-        time_segmentation,
+    from arcjetCV.segmentation.time.inference import (
         extract_interest,
+        resample_trace,
+        sample_brightness,
+        segment_trace,
+        trace_sample_indices,
     )
     _time_segmentation_error = None
 except ModuleNotFoundError as exc:
-    time_segmentation = None
+    segment_trace = None
     extract_interest = None
     _time_segmentation_error = exc
 
 
+def frame_brightness(frame):
+    """
+    Mean luma of a frame, computed from the channel means.
+
+    Equals np.mean(cv.cvtColor(frame, cv.COLOR_BGR2GRAY)) up to the per-pixel rounding
+    of the gray conversion (well below 0.5 gray levels), without building the gray image.
+
+    :param frame: BGR or grayscale opencv image
+    :returns: float
+    """
+    b, g, r, _ = cv.mean(frame)
+    if frame.ndim == 2:
+        return b
+    return 0.114 * b + 0.587 * g + 0.299 * r
+
+
 class Video(object):
     """
     Convenience wrapper for opencv video capture.
@@ -33,6 +55,7 @@ class Video(object):
         shape (tuple): Shape of the video frames (height, width, channels).
         last_frame: Last frame read from the video.
         writer: OpenCV VideoWriter object for writing processed frames.
+        prefetch (int): Default decode-ahead depth for iter_frames.
         _lock: Threading lock for thread-safe access to the video capture object.
 
     Example:
@@ -43,11 +66,12 @@ class Video(object):
     ```
     """
 
-    def __init__(self, path):
+    def __init__(self, path, prefetch=0):
         """
         Initializes the Video object.
 
         :param path: path to the video file
+        :param prefetch: default decode-ahead depth used by iter_frames (0 disables)
         """
         ### path variables
         self.fpath = path
@@ -56,6 +80,8 @@ class Video(object):
         self.folder = folder
         self.ext = ext
         self._lock = threading.Lock()
+        self._seek_count = 0
+        self.prefetch = prefetch
 
         ### opencv video file object
         self.cap = cv.VideoCapture(self.fpath)
@@ -94,6 +120,7 @@ class Video(object):
         :returns: next frame
         """
         with self._lock:
+            self._seek_count += 1
             _, self.last_frame = self.cap.read()
             return self.last_frame
 
@@ -104,6 +131,7 @@ class Video(object):
         :param index: index of the frame to set
         """
         with self._lock:
+            self._seek_count += 1
             self.cap.set(cv.CAP_PROP_POS_FRAMES, index)
             return
 
@@ -115,10 +143,130 @@ class Video(object):
         :returns: RGB frame at the specified index
         """
         with self._lock:
+            self._seek_count += 1
             self.cap.set(cv.CAP_PROP_POS_FRAMES, index)
             _, self.last_frame = self.cap.read()
             return cv.cvtColor(self.last_frame, cv.COLOR_BGR2RGB)
 
+    def iter_frames(self, first, last, stride=1, seek_threshold=32, prefetch=None):
+        """
+        Iterates over frames first..last (inclusive) with the given stride.
+
+        Seeks once to the first frame and then decodes forward sequentially,
+        grabbing (decoding without retrieving) the frames skipped by the stride.
+        A seek is only issued again if more than seek_threshold frames would be
+        skipped, or if another caller moved the capture position in between.
+
+        With prefetch > 0, decoding runs in a background thread that keeps up to
+        `prefetch` frames ready in a ring of preallocated buffers. Frames yielded
+        in this mode are only valid until the next iteration; copy them to keep them.
+
+        :param first: index of the first frame
+        :param last: index of the last frame (inclusive)
+        :param stride: frame stride
+        :param seek_threshold: maximum number of frames grabbed before seeking instead
+        :param prefetch: decode-ahead depth, defaults to self.prefetch (0 disables)
+        :returns: generator of (index, RGB frame) tuples; frame is None if decoding failed
+        """
+        if prefetch is None:
+            prefetch = self.prefetch
+        if prefetch > 0:
+            return self._iter_frames_prefetch(first, last, stride, seek_threshold, prefetch)
+        return (
+            (index, frame)
+            for index, frame, _ in self._iter_frames(first, last, stride, seek_threshold)
+        )
+
+    def _iter_frames(self, first, last, stride, seek_threshold, buffers=None):
+        """
+        Sequential decoding loop behind iter_frames.
+
+        :param buffers: optional queue of preallocated RGB buffers to decode into;
+                        a None item stops the iteration
+        :returns: generator of (index, RGB frame, buffer) tuples
+        """
+        pos = None
+        seek_count = None
+        for index in range(first, last + 1, stride):
+            # Wait for a free buffer before taking the lock
+            buf = None
+            if buffers is not None:
+                buf = buffers.get()
+                if buf is None:
+                    return
+
+            with self._lock:
+                # Re-seek if the capture was moved by get_frame/set_frame meanwhile
+                if (
+                    pos is None
+                    or seek_count != self._seek_count
+                    or index - pos > seek_threshold
+                ):
+                    self.cap.set(cv.CAP_PROP_POS_FRAMES, index)
+                    pos = index
+
+                ret = True
+                while ret and pos < index:
+                    ret = self.cap.grab()
+                    pos += 1
+
+                if ret:
+                    ret, self.last_frame = self.cap.read()
+                if not ret:
+                    self.last_frame = None
+                    pos = None
+                    frame = None
+                else:
+                    pos += 1
+                    frame = cv.cvtColor(self.last_frame, cv.COLOR_BGR2RGB, dst=buf)
+
+                self._seek_count += 1
+                seek_count = self._seek_count
+
+            yield index, frame, buf
+
+    def _iter_frames_prefetch(self, first, last, stride, seek_threshold, depth):
+        """
+        Decode-ahead variant of iter_frames using a producer thread.
+
+        :param depth: number of frames decoded ahead of the consumer
+        :returns: generator of (index, RGB frame) tuples
+        """
+        # One extra buffer is held by the consumer while the producer fills the others
+        free = queue.Queue()
+        for _ in range(depth + 1):
+            free.put(np.empty(self.shape, dtype=np.uint8))
+        filled = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for item in self._iter_frames(first, last, stride, seek_threshold, free):
+                    if stop.is_set():
+                        break
+                    filled.put(item)
+            except Exception as exc:
+                filled.put(exc)
+            filled.put(None)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = filled.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                index, frame, buf = item
+                yield index, frame
+                free.put(buf)
+        finally:
+            # Unblock and join the producer if the consumer stopped early
+            stop.set()
+            free.put(None)
+            producer.join()
+
     def close(self):
         """
         Closes the video capture.
@@ -165,12 +313,20 @@ class VideoMeta(dict):
     ```
     """
 
-    def __init__(self, video, path, progress_callback=None):
+    def __init__(self, video, path, progress_callback=None, workers=1, cache=True):
         """
         Initializes the VideoMeta object.
 
+        Without a metadata file at path, or when the file was written for different video
+        content (its VIDEO_FINGERPRINT differs), the metadata is taken from the metadata
+        cache if the same video content was seen before, and computed from the video
+        otherwise.
+
         :param video: Video object
         :param path: path to the video file
+        :param progress_callback: optional progress(percent, message)
+        :param workers: number of processes decoding the video when creating new metadata
+        :param cache: MetaCache, True for the default cache, False to disable caching
         """
         super(VideoMeta, self).__init__()
         folder, name, ext = splitfn(path)
@@ -179,6 +335,9 @@ class VideoMeta(dict):
         self.ext = ext
         self.path = path
         self._progress_callback = progress_callback
+        self._video_path = video.fpath
+        self._fingerprint = None
+        self._cache = get_meta_cache() if cache is True else None if cache is False else cache
 
         def _emit_progress(value, message):
             if self._progress_callback is not None:
@@ -201,11 +360,30 @@ class VideoMeta(dict):
         self["CROP_XMAX"] = None
         self["NOTES"] = None
         self["BRIGHTNESS"] = None
+        self["VIDEO_FINGERPRINT"] = None
 
         if os.path.exists(path):
             _emit_progress(15, "Loading metadata...")
+            defaults = dict(self)
             self.load(path)
-            _emit_progress(100, "Metadata loaded.")
+            # Files written before fingerprints were stored are trusted as before
+            if self["VIDEO_FINGERPRINT"] in (None, self.fingerprint()):
+                _emit_progress(100, "Metadata loaded.")
+                return
+            print(f"{path} was written for different video content, rebuilding it")
+            self.clear()
+            self.update(defaults)
+
+        cached = self.cached_meta()
+        if cached is not None and cached.get("NFRAMES") != video.nframes:
+            cached = None
+
+        if cached is not None:
+            print("Loaded metadata from cache")
+            self.update(cached)
+            _emit_progress(98, "Writing metadata...")
+            self.write()
+            _emit_progress(100, "Video metadata ready.")
         else:
             _emit_progress(5, "Initializing metadata...")
             self["WIDTH"] = video.w
@@ -213,17 +391,29 @@ class VideoMeta(dict):
             self["CHANNELS"] = video.chan
             self["NFRAMES"] = video.nframes
 
-            if time_segmentation is not None and extract_interest is not None:
-                try:  # Infer meta parameters
-                    print("Inferring first and last frames ... ", end="")
-                    _emit_progress(10, "Inferring first/last valid frames...")
+            # initial crop
+            self.reset_frame_crop()
 
-                    def _time_seg_progress(pct, msg):
-                        mapped = 10 + int(35 * (pct / 100.0))
-                        _emit_progress(mapped, msg)
+            # Brightness trace and time-segmentation samples from one decode pass
+            print("Scanning video ... ", end="")
+            _emit_progress(5, "Scanning video...")
+            samples = self.scan(
+                video,
+                lambda pct, msg: _emit_progress(5 + int(0.9 * pct), msg),
+                workers=workers,
+            )
+            print("Done")
 
-                    _, out = time_segmentation(video, progress_callback=_time_seg_progress)
-                    start, end = extract_interest(out)
+            if segment_trace is not None and extract_interest is not None:
+                try:  # Infer meta parameters
+                    print("Inferring first and last frames ... ", end="")
+                    _emit_progress(95, "Inferring first/last valid frames...")
+                    trace = resample_trace(
+                        [index for index, _ in samples],
+                        [value for _, value in samples],
+                        video.nframes,
+                    )
+                    start, end = extract_interest(segment_trace(trace))
                     print("Done")
                     self["FIRST_GOOD_FRAME"] = max(
                         round(start[0] * video.nframes / 500), int(video.nframes * 0.1)
@@ -245,42 +435,123 @@ class VideoMeta(dict):
                 self["FIRST_GOOD_FRAME"] = 0
                 self["LAST_GOOD_FRAME"] = video.nframes
 
-            # initial crop
-            self.reset_frame_crop()
-
-            print("Calculating brightness ... ", end="")
-            _emit_progress(45, "Calculating brightness trace...")
-            self["BRIGHTNESS"] = []
-            video.set_frame(0)
-            progress_stride = max(1, video.nframes // 100)
-            for idx in range(video.nframes):
-                ret, frame = video.cap.read()
-                if not ret:
-                    break
-                gray_frame = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
-                brightness = np.mean(gray_frame)
-                self["BRIGHTNESS"].append(round(brightness, 2))
-                if idx % progress_stride == 0:
-                    frame_progress = idx / max(1, video.nframes - 1)
-                    _emit_progress(
-                        45 + int(50 * frame_progress),
-                        "Calculating brightness trace...",
-                    )
-            print("Done")
             _emit_progress(98, "Writing metadata...")
             self.write()
             _emit_progress(100, "Video metadata ready.")
 
+    def scan(self, video, progress_callback=None, workers=1, min_chunk_frames=1000):
+        """
+        Decodes the video once, filling self["BRIGHTNESS"] with the mean luma of every
+        frame and sampling the time-segmentation brightness feature on the way.
+
+        With workers > 1 the frame range is split into contiguous chunks of at least
+        min_chunk_frames frames, decoded by worker processes with their own capture.
+
+        :param video: Video object
+        :param progress_callback: optional progress(percent, message)
+        :param workers: number of worker processes
+        :param min_chunk_frames: minimum number of frames per worker
+        :returns: list of (frame index, sample_brightness) of the sampled frames
+        """
+        sample_indices = set()
+        if segment_trace is not None:
+            sample_indices = set(trace_sample_indices(video.nframes).tolist())
+
+        workers = min(workers, video.nframes // max(1, min_chunk_frames))
+        if workers > 1:
+            brightness, samples = self._scan_parallel(
+                video, sample_indices, workers, progress_callback
+            )
+        else:
+            video.set_frame(0)
+            brightness, samples = _scan_frames(
+                video.cap, 0, video.nframes - 1, sample_indices, progress_callback
+            )
+        self["BRIGHTNESS"] = brightness
+        return samples
+
+    def _scan_parallel(self, video, sample_indices, workers, progress_callback=None):
+        """
+        Runs _scan_chunk on contiguous chunks of the video in worker processes.
+
+        :returns: brightness list and samples, as concatenated by scan
+        """
+        chunks = np.array_split(np.arange(video.nframes), workers)
+
+        with spawn_pool(len(chunks)) as pool:
+            futures = [
+                pool.submit(
+                    _scan_chunk,
+                    video.fpath,
+                    int(chunk[0]),
+                    int(chunk[-1]),
+                    {i for i in sample_indices if chunk[0] <= i <= chunk[-1]},
+                )
+                for chunk in chunks
+            ]
+            ndone = 0
+            for future in as_completed(futures):
+                ndone += len(chunks[futures.index(future)])
+                if progress_callback is not None:
+                    progress_callback(
+                        int(100 * ndone / video.nframes), "Scanning video..."
+                    )
+
+            # Chunks are contiguous; stop at the first one that ended early, like the
+            # sequential scan stops at the first unreadable frame
+            brightness, samples = [], []
+            for chunk, future in zip(chunks, futures):
+                chunk_brightness, chunk_samples = future.result()
+                brightness += chunk_brightness
+                samples += chunk_samples
+                if len(chunk_brightness) < len(chunk):
+                    break
+        return brightness, samples
+
+    def fingerprint(self):
+        """
+        Content fingerprint of the video, computed on first use.
+
+        :returns: hex digest, see video_fingerprint
+        """
+        if self._fingerprint is None:
+            self._fingerprint = video_fingerprint(self._video_path)
+        return self._fingerprint
+
+    def cached_meta(self):
+        """
+        Metadata of this video content from the metadata cache.
+
+        :returns: dictionary, or None if not cached or caching is disabled
+        """
+        if self._cache is None:
+            return None
+        try:
+            return self._cache.get(self.fingerprint())
+        except OSError as exc:
+            print(f"Metadata cache unavailable: {exc}")
+            return None
+
     def write(self):
         """
-        Writes the metadata to a JSON file.
+        Writes the metadata to a JSON file, and to the metadata cache if enabled.
+
+        The file stores the fingerprint of the video, so it is rebuilt if the video is
+        replaced.
         """
+        self["VIDEO_FINGERPRINT"] = self.fingerprint()
         print(f"Writing {self.path} file ... ", end="")
         fout = open(self.path, "w+")
         json.dump(self, fout)
         fout.close()
         print("Done")
 
+        if self._cache is not None:
+            try:
+                self._cache.put(self.fingerprint(), dict(self))
+            except OSError as exc:
+                print(f"Could not update the metadata cache: {exc}")
+
     def load(self, path):
         """
         Loads metadata from a JSON file.
@@ -331,3 +602,53 @@ class VideoMeta(dict):
             [self["CROP_YMIN"], self["CROP_YMAX"]],
             [self["CROP_XMIN"], self["CROP_XMAX"]],
         ]
+
+
+def _scan_frames(cap, first, last, sample_indices, progress_callback=None):
+    """
+    Reads frames first..last (inclusive) sequentially from a capture positioned at first.
+
+    :param cap: cv.VideoCapture
+    :param first: index of the next frame of cap
+    :param last: index of the last frame to read
+    :param sample_indices: set of frame indices to compute sample_brightness on
+    :param progress_callback: optional progress(percent, message)
+    :returns: list of rounded frame_brightness, stopping at the first unreadable frame,
+              and list of (frame index, sample_brightness)
+    """
+    brightness = []
+    samples = []
+    nframes = last - first + 1
+    progress_stride = max(1, nframes // 100)
+    for idx in range(first, last + 1):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        brightness.append(round(frame_brightness(frame), 2))
+        if idx in sample_indices:
+            value = sample_brightness(frame)
+            if value is not None:
+                samples.append((idx, value))
+        if progress_callback is not None and (idx - first) % progress_stride == 0:
+            progress_callback(
+                int(100 * (idx - first) / max(1, nframes - 1)), "Scanning video..."
+            )
+    return brightness, samples
+
+
+def _scan_chunk(video_path, first, last, sample_indices):
+    """
+    Scans one contiguous chunk of frames in a worker process.
+
+    :param video_path: path of the video, opened separately by each worker
+    :param first: index of the first frame of the chunk
+    :param last: index of the last frame of the chunk
+    :param sample_indices: set of frame indices to compute sample_brightness on
+    :returns: brightness list and samples, see _scan_frames
+    """
+    cap = cv.VideoCapture(video_path)
+    # Seeking decodes forward from the closest preceding keyframe
+    cap.set(cv.CAP_PROP_POS_FRAMES, first)
+    result = _scan_frames(cap, first, last, sample_indices)
+    cap.release()
+    return result
@@ -0,0 +1,48 @@
+"""
+CPU throughput of the CNN segmentation backends: eager PyTorch against the exported
+ONNX graph in onnxruntime, for several intra-op thread counts. Uses the packaged
+checkpoint when present, the production U-Net/xception with random weights otherwise.
+
+Usage:
+    python benchmarks/bench_cnn_backends.py [nframes] [intra_op_threads ...]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import segmentation_models_pytorch as smp
+from arcjetCV.segmentation.contour.cnn import CNN, CHECKPOINT_PATH, load_unet
+
+
+def throughput(cnn, frames):
+    cnn.predict(frames[0])
+    t0 = time.perf_counter()
+    for frame in frames:
+        cnn.predict(frame)
+    return len(frames) / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    nframes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    thread_counts = [int(s) for s in sys.argv[2:]] or [1, 2, 4]
+
+    if CHECKPOINT_PATH.stat().st_size > 1e6:
+        model = load_unet()
+    else:
+        model = smp.Unet(
+            encoder_name="xception", encoder_weights=None, classes=4, activation=None
+        ).eval()
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (1025, 1025, 3), dtype=np.uint8) for _ in range(nframes)]
+
+    print(f"{'backend':>8} {'threads':>7} {'frames/s':>9}")
+    print(f"{'torch':>8} {'-':>7} {throughput(CNN(model=model), frames):>9.2f}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        onnx_path = Path(tmpdir) / "unet.onnx"
+        for threads in thread_counts:
+            cnn = CNN(
+                backend="onnx", model=model, onnx_path=onnx_path, intra_op_threads=threads
+            )
+            print(f"{'onnx':>8} {threads:>7} {throughput(cnn, frames):>9.2f}")
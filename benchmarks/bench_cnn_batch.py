@@ -0,0 +1,40 @@
+"""
+CPU throughput of CNN.predict_batch for several batch sizes, using the production
+U-Net/xception architecture with random weights (the checkpoint is not required).
+
+Usage:
+    python benchmarks/bench_cnn_batch.py [nframes] [batch_size ...]
+"""
+
+import sys
+import time
+import numpy as np
+import torch
+import segmentation_models_pytorch as smp
+from arcjetCV.segmentation.contour.cnn import CNN
+
+
+def make_cnn():
+    model = smp.Unet(
+        encoder_name="xception", encoder_weights=None, classes=4, activation=None
+    )
+    return CNN(model=model)
+
+
+if __name__ == "__main__":
+    nframes = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    batch_sizes = [int(s) for s in sys.argv[2:]] or [1, 2, 4, 8]
+
+    cnn = make_cnn()
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (1025, 1025, 3), dtype=np.uint8) for _ in range(nframes)]
+    cnn.predict_batch(frames[:1])
+
+    print(f"torch threads: {torch.get_num_threads()}")
+    print(f"{'batch':>5} {'frames/s':>9}")
+    for batch_size in batch_sizes:
+        t0 = time.perf_counter()
+        for i in range(0, nframes, batch_size):
+            cnn.predict_batch(frames[i : i + batch_size])
+        dt = time.perf_counter() - t0
+        print(f"{batch_size:>5} {nframes / dt:>9.2f}")
@@ -0,0 +1,66 @@
+"""
+CNN model loading costs: checkpoint load with and without memory mapping, a second
+request served by the shared registry, and first-inference latency with and without
+warm-up. Uses the packaged checkpoint when present, random U-Net/xception weights
+saved to a temporary file otherwise.
+
+Usage:
+    python benchmarks/bench_cnn_load.py
+"""
+
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import torch
+import segmentation_models_pytorch as smp
+from arcjetCV.segmentation.contour.cnn import (
+    CHECKPOINT_PATH,
+    CNN,
+    clear_cnn_registry,
+    get_cnn,
+    load_unet,
+)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1e3
+
+
+def load_copy(path):
+    # Previous loading: full read of the checkpoint, then copy into the parameters
+    model = smp.Unet(encoder_name="xception", encoder_weights=None, classes=4, activation=None)
+    model.load_state_dict(torch.load(path, map_location="cpu", weights_only=False))
+    return model.eval()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmpdir:
+        checkpoint = CHECKPOINT_PATH
+        if checkpoint.stat().st_size < 1e6:
+            checkpoint = Path(tmpdir) / "unet.pt"
+            model = smp.Unet(encoder_name="xception", encoder_weights=None, classes=4)
+            torch.save(model.state_dict(), checkpoint)
+
+        frame = np.random.default_rng(0).integers(0, 256, (1025, 1025, 3), dtype=np.uint8)
+
+        _, t_copy = timed(lambda: load_copy(checkpoint))
+        _, t_mmap = timed(lambda: load_unet(checkpoint))
+        print(f"checkpoint load, copy      {t_copy:8.1f} ms")
+        print(f"checkpoint load, mmap      {t_mmap:8.1f} ms")
+
+        cnn, t_first = timed(lambda: get_cnn(checkpoint_path=checkpoint, warmup=True))
+        _, t_second = timed(lambda: get_cnn(checkpoint_path=checkpoint))
+        print(f"get_cnn first (+warm-up)   {t_first:8.1f} ms")
+        print(f"get_cnn second (shared)    {t_second:8.1f} ms")
+
+        cold = CNN(checkpoint_path=checkpoint)
+        _, t_cold = timed(lambda: cold.predict(frame))
+        _, t_warm = timed(lambda: cnn.predict(frame))
+        _, t_steady = timed(lambda: cnn.predict(frame))
+        print(f"first frame, cold model    {t_cold:8.1f} ms")
+        print(f"first frame, warmed model  {t_warm:8.1f} ms")
+        print(f"steady state frame         {t_steady:8.1f} ms")
+        clear_cnn_registry()
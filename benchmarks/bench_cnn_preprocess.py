@@ -0,0 +1,33 @@
+"""
+Per-frame CNN input preprocessing latency: the torchvision chain
+(ToPILImage -> Resize -> ToTensor -> Normalize) against CNN.preprocess, which resizes
+with cv2 and normalizes into a reused float32 buffer.
+
+Usage:
+    python benchmarks/bench_cnn_preprocess.py
+"""
+
+import timeit
+import numpy as np
+import torch
+from torchvision import transforms as T
+from arcjetCV.segmentation.contour.cnn import CNN
+
+
+if __name__ == "__main__":
+    cnn = CNN.__new__(CNN)
+    cnn.mean = [0.485, 0.456, 0.406]
+    cnn.std = [0.229, 0.224, 0.225]
+    cnn.input_size = (512, 512)
+    transforms = T.Compose(
+        [T.ToPILImage(), T.Resize((512, 512)), T.ToTensor(), T.Normalize(cnn.mean, cnn.std)]
+    )
+
+    rng = np.random.default_rng(0)
+    print(f"{'crop':>10} {'torchvision ms':>15} {'cv2 ms':>7} {'speedup':>8}")
+    for side in [512, 1025, 2160]:
+        img = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+        n = 20
+        t_old = timeit.timeit(lambda: torch.stack([transforms(img)]), number=n) / n * 1e3
+        t_new = timeit.timeit(lambda: cnn.preprocess([img]), number=n) / n * 1e3
+        print(f"{side:>4}x{side:<5} {t_old:>15.2f} {t_new:>7.2f} {t_old / t_new:>7.1f}x")
@@ -0,0 +1,38 @@
+"""
+Cost of native-resolution tiled CNN inference (CNN.predict_tiled) against the single
+resized inference (CNN.predict) on large square crops, with the mask resolution each
+one delivers. Uses the production U-Net/xception with random weights.
+
+Usage:
+    python benchmarks/bench_cnn_tiled.py [crop_side] [scale ...]
+"""
+
+import sys
+import time
+import numpy as np
+import segmentation_models_pytorch as smp
+from arcjetCV.segmentation.contour.cnn import CNN, _tile_starts
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 2160
+    scales = [float(s) for s in sys.argv[2:]] or [0.5, 1.0]
+
+    model = smp.Unet(encoder_name="xception", encoder_weights=None, classes=4, activation=None)
+    cnn = CNN(model=model)
+    img = np.random.default_rng(0).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    cnn.warmup()
+
+    print(f"{'mode':>14} {'tiles':>6} {'seconds':>8} {'px per mask px':>15}")
+    t = timed(lambda: cnn.predict(img))
+    print(f"{'resized 512':>14} {1:>6} {t:>8.2f} {side / 512:>15.2f}")
+    for scale in scales:
+        n = len(_tile_starts(max(512, round(side * scale)), 512, 64)) ** 2
+        t = timed(lambda: cnn.predict_tiled(img, scale=scale, memory_budget=2**30))
+        print(f"{'tiled x' + str(scale):>14} {n:>6} {t:>8.2f} {1 / scale:>15.2f}")
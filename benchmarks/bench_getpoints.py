@@ -0,0 +1,48 @@
+"""
+Per-frame cost of getPoints on dense leading edges of 5-20k points, against the
+previous pure-Python loop implementation kept below for reference.
+
+Usage:
+    python benchmarks/bench_getpoints.py
+"""
+
+import timeit
+import numpy as np
+from arcjetCV.segmentation.contour.contour import getPoints
+
+
+def getPoints_loop(c, r=[-0.95, -0.50, 0, 0.50, 0.95]):
+    # Previous implementation (flow_direction="right" branch)
+    low_ind = c[:, 0, 1].argmin()
+    ymin = c[low_ind, 0, 1]
+    high_ind = c[:, 0, 1].argmax()
+    ymax = c[high_ind, 0, 1]
+    center = int((ymin + ymax) / 2)
+    radius = int((ymax - ymin) / 2)
+    xpos = np.zeros(len(r))
+    ypos = [int(y * radius + center) for y in r]
+    li = min(low_ind, high_ind)
+    hi = max(low_ind, high_ind)
+    for ind in np.arange(li, hi):
+        for j in range(0, len(ypos)):
+            if abs(c[ind, 0, 1] - ypos[j]) < 3:
+                xpos[j] = c[ind, 0, 0]
+    return xpos
+
+
+def make_edge(npoints):
+    # Dense semicircular leading edge, one point per vertical pixel
+    radius = npoints / 2.0
+    y = np.arange(npoints)
+    x = radius - np.sqrt(np.maximum(radius**2 - (y - radius) ** 2, 0))
+    return np.stack([x, y], axis=1).astype(np.int32).reshape(-1, 1, 2)
+
+
+if __name__ == "__main__":
+    print(f"{'points':>7} {'loop ms':>9} {'vectorized ms':>14} {'speedup':>8}")
+    for npoints in [5000, 10000, 20000]:
+        c = make_edge(npoints)
+        n = 5
+        t_loop = timeit.timeit(lambda: getPoints_loop(c), number=n) / n * 1e3
+        t_vec = timeit.timeit(lambda: getPoints(c), number=n * 20) / (n * 20) * 1e3
+        print(f"{npoints:>7} {t_loop:>9.2f} {t_vec:>14.3f} {t_loop / t_vec:>7.0f}x")
@@ -0,0 +1,50 @@
+"""
+Per-frame cost of the AutoHSV range filtering on a 4K crop: the previous flow calling
+filter_hsv_ranges (one cv.inRange per range) for the shock and model masks, against the
+precompiled HSVRangeClassifier lookup tables.
+
+Usage:
+    python benchmarks/bench_hsv_classifier.py
+"""
+
+import timeit
+import numpy as np
+from arcjetCV.segmentation.contour.contour import (
+    AUTOHSV_DIM_MODEL_RANGES,
+    AUTOHSV_DIM_SHOCK_RANGES,
+    AUTOHSV_MODEL_RANGES,
+    AUTOHSV_SHOCK_RANGES,
+    _AUTOHSV_CLASSIFIER,
+    filter_hsv_ranges,
+)
+
+
+def masks_inrange(hsv):
+    # Previous flow for a dim-shock, underexposed frame
+    model = np.hstack((AUTOHSV_MODEL_RANGES, AUTOHSV_DIM_MODEL_RANGES))
+    shock = np.hstack((AUTOHSV_SHOCK_RANGES, AUTOHSV_DIM_SHOCK_RANGES))
+    filter_hsv_ranges(hsv, AUTOHSV_SHOCK_RANGES)
+    return filter_hsv_ranges(hsv, shock), filter_hsv_ranges(hsv, model)
+
+
+def masks_classifier(hsv):
+    labels = _AUTOHSV_CLASSIFIER.classify(hsv)
+    _AUTOHSV_CLASSIFIER.mask(labels, "SHOCK")
+    return (
+        _AUTOHSV_CLASSIFIER.mask(labels, "SHOCK", "DIM_SHOCK"),
+        _AUTOHSV_CLASSIFIER.mask(labels, "MODEL", "DIM_MODEL"),
+    )
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print(f"{'size':>11} {'inRange ms':>11} {'classifier ms':>14} {'speedup':>8}")
+    for h, w in [(1080, 1920), (2160, 2160), (2160, 3840)]:
+        hsv = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        hsv[..., 0] %= 180
+        for m0, m1 in zip(masks_inrange(hsv), masks_classifier(hsv)):
+            assert np.array_equal(m0, m1)
+        n = 10
+        t_old = timeit.timeit(lambda: masks_inrange(hsv), number=n) / n * 1e3
+        t_new = timeit.timeit(lambda: masks_classifier(hsv), number=n) / n * 1e3
+        print(f"{h:>5}x{w:<5} {t_old:>11.1f} {t_new:>14.1f} {t_old / t_new:>7.2f}x")
@@ -0,0 +1,45 @@
+"""
+Import time of the arcjetCV entry points, each measured in a fresh interpreter, and
+whether the import pulls in PySide6 or torch.
+
+Usage:
+    python benchmarks/bench_import_time.py [repeats]
+"""
+
+import subprocess
+import sys
+
+STATEMENTS = [
+    "import arcjetCV",
+    "from arcjetCV import Video, VideoMeta",
+    "from arcjetCV.utils.processor import ArcjetProcessor",
+    "import arcjetCV.batch",
+]
+
+PROBE = """
+import sys, time
+t0 = time.perf_counter()
+{statement}
+dt = time.perf_counter() - t0
+print(dt, "PySide6" in sys.modules, "torch" in sys.modules)
+"""
+
+
+def measure(statement):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(statement=statement)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()[-3:]
+    return float(out[0]), out[1] == "True", out[2] == "True"
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'statement':>52} {'seconds':>8} {'Qt':>5} {'torch':>5}")
+    for statement in STATEMENTS:
+        results = [measure(statement) for _ in range(repeats)]
+        dt = min(r[0] for r in results)
+        qt, torch = results[0][1:]
+        print(f"{statement:>52} {dt:>8.2f} {str(qt):>5} {str(torch):>5}")
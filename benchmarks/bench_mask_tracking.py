@@ -0,0 +1,46 @@
+"""
+Per-frame cost of CNN segmentation with keyframe tracking (MaskPropagator) against
+running the CNN on every frame, on the crops of the test video. Uses the production
+U-Net/xception with random weights, so only the timings and keyframe counts are
+meaningful, not the masks.
+
+Usage:
+    python benchmarks/bench_mask_tracking.py [nframes] [keyframe_interval ...]
+"""
+
+import sys
+import time
+from pathlib import Path
+import segmentation_models_pytorch as smp
+from arcjetCV.segmentation.contour.cnn import CNN
+from arcjetCV.segmentation.contour.tracking import MaskPropagator
+from arcjetCV.utils.video import Video
+
+VIDEO = Path(__file__).parents[1] / "tests" / "arcjet_test.mp4"
+
+
+if __name__ == "__main__":
+    nframes = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    intervals = [int(s) for s in sys.argv[2:]] or [5, 10, 30]
+
+    video = Video(str(VIDEO))
+    frames = [video.get_frame(i)[71:644, 128:1153] for i in range(150, 150 + nframes)]
+    video.close()
+
+    model = smp.Unet(encoder_name="xception", encoder_weights=None, classes=4, activation=None)
+    cnn = CNN(model=model)
+    cnn.warmup()
+
+    print(f"{'interval':>8} {'keyframes':>9} {'ms/frame':>9}")
+    t0 = time.perf_counter()
+    for frame in frames:
+        cnn.predict(frame)
+    dt = time.perf_counter() - t0
+    print(f"{1:>8} {nframes:>9} {1000 * dt / nframes:>9.1f}")
+
+    for interval in intervals:
+        propagator = MaskPropagator(keyframe_interval=interval)
+        t0 = time.perf_counter()
+        nkeys = sum(propagator.segment(frame, cnn.predict)[1] for frame in frames)
+        dt = time.perf_counter() - t0
+        print(f"{interval:>8} {nkeys:>9} {1000 * dt / nframes:>9.1f}")
@@ -0,0 +1,93 @@
+"""
+Compares writing and loading per-frame outputs as JSON, JSON Lines, Parquet
+and the binary contour store using synthetic frame records with contours of
+realistic size.
+
+Usage:
+    python benchmarks/bench_output_formats.py [nframes] [contour_points]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from arcjetCV.utils.output import (
+    OutputListJSON,
+    OutputJSONL,
+    OutputParquet,
+    OutputContours,
+    ContourStore,
+    iter_output_records,
+    read_output_parquet,
+)
+
+
+def make_record(index, npoints, rng):
+    contour = rng.integers(0, 2000, size=(npoints, 1, 2), dtype=np.int32)
+    return {
+        "INDEX": index,
+        "SEGMENT_METHOD": "AutoHSV",
+        "PIXELS_PER_MM": 1.0,
+        "MODEL_VISIBLE": True,
+        "OVEREXPOSED": False,
+        "UNDEREXPOSED": False,
+        "MODEL_AREA": float(rng.random() * 1e5),
+        "MODEL_CENTROID_X": 500,
+        "MODEL_CENTROID_Y": 400,
+        "MODEL_YCENTER": 400,
+        "MODEL_YLOW": np.int32(100),
+        "MODEL_CROP_YMAX": np.int32(700),
+        "MODEL_RADIUS": 300,
+        "MODEL_R": [-0.95, -0.5, 0, 0.5, 0.95],
+        "MODEL_INTERP_XPOS": rng.random(5) * 1000,
+        "SHOCK_AREA": float(rng.random() * 1e4),
+        "SHOCK_INTERP_XPOS": rng.random(1) * 1000,
+        "MODEL": contour,
+        "SHOCK": contour.copy(),
+    }
+
+
+def timed(label, func):
+    t0 = time.perf_counter()
+    result = func()
+    print(f"{label:<28} {time.perf_counter() - t0:8.3f} s")
+    return result
+
+
+if __name__ == "__main__":
+    nframes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    npoints = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = np.random.default_rng(0)
+    records = [make_record(i, npoints, rng) for i in range(nframes)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        name = os.path.join(tmpdir, "bench_0_%i" % nframes)
+
+        def write_all(output):
+            for record in records:
+                output.append(record)
+            output.write()
+
+        timed("write json", lambda: write_all(OutputListJSON(name + ".json")))
+        timed("write jsonl", lambda: write_all(OutputJSONL(name + ".jsonl")))
+        timed("write parquet", lambda: write_all(OutputParquet(name + ".parquet")))
+        timed(
+            "write contours",
+            lambda: write_all(OutputContours(name + ".contours", dtype=np.int16)),
+        )
+
+        timed("load json", lambda: list(iter_output_records(name + ".json")))
+        timed("load jsonl", lambda: list(iter_output_records(name + ".jsonl")))
+        timed("load parquet", lambda: read_output_parquet(name + ".parquet"))
+        timed(
+            "load parquet (2 columns)",
+            lambda: read_output_parquet(name + ".parquet", ["INDEX", "MODEL_AREA"]),
+        )
+
+        def load_contours(step):
+            store = ContourStore(name + ".contours")
+            return [np.array(store.get(i, "MODEL")) for i in store.index[::step]]
+
+        timed("load contours (all)", lambda: load_contours(1))
+        timed("load contours (every 100th)", lambda: load_contours(100))
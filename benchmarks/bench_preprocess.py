@@ -0,0 +1,63 @@
+"""
+Per-frame time and peak Python-tracked allocation of ArcjetProcessor preprocessing and
+segmentation, with a fresh square crop and fresh color conversions per frame
+(make_crop_square) against the reused FrameWorkspace buffers (process).
+
+Usage:
+    python benchmarks/bench_preprocess.py [video_path]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from arcjetCV.utils.video import Video, VideoMeta
+from arcjetCV.utils.processor import ArcjetProcessor
+
+
+def process_fresh(processor, frame, options):
+    # Previous path: new square crop and conversions for every frame
+    frame_crop, offset = processor.make_crop_square(frame)
+    argdict = processor.get_image_flags(frame_crop, options)
+    contour_dict, argdict = processor.segment(frame_crop, argdict)
+    return processor.get_edges_metrics(contour_dict, argdict, offset)
+
+
+def process_workspace(processor, frame, options):
+    return processor.process(frame, options)
+
+
+def measure(fn, processor, frames, method):
+    fn(processor, frames[0], {"SEGMENT_METHOD": method})
+    t0 = time.perf_counter()
+    for frame in frames:
+        fn(processor, frame, {"SEGMENT_METHOD": method})
+    dt = (time.perf_counter() - t0) / len(frames) * 1e3
+
+    tracemalloc.start()
+    peak = 0
+    for frame in frames[:5]:
+        tracemalloc.reset_peak()
+        fn(processor, frame, {"SEGMENT_METHOD": method})
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return dt, peak / 2**20
+
+
+if __name__ == "__main__":
+    default_path = Path(__file__).parent.parent / "tests" / "arcjet_test.mp4"
+    path = sys.argv[1] if len(sys.argv) > 1 else str(default_path)
+
+    video = Video(path)
+    videometa = VideoMeta(video, os.path.join(video.folder, video.name + ".meta"))
+    first = videometa["FIRST_GOOD_FRAME"]
+    frames = [frame for _, frame in video.iter_frames(first, first + 29)]
+    video.close()
+
+    processor = ArcjetProcessor(videometa)
+    print(f"{'method':>8} {'path':>10} {'ms/frame':>9} {'peak MiB':>9}")
+    for method in ["AutoHSV", "HSV", "GRAY"]:
+        for name, fn in [("fresh", process_fresh), ("workspace", process_workspace)]:
+            dt, peak = measure(fn, processor, frames, method)
+            print(f"{method:>8} {name:>10} {dt:>9.2f} {peak:>9.2f}")
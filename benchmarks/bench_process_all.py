@@ -0,0 +1,41 @@
+"""
+Measures ArcjetProcessor.process_all throughput for a number of worker processes.
+
+Usage:
+    python benchmarks/bench_process_all.py [video_path] [segment_method] [workers ...]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+from arcjetCV.utils.video import Video, VideoMeta
+from arcjetCV.utils.processor import ArcjetProcessor
+
+
+if __name__ == "__main__":
+    default_path = Path(__file__).parent.parent / "tests" / "arcjet_test.mp4"
+    path = sys.argv[1] if len(sys.argv) > 1 else str(default_path)
+    method = sys.argv[2] if len(sys.argv) > 2 else "AutoHSV"
+    worker_counts = [int(s) for s in sys.argv[3:]] or [1, 2, 4]
+
+    video = Video(path)
+    videometa = VideoMeta(video, os.path.join(video.folder, video.name + ".meta"))
+    first, last = videometa["FIRST_GOOD_FRAME"], videometa["LAST_GOOD_FRAME"] - 1
+
+    print(f"{'workers':>7} {'frames/s':>9}")
+    for workers in worker_counts:
+        processor = ArcjetProcessor(videometa)
+        t0 = time.perf_counter()
+        out = processor.process_all(
+            video,
+            {"SEGMENT_METHOD": method},
+            first,
+            last,
+            1,
+            write_json=False,
+            workers=workers,
+        )
+        dt = time.perf_counter() - t0
+        print(f"\r{workers:>7} {len(out) / dt:>9.1f}")
+    video.close()
@@ -0,0 +1,59 @@
+"""
+Cost of the time-segmentation network per brightness trace: loading the checkpoint on
+every call (previous behaviour), reusing the cached model, the TorchScript model, one
+batched forward pass over all traces, and the PyTorch-free NumPy network. Uses random
+weights saved to a temporary checkpoint.
+
+Usage:
+    python benchmarks/bench_time_segmentation.py [ntraces]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import torch
+from arcjetCV.segmentation.time.inference import get_numpy_time_model
+from arcjetCV.segmentation.time.time_segmentation import (
+    Conv1DNet,
+    _torch_load_compat,
+    export_time_weights,
+    get_time_model,
+    segment_traces,
+)
+
+
+def uncached(trace, checkpoint):
+    model = Conv1DNet()
+    model.load_state_dict(_torch_load_compat(checkpoint))
+    model.eval()
+    return segment_traces(trace, model)
+
+
+if __name__ == "__main__":
+    ntraces = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    traces = np.random.default_rng(0).random((ntraces, 500)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        checkpoint = Path(tmpdir) / "time-checkpoint.pt"
+        torch.save(Conv1DNet().state_dict(), checkpoint)
+        npz_path = export_time_weights(Path(tmpdir) / "time-weights.npz", checkpoint)
+
+        runs = {
+            "load per call": lambda: [uncached(t, checkpoint) for t in traces],
+            "cached": lambda: [segment_traces(t, get_time_model(checkpoint)) for t in traces],
+            "torchscript": lambda: [
+                segment_traces(t, get_time_model(checkpoint, script=True)) for t in traces
+            ],
+            "batched": lambda: segment_traces(traces, get_time_model(checkpoint)),
+            "numpy": lambda: [get_numpy_time_model(npz_path).predict(t) for t in traces],
+            "numpy batched": lambda: get_numpy_time_model(npz_path).predict(traces),
+        }
+        print(f"{'mode':>14} {'ms/trace':>9}")
+        for name, run in runs.items():
+            run()
+            t0 = time.perf_counter()
+            run()
+            dt = time.perf_counter() - t0
+            print(f"{name:>14} {1000 * dt / ntraces:>9.3f}")
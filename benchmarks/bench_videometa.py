@@ -0,0 +1,77 @@
+"""
+Time to create the metadata of a new video (VideoMeta without an existing .meta file).
+
+Without arguments, runs on the test video and on 1080p and 2160p upscaled copies of
+its first frames, written to a temporary folder. With --workers N it also times
+VideoMeta.scan with N worker processes (chunks of at least 100 frames).
+
+Usage:
+    python benchmarks/bench_videometa.py [--workers N] [video ...]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+import cv2 as cv
+from arcjetCV.utils.video import Video, VideoMeta
+
+VIDEO = Path(__file__).parents[1] / "tests" / "arcjet_test.mp4"
+
+
+def upscaled_copy(src, dst, height, nframes=150):
+    cap = cv.VideoCapture(str(src))
+    w = int(cap.get(cv.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv.CAP_PROP_FRAME_HEIGHT))
+    size = (round(w * height / h) // 2 * 2, height)
+    writer = cv.VideoWriter(str(dst), cv.VideoWriter_fourcc(*"mp4v"), 30, size)
+    for _ in range(nframes):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        writer.write(cv.resize(frame, size))
+    writer.release()
+    cap.release()
+    return dst
+
+
+def time_videometa(path, tmpdir, workers=1):
+    video = Video(str(path))
+    meta_path = os.path.join(tmpdir, Path(path).stem + ".meta")
+    t0 = time.perf_counter()
+    meta = VideoMeta(video, meta_path)
+    times = [time.perf_counter() - t0]
+    if workers > 1:
+        t0 = time.perf_counter()
+        meta.scan(video, workers=workers, min_chunk_frames=100)
+        times.append(time.perf_counter() - t0)
+    os.remove(meta_path)
+    video.close()
+    return video.nframes, video.shape, times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("videos", nargs="*")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = args.videos or [
+            VIDEO,
+            upscaled_copy(VIDEO, Path(tmpdir) / "arcjet_1080p.mp4", 1080),
+            upscaled_copy(VIDEO, Path(tmpdir) / "arcjet_2160p.mp4", 2160),
+        ]
+        results = [(Path(p).name, *time_videometa(p, tmpdir, args.workers)) for p in paths]
+
+    header = f"{'video':>20} {'frames':>7} {'shape':>16} {'seconds':>8} {'ms/frame':>9}"
+    if args.workers > 1:
+        header += f" {'scan x' + str(args.workers) + ' s':>12}"
+    print(header)
+    for name, nframes, shape, times in results:
+        line = f"{name:>20} {nframes:>7} {str(shape):>16} {times[0]:>8.2f}"
+        line += f" {1000 * times[0] / nframes:>9.2f}"
+        if len(times) > 1:
+            line += f" {times[1]:>12.2f}"
+        print(line)
@@ -87,7 +87,9 @@ setup(
             "gui/logo/*.png",
             "gui/logo/*.ico",
             "gui/logo/*.icns",
-        ],  # Include specific logo images
+            "segmentation/time/*.npz",
+        ],  # Include specific logo images and the NumPy time-segmentation weights
+        # when present; otherwise they are exported to the user model directory on first use
     },
     exclude_package_data={
         "arcjetCV": [
@@ -109,10 +111,15 @@ setup(
         "torch",
         "torchvision",
     ],
+    extras_require={
+        # CNN(backend="onnx") inference and export
+        "onnx": ["onnx", "onnxruntime"],
+    },
     entry_points={
         "console_scripts": [
             "arcjetCV=arcjetCV.gui.main:main",
             "arcjetcv=arcjetCV.gui.main:main",
+            "arcjetcv-batch=arcjetCV.batch:main",
         ],
     },
     project_urls={
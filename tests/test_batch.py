@@ -0,0 +1,140 @@
+import contextlib
+import io
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from arcjetCV.batch import load_manifest, main
+from arcjetCV.utils.video import Video
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        video_path = self.tmpdir / "arcjet_test.mp4"
+        shutil.copy(Path(__file__).parent / "arcjet_test.mp4", video_path)
+        video = Video(str(video_path))
+        meta = {
+            "WIDTH": video.w,
+            "HEIGHT": video.h,
+            "CHANNELS": video.chan,
+            "NFRAMES": video.nframes,
+            "FIRST_GOOD_FRAME": 150,
+            "LAST_GOOD_FRAME": 154,
+            "FLOW_DIRECTION": "right",
+            "CROP_YMIN": 71,
+            "CROP_YMAX": 644,
+            "CROP_XMIN": 128,
+            "CROP_XMAX": 1153,
+        }
+        video.close()
+        (self.tmpdir / "arcjet_test.meta").write_text(json.dumps(meta))
+
+        self.manifest = self.tmpdir / "campaign.json"
+        self.manifest.write_text(
+            json.dumps(
+                {
+                    "defaults": {
+                        "options": {"SEGMENT_METHOD": "AutoHSV"},
+                        "frame_stride": 2,
+                        "output_format": "jsonl",
+                    },
+                    "jobs": [
+                        {"video": "arcjet_test.mp4"},
+                        {
+                            "video": "arcjet_test.mp4",
+                            "first_frame": 160,
+                            "last_frame": 163,
+                            "frame_stride": 3,
+                            "output_prefix": "gray",
+                            "options": {"SEGMENT_METHOD": "GRAY", "THRESHOLD": 150},
+                        },
+                        "missing.mp4",
+                    ],
+                }
+            )
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_load_manifest(self):
+        jobs = load_manifest(self.manifest)
+        self.assertEqual(len(jobs), 3)
+        self.assertEqual(jobs[0]["video"], str(self.tmpdir / "arcjet_test.mp4"))
+        self.assertEqual(jobs[0]["frame_stride"], 2)
+        self.assertEqual(jobs[1]["options"], {"SEGMENT_METHOD": "GRAY", "THRESHOLD": 150})
+        self.assertEqual(jobs[2]["options"], {"SEGMENT_METHOD": "AutoHSV"})
+
+    def test_main(self):
+        summary_path = self.tmpdir / "summary.json"
+        status = main([str(self.manifest), "--summary", str(summary_path)])
+        self.assertEqual(status, 1)
+
+        summary = json.loads(summary_path.read_text())
+        self.assertEqual((summary["succeeded"], summary["failed"]), (2, 1))
+        ok, gray, missing = summary["results"]
+        self.assertEqual((ok["first_frame"], ok["last_frame"], ok["frames"]), (150, 154, 3))
+        self.assertEqual(ok["output"], str(self.tmpdir / "arcjet_test_150_154.jsonl"))
+        self.assertEqual(gray["frames"], 2)
+        self.assertTrue((self.tmpdir / "gray_160_163.jsonl").exists())
+        self.assertEqual(missing["status"], "failed")
+        self.assertIn("error", missing)
+
+    def test_main_parallel_jobs(self):
+        summary_path = self.tmpdir / "summary.json"
+        serial_path = self.tmpdir / "serial.json"
+        main([str(self.manifest), "--summary", str(serial_path)])
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = main(
+                [str(self.manifest), "--jobs", "2", "--workers", "2", "--summary", str(summary_path)]
+            )
+        self.assertEqual(status, 1)
+        self.assertIn("one worker process each", stdout.getvalue())
+
+        serial = json.loads(serial_path.read_text())["results"]
+        results = json.loads(summary_path.read_text())["results"]
+        self.assertEqual([r["video"] for r in results], [r["video"] for r in serial])
+        self.assertEqual([r["status"] for r in results], ["ok", "ok", "failed"])
+        self.assertEqual([r.get("frames") for r in results], [r.get("frames") for r in serial])
+
+    def test_unknown_keys(self):
+        manifest = json.loads(self.manifest.read_text())
+        manifest["jobs"][0]["write_parquett"] = True
+        self.manifest.write_text(json.dumps(manifest))
+        with self.assertRaisesRegex(ValueError, "write_parquett"):
+            load_manifest(self.manifest)
+
+        manifest["jobs"][0].pop("write_parquett")
+        manifest["default"] = {}
+        self.manifest.write_text(json.dumps(manifest))
+        with self.assertRaisesRegex(ValueError, "default"):
+            load_manifest(self.manifest)
+
+
+class TestHeadlessImports(unittest.TestCase):
+
+    def test_no_qt_or_torch(self):
+        code = (
+            "import sys\n"
+            "import arcjetCV.batch\n"
+            "from arcjetCV import ArcjetProcessor, Video, VideoMeta\n"
+            "print(sorted(m for m in ('PySide6', 'torch') if m in sys.modules))\n"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parents[1],
+        )
+        self.assertEqual(out.stdout.strip().splitlines()[-1], "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
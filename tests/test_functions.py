@@ -2,7 +2,15 @@ import os
 import unittest
 import numpy as np
 from arcjetCV.utils.utils import splitfn
-from arcjetCV.segmentation.contour.contour import filter_hsv_ranges, getPoints
+from arcjetCV.segmentation.contour.contour import (
+    AUTOHSV_DIM_MODEL_RANGES,
+    AUTOHSV_DIM_SHOCK_RANGES,
+    AUTOHSV_MODEL_RANGES,
+    AUTOHSV_SHOCK_RANGES,
+    HSVRangeClassifier,
+    filter_hsv_ranges,
+    getPoints,
+)
 
 
 class TestSplitFn(unittest.TestCase):
@@ -63,6 +71,32 @@ class TestFilterHsvRanges(unittest.TestCase):
             else:
                 self.assertEqual(mask_multi[i, j], 0)    # Black
 
+class TestHSVRangeClassifier(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.hsv_image = rng.integers(0, 256, (200, 300, 3), dtype=np.uint8)
+        self.hsv_image[..., 0] %= 180
+        self.groups = {
+            "MODEL": AUTOHSV_MODEL_RANGES,
+            "DIM_MODEL": AUTOHSV_DIM_MODEL_RANGES,
+            "SHOCK": AUTOHSV_SHOCK_RANGES,
+            "DIM_SHOCK": AUTOHSV_DIM_SHOCK_RANGES,
+        }
+        self.classifier = HSVRangeClassifier(self.groups)
+
+    def test_matches_filter_hsv_ranges(self):
+        labels = self.classifier.classify(self.hsv_image)
+        for names in [("MODEL",), ("SHOCK",), ("MODEL", "DIM_MODEL"), ("SHOCK", "DIM_SHOCK")]:
+            ranges = np.hstack([np.array(self.groups[name]) for name in names])
+            expected = filter_hsv_ranges(self.hsv_image, ranges)
+            np.testing.assert_array_equal(self.classifier.mask(labels, *names), expected)
+
+    def test_too_many_ranges(self):
+        ranges = ([(0, 0, 0)] * 17, [(10, 10, 10)] * 17)
+        with self.assertRaises(ValueError):
+            HSVRangeClassifier({"MODEL": ranges})
+
 class TestGetPoints(unittest.TestCase):
     
     def test_right_flow(self):
@@ -113,6 +147,56 @@ class TestGetPoints(unittest.TestCase):
         self.assertEqual(result["MODEL_RADIUS"], 10)
         self.assertEqual(len(result["MODEL_INTERP_XPOS"]), 5)
 
+    def test_subpixel_interpolation(self):
+        # Slanted edge x = y / 2: stations fall between integer pixels
+        y = np.arange(0, 101)
+        contour = np.stack([y // 2, y], axis=1).reshape(-1, 1, 2)
+        result = getPoints(contour, flow_direction="right", r=[-1, -0.25, 0.5, 1])
+        np.testing.assert_allclose(result["MODEL_INTERP_XPOS"], [0, 18.5, 37, 50])
+
+    def test_arbitrary_stations(self):
+        # Any number of stations; those outside the edge are 0
+        contour = np.array([[[20, 10]], [[10, 20]], [[20, 30]]])
+        r = np.linspace(-1, 1, 21)
+        result = getPoints(contour, flow_direction="left", r=list(r) + [1.5])
+        xpos = result["MODEL_INTERP_XPOS"]
+        self.assertEqual(len(xpos), 22)
+        np.testing.assert_allclose(xpos[:21], 10 + 10 * np.abs(r))
+        self.assertEqual(xpos[21], 0)
+
+    def test_duplicate_positions(self):
+        # Of the points sharing a row, the upstream one is kept
+        contour = np.array([[[10, 0]], [[6, 0]], [[4, 5]], [[8, 10]]])
+        result = getPoints(contour, flow_direction="right", r=[-1, 0, 1])
+        np.testing.assert_allclose(result["MODEL_INTERP_XPOS"], [6, 4, 8])
+
+    def test_horizontal_run(self):
+        # Blunt edge with horizontal runs at its top and bottom rows: stations next to
+        # the extremes follow the leading edge, not the middle of the runs
+        top = [(x, 0) for x in range(40, 20, -1)]
+        front = [(abs(20 - y), y) for y in range(0, 41)]
+        bottom = [(x, 40) for x in range(21, 41)]
+        contour = np.array(top + front + bottom).reshape(-1, 1, 2)
+        r = [-1, -0.975, -0.5, 0, 0.5, 0.975, 1]
+        result = getPoints(contour, flow_direction="right", r=r)
+        np.testing.assert_allclose(
+            result["MODEL_INTERP_XPOS"], [20, 19.5, 10, 0, 10, 19.5, 20]
+        )
+
+        mirrored = contour.copy()
+        mirrored[:, 0, 0] = 60 - mirrored[:, 0, 0]
+        result = getPoints(mirrored, flow_direction="left", r=r)
+        np.testing.assert_allclose(
+            result["MODEL_INTERP_XPOS"], [40, 40.5, 50, 60, 50, 40.5, 40]
+        )
+
+        # Vertical flow: the same edge with x and y swapped
+        swapped = contour[:, :, ::-1].copy()
+        result = getPoints(swapped, flow_direction="down", r=r)
+        np.testing.assert_allclose(
+            result["MODEL_INTERP_XPOS"], [20, 19.5, 10, 0, 10, 19.5, 20]
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
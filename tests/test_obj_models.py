@@ -1,8 +1,18 @@
+import shutil
 import unittest
+import threading
 import numpy as np
 from pathlib import Path
-from arcjetCV.utils.video import VideoMeta
-from arcjetCV.utils.output import OutputListJSON
+from arcjetCV.utils.video import Video, VideoMeta
+from arcjetCV.utils.output import (
+    OutputListJSON,
+    OutputJSONL,
+    OutputParquet,
+    OutputContours,
+    ContourStore,
+    iter_output_records,
+    read_output_parquet,
+)
 
 
 # class TestVideoMeta(unittest.TestCase):
@@ -56,6 +66,56 @@ from arcjetCV.utils.output import OutputListJSON
 #         expected_range = [[10, 100], [20, 200]]
 #         self.assertEqual(video_meta.crop_range(), expected_range)
 
+class TestVideo(unittest.TestCase):
+
+    def setUp(self):
+        self.video = Video(str(Path(__file__).parent / "arcjet_test.mp4"))
+
+    def tearDown(self):
+        self.video.close()
+
+    def test_iter_frames_matches_get_frame(self):
+        # Sequential decoding must return the same frames as random access
+        frames = list(self.video.iter_frames(10, 40, 7))
+        self.assertEqual([i for i, _ in frames], [10, 17, 24, 31, 38])
+        for index, frame in frames:
+            np.testing.assert_array_equal(frame, self.video.get_frame(index))
+
+    def test_iter_frames_interleaved_seek(self):
+        # A get_frame call between iterations must not shift the sequence
+        for index, frame in self.video.iter_frames(0, 12, 3):
+            self.video.get_frame(100)
+            np.testing.assert_array_equal(frame, self.video.get_frame(index))
+
+    def test_iter_frames_prefetch(self):
+        # Decode-ahead frames must match the synchronous path
+        expected = [(i, f.copy()) for i, f in self.video.iter_frames(0, 20, 2)]
+        prefetched = [
+            (i, f.copy()) for i, f in self.video.iter_frames(0, 20, 2, prefetch=3)
+        ]
+        self.assertEqual([i for i, _ in prefetched], [i for i, _ in expected])
+        for (_, f0), (_, f1) in zip(expected, prefetched):
+            np.testing.assert_array_equal(f0, f1)
+
+    def test_iter_frames_prefetch_early_exit(self):
+        # Leaving the loop early must stop the producer thread
+        nthreads = threading.active_count()
+        frames = self.video.iter_frames(0, 100, prefetch=2)
+        for index, _ in frames:
+            if index == 5:
+                break
+        frames.close()
+        self.assertEqual(threading.active_count(), nthreads)
+
+    def test_iter_frames_past_end(self):
+        # Frames beyond the end of the video are returned as None
+        last = self.video.nframes - 1
+        frames = list(self.video.iter_frames(last - 1, last + 2))
+        self.assertEqual([i for i, _ in frames], [last - 1, last, last + 1, last + 2])
+        self.assertIsNotNone(frames[0][1])
+        self.assertIsNone(frames[-1][1])
+
+
 class TestOutputListJSON(unittest.TestCase):
 
     def setUp(self):
@@ -108,5 +168,130 @@ class TestOutputListJSON(unittest.TestCase):
         self.assertEqual(output_list[1]["DATA"], "Frame 10")
 
 
+class TestOutputJSONL(unittest.TestCase):
+
+    def setUp(self):
+        self.test_file = Path('test_output_000_500.jsonl')
+
+    def tearDown(self):
+        if self.test_file.exists():
+            self.test_file.unlink()
+
+    def test_append_and_iterate(self):
+        # Records are streamed to disk and read back in order
+        with OutputJSONL(self.test_file, fsync_every=2) as output:
+            output.append({"INDEX": 10, "DATA": "Frame 0", "numpy": np.zeros(3)})
+            output.append({"INDEX": 11, "DATA": "Frame 1"})
+            output.append({"INDEX": 2000, "DATA": "Frame 20"})
+            output.append({"INDEX": 12, "DATA": "Frame 2"})
+            self.assertEqual(len(output), 3)
+
+        records = list(iter_output_records(self.test_file))
+        self.assertEqual([r["INDEX"] for r in records], [10, 11, 12])
+        self.assertEqual(records[0]["numpy"], [0.0, 0.0, 0.0])
+
+    def test_truncated_record(self):
+        # A partially written last line from an interrupted run is skipped
+        output = OutputJSONL(self.test_file)
+        output.append({"INDEX": 10, "DATA": "Frame 0"})
+        output.write()
+        with open(self.test_file, "a") as fout:
+            fout.write('{"INDEX": 11, "DA')
+
+        records = list(iter_output_records(self.test_file))
+        self.assertEqual(len(records), 1)
+
+    def test_append_after_truncated_record(self):
+        # Appending to an interrupted file drops its partial last line first
+        with OutputJSONL(self.test_file) as output:
+            output.append({"INDEX": 10, "DATA": "Frame 0"})
+        with open(self.test_file, "a") as fout:
+            fout.write('{"INDEX": 11, "DA')
+        with OutputJSONL(self.test_file, append=True) as output:
+            output.append({"INDEX": 11, "DATA": "Frame 1"})
+
+        records = list(iter_output_records(self.test_file))
+        self.assertEqual([r["INDEX"] for r in records], [10, 11])
+
+    def test_iterate_json(self):
+        # OutputListJSON files are read through the same iterator
+        json_file = Path('test_output_000_500.json')
+        output_list = OutputListJSON(json_file)
+        output_list.append({"INDEX": 5, "DATA": "Frame 5"})
+        output_list.write()
+        try:
+            records = list(iter_output_records(json_file))
+            self.assertEqual(records, [{"INDEX": 5, "DATA": "Frame 5"}])
+        finally:
+            json_file.unlink()
+
+
+class TestOutputParquet(unittest.TestCase):
+
+    def setUp(self):
+        self.test_file = Path('test_output_000_500.parquet')
+
+    def tearDown(self):
+        if self.test_file.exists():
+            self.test_file.unlink()
+
+    def test_row_groups_and_types(self):
+        output = OutputParquet(self.test_file, row_group_size=2)
+        for i in range(5):
+            output.append({
+                "INDEX": 10 + i,
+                "MODEL_AREA": 100.0 + i,
+                "MODEL_CENTROID_X": 5,
+                "MODEL_YLOW": np.int32(3),
+                "MODEL_VISIBLE": np.bool_(True),
+                "MODEL_INTERP_XPOS": np.arange(5, dtype=float),
+                "MODEL": np.zeros((10, 1, 2)),
+            })
+        output.append({"INDEX": 2000})
+        output.write()
+
+        import pyarrow.parquet as pq
+        self.assertEqual(pq.ParquetFile(self.test_file).num_row_groups, 3)
+
+        df = read_output_parquet(
+            self.test_file,
+            columns=["INDEX", "MODEL_AREA", "SHOCK_AREA", "MODEL_INTERP_XPOS"],
+        )
+        self.assertEqual(list(df["INDEX"]), [10, 11, 12, 13, 14])
+        self.assertEqual(df["MODEL_AREA"].iloc[4], 104.0)
+        self.assertTrue(df["SHOCK_AREA"].isna().all())
+        self.assertEqual(list(df["MODEL_INTERP_XPOS"].iloc[0]), [0.0, 1.0, 2.0, 3.0, 4.0])
+
+
+class TestOutputContours(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = Path('test_output_000_500.contours')
+
+    def tearDown(self):
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+
+    def test_write_and_lookup(self):
+        model = [np.arange(2 * n, dtype=np.int32).reshape(n, 1, 2) for n in (3, 5, 4)]
+        output = OutputContours(self.test_dir, dtype=np.int16)
+        output.append({"INDEX": 10, "MODEL": model[0], "SHOCK": None})
+        output.append({"INDEX": 12, "MODEL": model[1], "SHOCK": model[2]})
+        output.append({"INDEX": 2000, "MODEL": model[2], "SHOCK": model[2]})
+        output.append({"INDEX": 14, "MODEL": model[2], "SHOCK": np.zeros((0, 1, 2))})
+        output.write()
+
+        store = ContourStore(self.test_dir)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(list(store.index), [10, 12, 14])
+        self.assertNotIn(2000, store)
+        self.assertEqual(store.get(12, "MODEL").dtype, np.int16)
+        for index, c in zip([10, 12, 14], model):
+            np.testing.assert_array_equal(store.get(index, "MODEL"), c)
+        np.testing.assert_array_equal(store.get(12, "SHOCK"), model[2])
+        self.assertIsNone(store.get(10, "SHOCK"))
+        self.assertIsNone(store.get(14, "SHOCK"))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,536 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import cv2 as cv
+import numpy as np
+from pathlib import Path
+from unittest.mock import patch
+from arcjetCV.utils.video import Video, VideoMeta, frame_brightness
+from arcjetCV.utils.meta_cache import MetaCache, video_fingerprint
+from arcjetCV.segmentation.time.inference import brightness_trace, resample_trace
+from arcjetCV.utils.processor import ArcjetProcessor, FrameWorkspace
+from arcjetCV.utils.utils import clahe_normalize
+from arcjetCV.utils.output import (
+    ContourStore,
+    OutputJSONL,
+    iter_output_records,
+    read_output_parquet,
+)
+
+
+class TestProcessAll(unittest.TestCase):
+
+    def setUp(self):
+        # Work on a copy of the test video so outputs stay in a temporary folder
+        self.tmpdir = Path(tempfile.mkdtemp())
+        video_path = self.tmpdir / "arcjet_test.mp4"
+        shutil.copy(Path(__file__).parent / "arcjet_test.mp4", video_path)
+        self.video = Video(str(video_path))
+
+        meta_path = self.tmpdir / "arcjet_test.meta"
+        meta = {
+            "WIDTH": self.video.w,
+            "HEIGHT": self.video.h,
+            "CHANNELS": self.video.chan,
+            "NFRAMES": self.video.nframes,
+            "FIRST_GOOD_FRAME": 0,
+            "LAST_GOOD_FRAME": self.video.nframes - 1,
+            "FLOW_DIRECTION": "right",
+            "CROP_YMIN": 71,
+            "CROP_YMAX": 644,
+            "CROP_XMIN": 128,
+            "CROP_XMAX": 1153,
+        }
+        meta_path.write_text(json.dumps(meta))
+        self.videometa = VideoMeta(self.video, str(meta_path))
+        self.options = {"SEGMENT_METHOD": "AutoHSV"}
+
+    def tearDown(self):
+        self.video.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_parallel_matches_serial(self):
+        serial = ArcjetProcessor(self.videometa).process_all(
+            self.video, dict(self.options), 150, 180, 3, write_json=False
+        )
+        parallel = ArcjetProcessor(self.videometa).process_all(
+            self.video, dict(self.options), 150, 180, 3, write_json=False, workers=2
+        )
+
+        self.assertEqual(
+            [d["INDEX"] for d in parallel], list(range(150, 181, 3))
+        )
+        self.assertEqual([d["INDEX"] for d in serial], [d["INDEX"] for d in parallel])
+        for d0, d1 in zip(serial, parallel):
+            self.assertEqual(d0.get("MODEL_AREA"), d1.get("MODEL_AREA"))
+            self.assertEqual(d0.get("SHOCK_AREA"), d1.get("SHOCK_AREA"))
+
+        # More chunks than workers
+        chunked = ArcjetProcessor(self.videometa).process_all(
+            self.video, dict(self.options), 150, 180, 3, write_json=False, workers=2,
+            chunk_frames=4,
+        )
+        self.assertEqual(
+            [d.get("MODEL_AREA") for d in chunked], [d.get("MODEL_AREA") for d in serial]
+        )
+
+    def test_stream_jsonl(self):
+        out = ArcjetProcessor(self.videometa).process_all(
+            self.video, dict(self.options), 150, 160, 5, output_format="jsonl"
+        )
+        path = self.tmpdir / "arcjet_test_150_160.jsonl"
+        self.assertEqual(out.path, str(path))
+        self.assertEqual(len(out), 3)
+
+        records = list(iter_output_records(path))
+        self.assertEqual([r["INDEX"] for r in records], [150, 155, 160])
+        self.assertIsNotNone(records[0]["MODEL"])
+
+    def test_write_parquet(self):
+        out = ArcjetProcessor(self.videometa).process_all(
+            self.video,
+            dict(self.options),
+            150,
+            160,
+            5,
+            write_json=False,
+            write_parquet=True,
+        )
+        df = read_output_parquet(self.tmpdir / "arcjet_test_150_160.parquet")
+        self.assertEqual(list(df["INDEX"]), [150, 155, 160])
+        self.assertEqual(list(df["MODEL_AREA"]), [d["MODEL_AREA"] for d in out])
+
+    def test_write_contours(self):
+        out = ArcjetProcessor(self.videometa).process_all(
+            self.video,
+            dict(self.options),
+            150,
+            160,
+            5,
+            write_json=False,
+            write_contours=True,
+        )
+        store = ContourStore(self.tmpdir / "arcjet_test_150_160.contours")
+        for d in out:
+            for key in ["MODEL", "SHOCK"]:
+                np.testing.assert_array_equal(store.get(d["INDEX"], key), d[key])
+
+    def test_progress_callback(self):
+        progress = []
+        ArcjetProcessor(self.videometa, progress_callback=progress.append).process_all(
+            self.video, dict(self.options), 150, 156, 3, write_json=False
+        )
+        self.assertEqual(progress, [33, 66, 100, 100])
+
+    def test_resume_after_interrupt(self):
+        full = ArcjetProcessor(self.videometa).process_all(
+            self.video, dict(self.options), 150, 180, 3, output_prefix="full"
+        )
+        self.assertFalse((self.tmpdir / "full_checkpoint_150_180.jsonl").exists())
+
+        def interrupt(percent):
+            if percent >= 50:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            ArcjetProcessor(self.videometa, progress_callback=interrupt).process_all(
+                self.video, dict(self.options), 150, 180, 3, output_prefix="run",
+                checkpoint_every=2, output_format="jsonl", write_parquet=True,
+                write_contours=True,
+            )
+        checkpoint = self.tmpdir / "run_checkpoint_150_180.jsonl"
+        for name in ("run_150_180.jsonl", "run_150_180.parquet", "run_150_180.contours"):
+            self.assertFalse((self.tmpdir / name).exists())
+        kept = [r["INDEX"] for r in iter_output_records(checkpoint)]
+        self.assertEqual(kept, list(range(150, 166, 3)))
+
+        for workers in (1, 2):
+            resumed = ArcjetProcessor(self.videometa).process_all(
+                self.video, dict(self.options), 150, 180, 3, output_prefix="run",
+                resume=True, workers=workers,
+            )
+            self.assertEqual([d["INDEX"] for d in resumed], list(range(150, 181, 3)))
+            for d0, d1 in zip(full, resumed):
+                self.assertEqual(d0.get("MODEL_AREA"), d1.get("MODEL_AREA"))
+                self.assertEqual(d0.get("SHOCK_AREA"), d1.get("SHOCK_AREA"))
+                self.assertIsInstance(d1["MODEL"], np.ndarray)
+                np.testing.assert_array_equal(d0["MODEL"], d1["MODEL"])
+            self.assertFalse(checkpoint.exists())
+
+            # Resume from a checkpoint with gaps, as left by parallel workers
+            with OutputJSONL(str(checkpoint)) as out:
+                for d in full[::4]:
+                    out.append(d)
+
+    def test_resume_seeds_checkpoint(self):
+        # Frames only found in the output file survive a second interruption
+        full = ArcjetProcessor(self.videometa).process_all(
+            self.video, dict(self.options), 150, 180, 3, output_prefix="full"
+        )
+        with OutputJSONL(str(self.tmpdir / "run_150_180.jsonl")) as out:
+            for d in full[:4]:
+                out.append(d)
+
+        def interrupt(percent):
+            if percent >= 60:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            ArcjetProcessor(self.videometa, progress_callback=interrupt).process_all(
+                self.video, dict(self.options), 150, 180, 3, output_prefix="run",
+                checkpoint_every=2, output_format="jsonl", resume=True,
+            )
+        self.assertFalse((self.tmpdir / "run_150_180.jsonl").exists())
+        checkpoint = self.tmpdir / "run_checkpoint_150_180.jsonl"
+        kept = [r["INDEX"] for r in iter_output_records(checkpoint)]
+        self.assertEqual(kept[:4], [150, 153, 156, 159])
+        self.assertGreater(len(kept), 4)
+
+    def test_cancel(self):
+        progress = []
+        processor = ArcjetProcessor(self.videometa, progress_callback=progress.append)
+        out = processor.process_all(
+            self.video, dict(self.options), 150, 180, 3, output_prefix="run",
+            write_video=True, should_stop=lambda: len(progress) >= 3,
+        )
+        self.assertTrue(processor.cancelled)
+        self.assertEqual([d["INDEX"] for d in out], [150, 153, 156])
+        self.assertNotIn(100, progress)
+        self.assertEqual(
+            [r["INDEX"] for r in iter_output_records(self.tmpdir / "run_150_180.json")],
+            [150, 153, 156],
+        )
+        marker = json.loads((self.tmpdir / "run_150_180.cancelled").read_text())
+        self.assertEqual(marker["status"], "cancelled")
+        self.assertEqual(marker["frames"], 3)
+        self.assertTrue((self.tmpdir / "run_checkpoint_150_180.jsonl").exists())
+
+        # Resuming completes the run and clears the marker
+        out = processor.process_all(
+            self.video, dict(self.options), 150, 180, 3, output_prefix="run", resume=True
+        )
+        self.assertFalse(processor.cancelled)
+        self.assertEqual([d["INDEX"] for d in out], list(range(150, 181, 3)))
+        self.assertFalse((self.tmpdir / "run_150_180.cancelled").exists())
+
+    def test_cancel_parallel(self):
+        progress = []
+        processor = ArcjetProcessor(self.videometa, progress_callback=progress.append)
+        out = processor.process_all(
+            self.video, dict(self.options), 150, 400, 1, workers=2,
+            should_stop=lambda: True,
+        )
+        self.assertTrue(processor.cancelled)
+        self.assertLess(len(out), 251)
+        # Progress counts the frames of the stopped chunks, not their length
+        self.assertLessEqual(max(progress, default=0), int(100 * len(out) / 251))
+        self.assertTrue((self.tmpdir / "arcjet_test_150_400.cancelled").exists())
+
+    def test_worker_stop(self):
+        from arcjetCV.gui.processor_worker import ProcessorWorker
+
+        worker = ProcessorWorker(
+            ArcjetProcessor(self.videometa), self.video, dict(self.options),
+            150, 180, 3, "gui", write_json=True, write_video=False, display_shock=True,
+        )
+        worker.stop()
+        worker.run()
+        self.assertTrue(worker.processor.cancelled)
+        self.assertEqual(list(iter_output_records(self.tmpdir / "gui_150_180.json")), [])
+
+    def test_cnn_batches(self):
+        serial = ArcjetProcessor(self.videometa)
+        serial.cnn = _ThresholdCNN()
+        batched = ArcjetProcessor(self.videometa)
+        batched.cnn = _ThresholdCNN()
+        options = {"SEGMENT_METHOD": "CNN"}
+
+        out0 = serial.process_all(self.video, dict(options), 150, 170, 2, write_json=False)
+        out1 = batched.process_all(
+            self.video, dict(options), 150, 170, 2, write_json=False, batch_size=4
+        )
+
+        self.assertEqual(batched.cnn.batch_sizes, [4, 4, 3])
+        self.assertEqual([d["INDEX"] for d in out1], list(range(150, 171, 2)))
+        for d0, d1 in zip(out0, out1):
+            self.assertEqual(d0["MODEL_AREA"], d1["MODEL_AREA"])
+            self.assertEqual(d0["UNDEREXPOSED"], d1["UNDEREXPOSED"])
+            np.testing.assert_array_equal(d0["MODEL"], d1["MODEL"])
+
+    def test_cnn_int8_method(self):
+        processor = ArcjetProcessor(self.videometa)
+        processor.cnn = _ThresholdCNN()
+        processor.cnn.backend = "onnx_int8"
+        out = processor.process_all(
+            self.video, {"SEGMENT_METHOD": "CNN_INT8"}, 150, 154, 2, write_json=False
+        )
+        self.assertEqual([d["INDEX"] for d in out], [150, 152, 154])
+        self.assertEqual(processor.cnn.backend, "onnx_int8")
+        self.assertIsNotNone(out[0]["MODEL"])
+
+    def test_cnn_tiled_options(self):
+        processor = ArcjetProcessor(self.videometa)
+        processor.cnn = _ThresholdCNN()
+        options = {"SEGMENT_METHOD": "CNN", "CNN_TILED": True, "CNN_TILE_SCALE": 0.5}
+        out = processor.process_all(self.video, options, 150, 152, 2, write_json=False)
+        self.assertEqual(len(out), 2)
+        self.assertEqual(processor.cnn.tiled_kwargs, [{"scale": 0.5}] * 2)
+        self.assertEqual(processor.cnn.batch_sizes, [])
+
+    def test_cnn_keyframes(self):
+        processor = ArcjetProcessor(self.videometa)
+        processor.cnn = _ThresholdCNN()
+        options = {"SEGMENT_METHOD": "CNN", "CNN_KEYFRAME_INTERVAL": 4}
+        out = processor.process_all(
+            self.video, options, 150, 160, 1, write_json=False, batch_size=4
+        )
+        keyframes = [d["CNN_KEYFRAME"] for d in out]
+        self.assertEqual(keyframes[0], True)
+        self.assertEqual(processor.cnn.batch_sizes, [1] * sum(keyframes))
+        self.assertLess(sum(keyframes), len(out))
+        self.assertTrue(all(d["MODEL"] is not None for d in out))
+
+    def test_cnn_load_failure(self):
+        processor = ArcjetProcessor(self.videometa)
+        options = {"SEGMENT_METHOD": "CNN"}
+        with patch.object(
+            ArcjetProcessor, "load_cnn", side_effect=RuntimeError("no model")
+        ), patch.object(ArcjetProcessor, "process") as process:
+            with self.assertRaises(RuntimeError):
+                processor.process_all(self.video, options, 150, 160, 1)
+        process.assert_not_called()
+        self.assertFalse((self.tmpdir / "arcjet_test_150_160.json").exists())
+
+
+
+class _ThresholdCNN:
+    """Stand-in for the CNN labelling bright pixels as model and mid-gray pixels as shock."""
+
+    backend = "torch"
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.tiled_kwargs = []
+
+    def predict(self, img):
+        gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+        return np.where(gray > 200, 1, np.where(gray > 100, 2, 0)).astype(np.uint8)
+
+    def predict_batch(self, imgs):
+        self.batch_sizes.append(len(imgs))
+        return [self.predict(img) for img in imgs]
+
+    def predict_tiled(self, img, **kwargs):
+        self.tiled_kwargs.append(kwargs)
+        return self.predict(img)
+
+
+class TestFrameWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(0, 256, (120, 200, 3), dtype=np.uint8)
+        self.crop = ((10, 110), (20, 180))
+
+    def test_matches_reference(self):
+        workspace = FrameWorkspace(100, 160)
+        cropped = self.frame[10:110, 20:180]
+        square = workspace.load(cropped)
+        self.assertEqual(square.shape, (160, 160, 3))
+        self.assertEqual(workspace.offset, [30, 0])
+        np.testing.assert_array_equal(square[30:130], cropped)
+        self.assertEqual(square[:30].max(), 0)
+
+        np.testing.assert_array_equal(
+            workspace.gray_blur(),
+            cv.GaussianBlur(cv.cvtColor(square, cv.COLOR_BGR2GRAY), (5, 5), 0),
+        )
+        np.testing.assert_array_equal(workspace.hsv(), cv.cvtColor(square, cv.COLOR_BGR2HSV))
+        clahe = clahe_normalize(square)
+        np.testing.assert_array_equal(workspace.clahe(), clahe)
+        np.testing.assert_array_equal(
+            workspace.clahe_hsv_blur(),
+            cv.GaussianBlur(cv.cvtColor(clahe, cv.COLOR_BGR2HSV), (5, 5), 0),
+        )
+
+    def test_reuses_buffers(self):
+        workspace = FrameWorkspace(100, 160)
+        square = workspace.load(self.frame[10:110, 20:180])
+        hsv = workspace.hsv()
+        self.assertIs(workspace.hsv(), hsv)
+
+        square2 = workspace.load(self.frame[10:110, 20:180][::-1])
+        self.assertIs(square2, square)
+        self.assertIs(workspace.hsv(), hsv)
+        np.testing.assert_array_equal(hsv, cv.cvtColor(square2, cv.COLOR_BGR2HSV))
+
+    def test_process_matches_make_crop_square(self):
+        video = Video(str(Path(__file__).parent / "arcjet_test.mp4"))
+        frame = video.get_frame(150)
+        video.close()
+        meta = {"FLOW_DIRECTION": "right", "HEIGHT": video.h, "WIDTH": video.w}
+        processor = ArcjetProcessor(_Meta(meta, ((71, 644), (128, 1153))))
+
+        for method in ["AutoHSV", "HSV", "GRAY"]:
+            options = {"SEGMENT_METHOD": method, "THRESHOLD": 150}
+            edges, argdict = processor.process(frame, dict(options))
+
+            frame_crop, offset = processor.make_crop_square(frame)
+            flags = processor.get_image_flags(frame_crop, dict(options))
+            contour_dict, flags = processor.segment(frame_crop, flags)
+            expected, flags = processor.get_edges_metrics(contour_dict, flags, offset)
+
+            self.assertEqual(argdict["MODEL_AREA"], flags["MODEL_AREA"])
+            self.assertEqual(argdict["PIXEL_MAX"], flags["PIXEL_MAX"])
+            np.testing.assert_array_equal(edges["MODEL"], expected["MODEL"])
+
+
+    def test_process_from_two_threads(self):
+        # The GUI preview and a ProcessorWorker share one processor
+        video = Video(str(Path(__file__).parent / "arcjet_test.mp4"))
+        frames = [video.get_frame(150), video.get_frame(300)]
+        video.close()
+        meta = {"FLOW_DIRECTION": "right", "HEIGHT": video.h, "WIDTH": video.w}
+        processor = ArcjetProcessor(_Meta(meta, ((71, 644), (128, 1153))))
+        options = {"SEGMENT_METHOD": "AutoHSV"}
+        expected = [processor.process(frame, dict(options))[0] for frame in frames]
+
+        barrier = threading.Barrier(2)
+        results = [[], []]
+
+        def run(i):
+            barrier.wait()
+            for _ in range(20):
+                results[i].append(processor.process(frames[i], dict(options))[0])
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i in range(2):
+            for edges in results[i]:
+                for key in ["MODEL", "SHOCK"]:
+                    np.testing.assert_array_equal(edges[key], expected[i][key])
+
+class TestVideoMeta(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.video = Video(str(Path(__file__).parent / "arcjet_test.mp4"))
+        self.cache = MetaCache(self.tmpdir / "cache")
+
+    def tearDown(self):
+        self.video.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_frame_brightness(self):
+        frame = cv.cvtColor(self.video.get_frame(200), cv.COLOR_RGB2BGR)
+        gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+        self.assertAlmostEqual(frame_brightness(frame), np.mean(gray), delta=0.5)
+        self.assertAlmostEqual(frame_brightness(gray), np.mean(gray), places=6)
+
+    def test_scan_matches_sampled_trace(self):
+        meta = VideoMeta(self.video, str(self.tmpdir / "arcjet_test.meta"), cache=False)
+        self.assertEqual(len(meta["BRIGHTNESS"]), self.video.nframes)
+        self.assertTrue((self.tmpdir / "arcjet_test.meta").exists())
+
+        samples = meta.scan(self.video)
+        trace = resample_trace(
+            [index for index, _ in samples],
+            [value for _, value in samples],
+            self.video.nframes,
+        )
+        np.testing.assert_allclose(trace, brightness_trace(self.video), atol=1e-5)
+
+    def test_parallel_scan_matches_serial(self):
+        meta = VideoMeta(self.video, str(self.tmpdir / "arcjet_test.meta"), cache=False)
+        serial = list(meta["BRIGHTNESS"])
+        samples = meta.scan(self.video)
+        parallel_samples = meta.scan(self.video, workers=3, min_chunk_frames=100)
+        self.assertEqual(meta["BRIGHTNESS"], serial)
+        self.assertEqual(parallel_samples, samples)
+
+    def test_cache_survives_move(self):
+        meta = VideoMeta(self.video, str(self.tmpdir / "arcjet_test.meta"), cache=self.cache)
+        meta["FLOW_DIRECTION"] = "left"
+        meta.write()
+        self.assertEqual(len(self.cache), 1)
+
+        moved_path = self.tmpdir / "moved.mp4"
+        shutil.copy(self.video.fpath, moved_path)
+        moved = Video(str(moved_path))
+        try:
+            with patch.object(VideoMeta, "scan", side_effect=AssertionError("rescanned")):
+                cached = VideoMeta(moved, str(self.tmpdir / "moved.meta"), cache=self.cache)
+        finally:
+            moved.close()
+        self.assertEqual(cached["FLOW_DIRECTION"], "left")
+        self.assertEqual(cached["BRIGHTNESS"], meta["BRIGHTNESS"])
+        self.assertTrue((self.tmpdir / "moved.meta").exists())
+
+    def test_fingerprint_tracks_content(self):
+        path = self.tmpdir / "copy.mp4"
+        shutil.copy(self.video.fpath, path)
+        fingerprint = video_fingerprint(path)
+        self.assertEqual(fingerprint, video_fingerprint(self.video.fpath))
+        with open(path, "r+b") as f:
+            f.write(b"\0" * 16)
+        self.assertNotEqual(video_fingerprint(path), fingerprint)
+
+    def test_stale_meta_file_is_rebuilt(self):
+        path = self.tmpdir / "arcjet_test.meta"
+        meta = VideoMeta(self.video, str(path), cache=False)
+        self.assertEqual(meta["VIDEO_FINGERPRINT"], video_fingerprint(self.video.fpath))
+        meta["FLOW_DIRECTION"] = "left"
+        meta.write()
+        self.assertEqual(VideoMeta(self.video, str(path), cache=False)["FLOW_DIRECTION"], "left")
+
+        # A file written for another video is rescanned instead of trusted
+        meta["VIDEO_FINGERPRINT"] = "0" * 64
+        with open(path, "w") as fout:
+            json.dump(meta, fout)
+        rebuilt = VideoMeta(self.video, str(path), cache=False)
+        self.assertIsNone(rebuilt["FLOW_DIRECTION"])
+        self.assertEqual(rebuilt["BRIGHTNESS"], meta["BRIGHTNESS"])
+        with open(path) as fin:
+            self.assertEqual(json.load(fin)["VIDEO_FINGERPRINT"], video_fingerprint(self.video.fpath))
+
+    def test_cache_evicts_only_beyond_max_entries(self):
+        cache = MetaCache(self.tmpdir / "count", max_entries=2)
+        with patch.object(MetaCache, "evict", autospec=True, side_effect=MetaCache.evict) as evict:
+            for key in ["a", "b", "a", "b"]:
+                cache.put(key, {})
+            evict.assert_not_called()
+            cache.put("c", {})
+            evict.assert_called_once()
+        self.assertEqual(len(cache), 2)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = MetaCache(self.tmpdir / "lru", max_entries=2)
+        for i, key in enumerate(["a", "b"]):
+            cache.put(key, {"NFRAMES": i})
+            os.utime(cache.cache_dir / (key + ".json"), (i, i))
+        self.assertEqual(cache.get("a"), {"NFRAMES": 0})
+        cache.put("c", {"NFRAMES": 2})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class _Meta(dict):
+    def __init__(self, meta, crop):
+        super().__init__(meta)
+        self._crop = crop
+
+    def crop_range(self):
+        return self._crop
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,36 @@
+import subprocess
+import sys
 import unittest
 import cv2 as cv
 import numpy as np
+import torch
+import segmentation_models_pytorch as smp
+from torchvision import transforms as T
+import tempfile
+from pathlib import Path
+from arcjetCV.segmentation.contour.cnn import (
+    CNN,
+    CHECKPOINT_PATH,
+    _tile_ramp,
+    _tile_starts,
+    clear_cnn_registry,
+    get_cnn,
+    load_unet,
+    onnx_cache_path,
+    ort,
+)
+from arcjetCV.segmentation.contour.quantize import compare_masks, mask_iou, quantize_cnn
+from arcjetCV.segmentation.contour.tracking import MaskPropagator
+from arcjetCV.segmentation.time.inference import NumpyConv1DNet, get_numpy_time_model
+from arcjetCV.segmentation.time.time_segmentation import (
+    Conv1DNet,
+    clear_time_models,
+    export_time_weights,
+    get_time_model,
+    segment_traces,
+    time_segmentation_batch,
+)
+from arcjetCV.utils.video import Video
 from arcjetCV.segmentation.contour.contour import contoursCNN, contoursAutoHSV, contoursGRAY, contoursHSV
 from unittest.mock import patch
 
@@ -200,7 +230,348 @@ class TestContoursCNN(unittest.TestCase):
     #     # Ensure shock contour matches the synthetic region
     #     shock_rect = cv.boundingRect(contours['SHOCK'])
     #     self.assertEqual(shock_rect, (10, 10, 10, 10))
-        
+
+    def test_precomputed_mask(self):
+        img = np.zeros((100, 100, 3), dtype=np.uint8)
+        mask = np.zeros((100, 100), dtype=np.uint8)
+        mask[25:75, 25:75] = 1
+        mask[10:20, 10:20] = 2
+        contours, flags = contoursCNN(img, None, cnnmask=mask)
+        self.assertEqual(cv.boundingRect(contours['MODEL']), (25, 25, 50, 50))
+        self.assertEqual(cv.boundingRect(contours['SHOCK']), (10, 10, 10, 10))
+
+
+class TestCNNPredictBatch(unittest.TestCase):
+
+    def setUp(self):
+        # Small randomly initialized network, the packaged checkpoint is not needed here
+        torch.manual_seed(0)
+        model = smp.Unet(encoder_name="resnet18", encoder_weights=None, classes=4)
+        self.cnn = CNN(model=model)
+        self.cnn.input_size = (128, 128)
+
+    def test_matches_predict(self):
+        rng = np.random.default_rng(0)
+        imgs = [
+            rng.integers(0, 256, (90, 120, 3), dtype=np.uint8),
+            rng.integers(0, 256, (64, 64, 3), dtype=np.uint8),
+        ]
+        masks = self.cnn.predict_batch(imgs)
+        for img, mask in zip(imgs, masks):
+            self.assertEqual(mask.shape, img.shape[:2])
+            np.testing.assert_array_equal(mask, self.cnn.predict(img))
+
+    def test_tiled_single_tile(self):
+        img = np.random.default_rng(1).integers(0, 256, (128, 128, 3), dtype=np.uint8)
+        np.testing.assert_array_equal(self.cnn.predict_tiled(img, overlap=32), self.cnn.predict(img))
+
+    def test_tiled_matches_full_accumulation(self):
+        img = np.random.default_rng(2).integers(0, 256, (300, 450, 3), dtype=np.uint8)
+        mask = self.cnn.predict_tiled(img, overlap=32, memory_budget=0)
+        self.assertEqual(mask.shape, (300, 450))
+
+        # Reference: blend all tiles into one full-size logits array
+        ys, xs = _tile_starts(300, 128, 32), _tile_starts(450, 128, 32)
+        self.assertEqual((ys[-1], xs[-1]), (172, 322))
+        weight = np.outer(_tile_ramp(128, 32), _tile_ramp(128, 32))
+        logits = np.zeros((4, 300, 450), np.float32)
+        planes = np.empty((1, 3, 128, 128), np.float32)
+        for y in ys:
+            for x in xs:
+                self.cnn._normalize(img[y : y + 128, x : x + 128], planes[0])
+                logits[:, y : y + 128, x : x + 128] += self.cnn._forward(torch.from_numpy(planes))[0] * weight
+        np.testing.assert_array_equal(mask, logits.argmax(axis=0))
+
+        # Batching tiles under a larger budget gives the same mask up to float rounding
+        batched = self.cnn.predict_tiled(img, overlap=32, memory_budget=2**30)
+        self.assertGreater((batched == mask).mean(), 0.999)
+
+    def test_tiled_scale(self):
+        img = np.random.default_rng(3).integers(0, 256, (100, 90, 3), dtype=np.uint8)
+        self.assertEqual(self.cnn.predict_tiled(img, scale=2.0).shape, (100, 90))
+        with self.assertRaises(ValueError):
+            self.cnn.predict_tiled(img, overlap=100)
+
+    def test_preprocess_matches_transforms(self):
+        t = T.Compose(
+            [T.ToPILImage(), T.Resize((128, 128)), T.ToTensor(), T.Normalize(self.cnn.mean, self.cnn.std)]
+        )
+        # Smooth gradients, as in real frames; interpolation kernels differ on pixel noise
+        y, x = np.mgrid[0:300, 0:400]
+        img = np.dstack([x * 255 // 400, y * 255 // 300, (x + y) * 255 // 700]).astype(np.uint8)
+        for size in [(300, 400), (90, 60)]:
+            resized = cv.resize(img, size[::-1])
+            batch = self.cnn.preprocess([resized, resized])
+            self.assertEqual(tuple(batch.shape), (2, 3, 128, 128))
+            self.assertLess(np.abs(batch[0].numpy() - t(resized).numpy()).mean(), 0.01)
+
+
+@unittest.skipIf(ort is None, "onnxruntime is not installed")
+class TestCNNOnnx(unittest.TestCase):
+
+    def setUp(self):
+        # Use the packaged checkpoint when present (not a git-lfs pointer), a small network otherwise
+        if CHECKPOINT_PATH.stat().st_size > 1e6:
+            self.model = load_unet()
+        else:
+            torch.manual_seed(0)
+            self.model = smp.Unet(encoder_name="resnet18", encoder_weights=None, classes=4).eval()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        video = Video(str(Path(__file__).parent / "arcjet_test.mp4"))
+        self.frames = [video.get_frame(i)[71:644, 128:1153] for i in (150, 300)]
+        video.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_parity_with_torch(self):
+        onnx_path = Path(self.tmpdir.name) / "unet.onnx"
+        cnn_onnx = CNN(backend="onnx", model=self.model, onnx_path=onnx_path, intra_op_threads=1)
+        self.assertTrue(onnx_path.exists())
+        cnn_torch = CNN(model=self.model)
+
+        masks_onnx = cnn_onnx.predict_batch(self.frames)
+        masks_torch = cnn_torch.predict_batch(self.frames)
+        for mask_onnx, mask_torch in zip(masks_onnx, masks_torch):
+            self.assertEqual(mask_onnx.shape, mask_torch.shape)
+            self.assertGreater((mask_onnx == mask_torch).mean(), 0.999)
+
+    def test_default_export_to_model_dir(self):
+        # The default graph is exported to the user model directory, never next to the checkpoint
+        package_dir = Path(self.tmpdir.name) / "package"
+        model_dir = Path(self.tmpdir.name) / "models"
+        package_dir.mkdir()
+        checkpoint_path = package_dir / "unet.pt"
+        checkpoint_path.write_bytes(b"weights")
+        with patch.dict("os.environ", {"ARCJETCV_MODEL_DIR": str(model_dir)}):
+            cnn = CNN(backend="onnx", model=self.model, checkpoint_path=checkpoint_path)
+            self.assertEqual(cnn.onnx_path, onnx_cache_path(checkpoint_path))
+        self.assertEqual(cnn.onnx_path.parent, model_dir)
+        self.assertEqual([p.name for p in model_dir.iterdir()], [cnn.onnx_path.name])
+        self.assertEqual(list(package_dir.iterdir()), [checkpoint_path])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            CNN(backend="tflite", model=self.model)
+
+
+class TestCNNRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.checkpoint = Path(self.tmpdir.name) / "unet.pt"
+        torch.manual_seed(0)
+        self.model = smp.Unet(encoder_name="xception", encoder_weights=None, classes=4)
+        torch.save(self.model.state_dict(), self.checkpoint)
+
+    def tearDown(self):
+        clear_cnn_registry()
+        self.tmpdir.cleanup()
+
+    def test_load_unet(self):
+        model = load_unet(self.checkpoint)
+        for name, value in self.model.state_dict().items():
+            torch.testing.assert_close(model.state_dict()[name], value)
+
+    def test_shared_instance(self):
+        cnn = get_cnn(checkpoint_path=self.checkpoint, warmup=True)
+        self.assertIs(get_cnn(checkpoint_path=self.checkpoint), cnn)
+
+        # Replacing the checkpoint changes its hash and loads a new model
+        with torch.no_grad():
+            next(self.model.parameters()).add_(1.0)
+        torch.save(self.model.state_dict(), self.checkpoint)
+        self.assertIsNot(get_cnn(checkpoint_path=self.checkpoint), cnn)
+
+
+class TestMaskIou(unittest.TestCase):
+
+    def test_mask_iou(self):
+        a = np.zeros((10, 10), bool)
+        b = np.zeros((10, 10), bool)
+        self.assertEqual(mask_iou(a, b), 1.0)
+        a[:4] = True
+        b[2:6] = True
+        self.assertAlmostEqual(mask_iou(a, b), 2 / 6)
+
+
+class TestMaskPropagator(unittest.TestCase):
+
+    @staticmethod
+    def frame(x):
+        # Bright square on a textured background, shifted x pixels to the right
+        rng = np.random.default_rng(0)
+        img = cv.GaussianBlur(rng.integers(0, 60, (200, 300), dtype=np.uint8), (7, 7), 0)
+        img[60:140, 80 + x:160 + x] = 230
+        return cv.cvtColor(img, cv.COLOR_GRAY2BGR)
+
+    @staticmethod
+    def predict(img):
+        return (cv.cvtColor(img, cv.COLOR_BGR2GRAY) > 200).astype(np.uint8)
+
+    def test_keyframe_interval(self):
+        propagator = MaskPropagator(keyframe_interval=3, change_threshold=255)
+        frame = self.frame(0)
+        keyframes = [propagator.segment(frame, self.predict)[1] for _ in range(7)]
+        self.assertEqual(keyframes, [True, False, False, True, False, False, True])
+
+        propagator.reset()
+        self.assertTrue(propagator.segment(frame, self.predict)[1])
+
+    def test_change_forces_keyframe(self):
+        propagator = MaskPropagator(keyframe_interval=100)
+        self.assertTrue(propagator.segment(self.frame(0), self.predict)[1])
+        self.assertFalse(propagator.segment(self.frame(0), self.predict)[1])
+        black = np.zeros_like(self.frame(0))
+        self.assertTrue(propagator.segment(black, self.predict)[1])
+
+    def test_propagates_motion(self):
+        propagator = MaskPropagator(keyframe_interval=100, change_threshold=255)
+        for x in range(0, 13, 3):
+            mask, is_keyframe = propagator.segment(self.frame(x), self.predict)
+        self.assertFalse(is_keyframe)
+        self.assertEqual(mask.dtype, np.uint8)
+        self.assertGreater(mask_iou(mask > 0, self.predict(self.frame(12)) > 0), 0.9)
+
+
+@unittest.skipIf(ort is None, "onnxruntime is not installed")
+class TestCNNInt8(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = smp.Unet(encoder_name="resnet18", encoder_weights=None, classes=4).eval()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        video = Video(str(Path(__file__).parent / "arcjet_test.mp4"))
+        self.frames = [video.get_frame(i)[71:644, 128:1153] for i in (150, 250, 350)]
+        video.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_quantize_and_compare(self):
+        int8_path = Path(self.tmpdir.name) / "unet.int8.onnx"
+        quantize_cnn(self.frames, int8_path, model=self.model)
+        cnn_int8 = CNN(backend="onnx_int8", onnx_path=int8_path)
+        cnn_fp32 = CNN(model=self.model)
+
+        mask = cnn_int8.predict(self.frames[0])
+        self.assertEqual(mask.shape, self.frames[0].shape[:2])
+        results = compare_masks(cnn_fp32, cnn_int8, self.frames)
+        self.assertEqual(len(results["MODEL_IOU"]), 3)
+        self.assertTrue(np.all((results["SHOCK_IOU"] >= 0) & (results["SHOCK_IOU"] <= 1)))
+        self.assertGreater(results["TEST_FPS"], 0)
+
+    def test_missing_int8_model(self):
+        with self.assertRaises(FileNotFoundError):
+            CNN(backend="onnx_int8", onnx_path=Path(self.tmpdir.name) / "missing.onnx")
+
+
+class TestTimeSegmentation(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.checkpoint = Path(self.tmpdir.name) / "time-checkpoint.pt"
+        torch.save(Conv1DNet().state_dict(), self.checkpoint)
+        clear_time_models()
+
+    def tearDown(self):
+        clear_time_models()
+        self.tmpdir.cleanup()
+
+    def test_model_is_cached(self):
+        model = get_time_model(self.checkpoint)
+        self.assertFalse(model.training)
+        self.assertIs(get_time_model(self.checkpoint), model)
+        self.assertIsNot(get_time_model(self.checkpoint, script=True), model)
+
+    def test_batch_matches_single(self):
+        model = get_time_model(self.checkpoint)
+        traces = np.random.default_rng(0).random((4, 500)).astype(np.float32)
+        batch = segment_traces(traces, model)
+        self.assertEqual(batch.shape, (4, 500))
+        for trace, out in zip(traces, batch):
+            np.testing.assert_array_equal(segment_traces(trace, model), out)
+
+    def test_script_matches_eager(self):
+        traces = np.random.default_rng(1).random((3, 500))
+        np.testing.assert_array_equal(
+            segment_traces(traces, get_time_model(self.checkpoint)),
+            segment_traces(traces, get_time_model(self.checkpoint, script=True)),
+        )
+
+    def test_segment_videos(self):
+        video = Video(str(Path(__file__).parent / "arcjet_test.mp4"))
+        try:
+            [(trace, out)] = time_segmentation_batch([video], model=get_time_model(self.checkpoint))
+        finally:
+            video.close()
+        self.assertEqual(trace.shape, (500,))
+        self.assertAlmostEqual(float(trace.min()), 0.0, places=5)
+        self.assertEqual(out.shape, (500,))
+
+    def test_numpy_matches_torch(self):
+        npz_path = export_time_weights(Path(self.tmpdir.name) / "time-weights.npz", self.checkpoint)
+        model = get_time_model(self.checkpoint)
+        numpy_model = get_numpy_time_model(npz_path)
+        self.assertIsInstance(numpy_model, NumpyConv1DNet)
+        self.assertIs(get_numpy_time_model(npz_path), numpy_model)
+
+        traces = np.random.default_rng(2).random((3, 500)).astype(np.float32)
+        with torch.no_grad():
+            expected = model(torch.from_numpy(traces[:, None])).numpy()
+        np.testing.assert_allclose(numpy_model(traces[:, None]), expected, atol=1e-5)
+        np.testing.assert_array_equal(numpy_model.predict(traces), segment_traces(traces, model))
+
+    def test_weights_exported_on_first_use(self):
+        # Without packaged weights the first segmentation exports them to the user model directory
+        import arcjetCV.segmentation.time.inference as inference
+
+        model_dir = Path(self.tmpdir.name) / "models"
+        trace = np.random.default_rng(3).random(500).astype(np.float32)
+        with patch.dict("os.environ", {"ARCJETCV_MODEL_DIR": str(model_dir)}), patch.object(
+            inference, "TIME_WEIGHTS_PATH", Path(self.tmpdir.name) / "missing.npz"
+        ), patch.object(inference, "TIME_CHECKPOINT_PATH", self.checkpoint):
+            self.assertIsNone(get_numpy_time_model())
+            out = inference.segment_trace(trace)
+            npz_path = inference.cached_time_weights_path()
+            self.assertEqual(npz_path.parent, model_dir)
+            self.assertEqual([p.name for p in model_dir.iterdir()], [npz_path.name])
+            self.assertIsInstance(get_numpy_time_model(), NumpyConv1DNet)
+        np.testing.assert_array_equal(out, segment_traces(trace, get_time_model(self.checkpoint)))
+
+    def test_numpy_weights_missing(self):
+        self.assertIsNone(get_numpy_time_model(Path(self.tmpdir.name) / "missing.npz"))
+
+    def test_videometa_without_torch(self):
+        # New metadata uses the exported weights and never imports PyTorch
+        npz_path = export_time_weights(Path(self.tmpdir.name) / "time-weights.npz", self.checkpoint)
+        code = (
+            "import sys; from pathlib import Path\n"
+            "import arcjetCV.segmentation.time.inference as inference\n"
+            "inference.TIME_WEIGHTS_PATH = Path(sys.argv[1])\n"
+            "from arcjetCV.utils.video import Video, VideoMeta\n"
+            "meta = VideoMeta(Video(sys.argv[2]), sys.argv[3], cache=False)\n"
+            "print('torch' in sys.modules, meta['FIRST_GOOD_FRAME'] is not None)\n"
+        )
+        out = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                code,
+                str(npz_path),
+                str(Path(__file__).parent / "arcjet_test.mp4"),
+                str(Path(self.tmpdir.name) / "arcjet_test.meta"),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parents[1],
+        )
+        self.assertEqual(out.stdout.strip().splitlines()[-1], "False True")
+
 
 if __name__ == '__main__':
     unittest.main()